@@ -0,0 +1,204 @@
+"""
+En este código se almacena localmente el historial de precios de cierre, un archivo Parquet por ticker.
+Así, cada ejecución solo descarga las fechas que faltan en lugar de todo el periodo desde 2010.
+
+El rango guardado como consultado solo cubre las fechas que la fuente regresó, de modo que una descarga fallida o
+vacía se vuelve a intentar. Los precios de Yahoo Finance están ajustados por dividendos y splits, y el ajuste cambia
+toda la historia: por eso cada descarga del final empieza en la última fecha guardada, y si su precio no coincide con
+el guardado, se vuelve a descargar toda la historia del ticker.
+
+Los precios y el rango consultado se guardan en el mismo archivo Parquet (el rango en sus metadatos), escrito en un
+temporal con nombre único y reemplazado de forma atómica: varios hilos o procesos pueden escribir el mismo ticker a
+la vez, y un lector nunca ve los precios de una escritura con el rango de otra.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentacion import tramo
+
+## Fecha desde la que se consultan los precios en todo el proyecto
+FECHA_INICIO = "2010-01-01"
+
+
+## Tolerancia relativa con la que el precio guardado y el recién descargado de una misma fecha se consideran iguales
+TOLERANCIA_AJUSTE = 1e-6
+
+
+## Fuente de datos de Yahoo Finance (la utilizada por defecto)
+class FuenteYahoo:
+    def descargar(self, ticker, inicio, fin):
+        import yfinance as yf
+
+        datos = yf.download(ticker, start=inicio, end=fin, progress=False)
+        if datos.empty:
+            return pd.Series(dtype="float64", name="Close")
+        cierre = datos["Close"]
+        if isinstance(cierre, pd.DataFrame):  ## yfinance regresa columnas MultiIndex (Price, Ticker)
+            cierre = cierre.iloc[:, 0]
+        return cierre.rename("Close")
+
+    ## Descarga varios tickers en una sola petición; regresa un DataFrame con una columna por ticker
+    def descargar_varios(self, tickers, inicio, fin):
+        import yfinance as yf
+
+        datos = yf.download(list(tickers), start=inicio, end=fin, progress=False)
+        if datos.empty:
+            return pd.DataFrame(columns=list(tickers), dtype="float64")
+        return datos["Close"].reindex(columns=list(tickers))
+
+
+## Fuente de datos local: lee archivos <ticker>.csv con columnas Date y Close, útil sin conexión y en pruebas
+class FuenteLocal:
+    def __init__(self, directorio):
+        self.directorio = Path(directorio)
+
+    def descargar(self, ticker, inicio, fin):
+        ruta = self.directorio / f"{ticker}.csv"
+        if not ruta.exists():  ## Como Yahoo Finance con un ticker desconocido: sin precios
+            return pd.Series(dtype="float64", name="Close")
+        datos = pd.read_csv(ruta, parse_dates=["Date"], index_col="Date")
+        datos = datos.loc[(datos.index >= pd.Timestamp(inicio)) & (datos.index < pd.Timestamp(fin))]
+        return datos["Close"].astype("float64")
+
+    def descargar_varios(self, tickers, inicio, fin):
+        return pd.concat({ticker: self.descargar(ticker, inicio, fin) for ticker in tickers}, axis=1)
+
+
+class AlmacenPrecios:
+    """
+    Almacén en disco de precios de cierre. Para cada ticker guarda ``<ticker>.parquet`` con los precios y, en sus
+    metadatos, el rango de fechas ya consultado a la fuente, de modo que solo se pidan los huecos al inicio o al
+    final del periodo solicitado.
+    """
+
+    def __init__(self, directorio, fuente=None):
+        self.directorio = Path(directorio)
+        self.fuente = fuente if fuente is not None else FuenteYahoo()
+
+    def _rutas(self, ticker):
+        return self.directorio / f"{ticker}.parquet", self.directorio / f"{ticker}.json"
+
+    def _leer(self, ticker):
+        ruta_datos, ruta_rango = self._rutas(ticker)
+        vacio = pd.Series(dtype="float64", name="Close", index=pd.DatetimeIndex([], name="Date")), None
+        if not ruta_datos.exists():
+            return vacio
+        tabla = pq.read_table(ruta_datos)
+        metadatos = tabla.schema.metadata or {}
+        if b"rango" in metadatos:
+            rango = json.loads(metadatos[b"rango"])
+        elif ruta_rango.exists():  ## Formato anterior: el rango en <ticker>.json
+            rango = json.loads(ruta_rango.read_text())
+        else:
+            return vacio
+        precios = tabla.to_pandas()["Close"]
+        return precios, (pd.Timestamp(rango["inicio"]), pd.Timestamp(rango["fin"]))
+
+    def _escribir(self, ticker, precios, inicio, fin):
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        ruta_datos, ruta_rango = self._rutas(ticker)
+        tabla = pa.Table.from_pandas(precios.rename_axis("Date").to_frame("Close"))
+        rango = json.dumps({"inicio": inicio.strftime("%Y-%m-%d"), "fin": fin.strftime("%Y-%m-%d")})
+        tabla = tabla.replace_schema_metadata({**(tabla.schema.metadata or {}), b"rango": rango.encode()})
+        ## Temporal con nombre único: dos escrituras simultáneas del mismo ticker no comparten archivo
+        with tempfile.NamedTemporaryFile(dir=self.directorio, prefix=f"{ticker}.", suffix=".parquet.tmp",
+                                         delete=False) as archivo:
+            temporal = archivo.name
+        try:
+            pq.write_table(tabla, temporal)
+            os.replace(temporal, ruta_datos)  ## Reemplazo atómico, para no dejar archivos a medias
+        except BaseException:
+            Path(temporal).unlink(missing_ok=True)
+            raise
+        ruta_rango.unlink(missing_ok=True)  ## El rango del formato anterior ya no se usa
+
+    ## Las fuentes sin descarga por lotes se consultan ticker por ticker
+    def _descargar(self, tickers, inicio, fin):
+        if hasattr(self.fuente, "descargar_varios"):
+            return self.fuente.descargar_varios(tickers, inicio, fin)
+        return pd.concat({ticker: self.fuente.descargar(ticker, inicio, fin) for ticker in tickers}, axis=1)
+
+    ## Regresa los precios de cierre en [inicio, fin), descargando solo las fechas que no están almacenadas
+    def obtener(self, ticker, inicio, fin):
+        return self.obtener_varios([ticker], inicio, fin)[ticker].dropna()
+
+    ## Descarga los huecos {(inicio, fin): [tickers]}, agrupando los tickers con el mismo hueco en una sola petición;
+    ## regresa {ticker: [serie por hueco]}
+    def _descargar_huecos(self, huecos):
+        nuevos = {}
+        for (a, b), grupo in huecos.items():
+            with tramo("descarga de precios"):  ## yf.download con la fuente por defecto
+                descarga = self._descargar(grupo, a.strftime("%Y-%m-%d"), b.strftime("%Y-%m-%d"))
+            for ticker in grupo:
+                serie = descarga[ticker].dropna() if ticker in descarga else pd.Series(dtype="float64")
+                serie.index = pd.DatetimeIndex(serie.index, name="Date")
+                nuevos.setdefault(ticker, []).append(serie)
+        return nuevos
+
+    ## Regresa una matriz de precios (fechas × tickers); los tickers con el mismo hueco se descargan en una sola petición
+    def obtener_varios(self, tickers, inicio, fin):
+        inicio, fin = pd.Timestamp(inicio), pd.Timestamp(fin)
+        with tramo("lectura del almacén"):
+            almacenados = {ticker: self._leer(ticker) for ticker in tickers}
+
+        ## El hueco del final empieza en la última fecha guardada, para comparar su precio con el descargado
+        huecos = {}
+        for ticker, (precios, rango) in almacenados.items():
+            if rango is None:
+                faltantes = [(inicio, fin)]
+            else:
+                desde = precios.index[-1] if len(precios) else rango[1]
+                faltantes = [(a, b) for (a, b), pendiente in (((inicio, rango[0]), inicio < rango[0]),
+                                                              ((desde, fin), rango[1] < fin)) if pendiente]
+            for hueco in faltantes:
+                huecos.setdefault(hueco, []).append(ticker)
+        nuevos = self._descargar_huecos(huecos)
+
+        ## Si el precio de la última fecha guardada cambió (nuevo ajuste por dividendos o splits), toda la historia
+        ## guardada quedó desactualizada y se descarga de nuevo
+        recargar = {}
+        for ticker, (precios, rango) in almacenados.items():
+            if rango is None or not len(precios):
+                continue
+            ultima = precios.index[-1]
+            for serie in nuevos.get(ticker, []):
+                if ultima in serie.index and not np.isclose(serie[ultima], precios[ultima], rtol=TOLERANCIA_AJUSTE, atol=0):
+                    recargar.setdefault((min(inicio, rango[0]), max(fin, rango[1])), []).append(ticker)
+                    break
+        for ticker, series in self._descargar_huecos(recargar).items():
+            if len(series[0]):
+                almacenados[ticker] = (series[0].iloc[:0], None)  ## La historia descargada reemplaza a la guardada
+                nuevos[ticker] = series
+            else:  ## Sin la historia nueva, los precios recientes (con otro ajuste) se descartan y se reintentan después
+                nuevos[ticker] = []
+
+        series = {}
+        for ticker, (precios, rango) in almacenados.items():
+            descargados = [serie for serie in nuevos.get(ticker, []) if len(serie)]
+            if descargados:
+                precios = pd.concat([precios, *descargados]).sort_index()
+                precios = precios[~precios.index.duplicated(keep="last")]
+                precios.index = pd.DatetimeIndex(precios.index, name="Date")
+                ## Solo se marca como consultado lo que la fuente regresó: una descarga vacía o fallida se reintenta
+                primera = min(serie.index[0] for serie in descargados)
+                siguiente = max(serie.index[-1] for serie in descargados) + pd.Timedelta(days=1)
+                cubierto = (primera, siguiente) if rango is None else (min(primera, rango[0]), max(siguiente, rango[1]))
+                self._escribir(ticker, precios.astype("float64"), *cubierto)
+            series[ticker] = precios.loc[(precios.index >= inicio) & (precios.index < fin)]
+
+        return pd.concat(series, axis=1).astype("float64")
+
+## Almacén que usan las páginas; PRECIOS_LOCALES permite trabajar sin conexión con archivos CSV
+def almacen_por_defecto():
+    directorio = os.environ.get("ALMACEN_PRECIOS", Path(__file__).parent / "datos")
+    locales = os.environ.get("PRECIOS_LOCALES")
+    return AlmacenPrecios(directorio, FuenteLocal(locales) if locales else None)
+
@@ -0,0 +1,78 @@
+"""
+En este código se evalúan los pronósticos de riesgo (VaR o ES) contra los rendimientos observados.
+
+Para cada columna de pronósticos se cuentan las violaciones (rendimiento menor que el pronóstico) y se calculan las
+pruebas de Kupiec (proporción de fallas), de independencia de Christoffersen y de cobertura condicional. Todo se
+calcula a la vez sobre la matriz fechas × pronósticos, sin ciclos de Python, por lo que se pueden evaluar cientos
+de columnas (métodos × alphas × tickers) en una sola llamada.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.special import xlogy
+from scipy.stats import chi2
+
+
+## Log-verosimilitud de Bernoulli con probabilidad p para n0 ceros y n1 unos (0 * log 0 = 0)
+def _log_bernoulli(n0, n1, p):
+    return xlogy(n0, 1 - p) + xlogy(n1, p)
+
+
+def backtest(rendimientos, pronosticos, probabilidades=None):
+    """
+    Evalúa los ``pronosticos`` (fechas × columnas) contra los ``rendimientos``.
+
+    ``rendimientos`` puede ser una serie (la misma para todas las columnas) o una matriz con la misma forma que
+    ``pronosticos`` (por ejemplo, un ticker por columna). ``probabilidades`` es la probabilidad de violación esperada
+    de cada columna (``1 - alpha`` para un VaR); las columnas con NaN (por ejemplo, de ES, que no tiene una
+    probabilidad nominal) solo reportan los conteos. Las fechas con datos faltantes se omiten en cada columna.
+    Regresa un DataFrame con una fila por columna de pronósticos.
+    """
+    nombres = pronosticos.columns if isinstance(pronosticos, pd.DataFrame) else None
+    f = np.asarray(pronosticos, dtype=np.float64)
+    f = f.reshape(len(f), -1)
+    r = np.asarray(rendimientos, dtype=np.float64)
+    r = np.broadcast_to(r.reshape(len(r), -1), f.shape)
+    p = np.broadcast_to(np.nan if probabilidades is None else np.asarray(probabilidades, dtype=np.float64), f.shape[1:])
+
+    validas = ~(np.isnan(f) | np.isnan(r))
+    violaciones = (r < f) & validas
+    n = validas.sum(axis=0)
+    x = violaciones.sum(axis=0)
+
+    ## Kupiec: proporción de fallas observada contra la esperada
+    with np.errstate(invalid="ignore", divide="ignore"):
+        observada = x / n
+        lr_pof = -2 * (_log_bernoulli(n - x, x, p) - _log_bernoulli(n - x, x, observada))
+
+    ## Christoffersen: transiciones entre días consecutivos con datos (sin violación = 0, violación = 1)
+    pares = validas[1:] & validas[:-1]
+    anterior, actual = violaciones[:-1], violaciones[1:]
+    n00 = (pares & ~anterior & ~actual).sum(axis=0)
+    n01 = (pares & ~anterior & actual).sum(axis=0)
+    n10 = (pares & anterior & ~actual).sum(axis=0)
+    n11 = (pares & anterior & actual).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pi01 = n01 / (n00 + n01)
+        pi11 = n11 / (n10 + n11)
+        pi = (n01 + n11) / (n00 + n01 + n10 + n11)
+        lr_ind = -2 * (_log_bernoulli(n00 + n10, n01 + n11, pi)
+                       - _log_bernoulli(n00, n01, pi01) - np.nan_to_num(_log_bernoulli(n10, n11, pi11)))
+    lr_cc = lr_pof + lr_ind
+    con_prueba = ~np.isnan(p)
+
+    resultado = pd.DataFrame({
+        "Observaciones": n,
+        "Número de Violaciones": x,
+        "Porcentaje de Violaciones": 100 * observada,
+        "Porcentaje Esperado": 100 * p,
+        "Kupiec LR": np.where(con_prueba, lr_pof, np.nan),
+        "Kupiec p-valor": np.where(con_prueba, chi2.sf(lr_pof, 1), np.nan),
+        "Independencia LR": np.where(con_prueba, lr_ind, np.nan),
+        "Independencia p-valor": np.where(con_prueba, chi2.sf(lr_ind, 1), np.nan),
+        "Cobertura Condicional LR": np.where(con_prueba, lr_cc, np.nan),
+        "Cobertura Condicional p-valor": np.where(con_prueba, chi2.sf(lr_cc, 2), np.nan),
+    })
+    if nombres is not None:
+        resultado.index = nombres
+    return resultado
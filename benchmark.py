@@ -0,0 +1,633 @@
+"""
+En este código se miden los tiempos de los cálculos de riesgo del proyecto, fuera de Streamlit.
+Se utilizan rendimientos sintéticos para no depender de la descarga de datos.
+
+Cada medición se guarda con un nombre estable (por ejemplo ``var_es_movil n=4000``) en un archivo JSON, que sirve
+como línea base: con ``--comparar`` se reportan las mediciones que se hicieron más lentas que la base por encima
+de la tolerancia, y el programa termina con código 1 si hay alguna.
+
+Uso: python benchmark.py [--n 1000 100000 1000000] [--tickers 1 50 500] [--repeticiones 3]
+                         [--guardar base.json] [--comparar base.json] [--tolerancia 0.25] [--paginas] [--panel 5000]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import scipy
+from scipy.stats import gaussian_kde, jarque_bera, kurtosis, norm, skew
+
+from backtesting import backtest
+from cuantiles import ListaOrdenada, VentanaOrdenada
+from diagnosticos import densidad_kde, diagnostico, histograma, momentos_moviles
+from escenarios import choques_hipoteticos, choques_ventanas, evaluar_escenarios, var_es_horizonte
+from distribuciones import ajustar_t, ajustar_t_anclas
+from flujo import FuenteReproduccion, MotorFlujo
+from graficas import ANCHO_PIXELES, agregar_serie, figura
+from montecarlo import simular_var_es
+from portafolio import CovarianzaEWMA, CovarianzaMovil, descomposicion_var, simular_var_es_portafolio
+from remuestreo import bootstrap_var_es
+from volatilidad import ajustar_garch, varianza_ewma, varianza_garch
+
+from riesgo import (MomentosMoviles, estadisticas_descriptivas, rendimientos_log_matriz, tabla_var_es, var_es_historico,
+                    var_es_montecarlo, var_es_movil, var_es_movil_colas_pesadas, var_es_parametrico, var_volatilidad_movil)
+
+## Longitud máxima con la que se ejecutan los cálculos originales de las páginas (lambdas y ciclos de Python),
+## que sirven de referencia pero tardan minutos con series largas
+N_MAXIMO_REFERENCIA = 20_000
+
+
+## Función para generar rendimientos sintéticos con colas pesadas
+def rendimientos_sinteticos(n, semilla=0):
+    generador = np.random.default_rng(semilla)
+    return pd.Series(generador.standard_t(4, n) * 0.01, name="Returns")
+
+
+## Función para generar una matriz de precios sintéticos (fechas × tickers)
+def precios_sinteticos(n, tickers, semilla=0):
+    generador = np.random.default_rng(semilla)
+    rendimientos = generador.standard_t(4, (n + 1, tickers)) * 0.01
+    return pd.DataFrame(100 * np.exp(np.cumsum(rendimientos, axis=0)), columns=[f"T{i}" for i in range(tickers)])
+
+
+## Función para medir el mejor tiempo de varias repeticiones
+def medir(funcion, repeticiones=3):
+    mejor = np.inf
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+## Cálculo original de la página Rolling Window, con una lambda por ventana
+def var_es_movil_lambdas(rendimientos, ventana=252):
+    movil = rendimientos.rolling(window=ventana)
+    media, desviacion = movil.mean(), movil.std()
+    return pd.DataFrame({
+        "95% VaR Histórico": movil.quantile(0.05),
+        "99% VaR Histórico": movil.quantile(0.01),
+        "95% VaR Paramétrico": norm.ppf(1 - 0.95, media, desviacion),
+        "99% VaR Paramétrico": norm.ppf(1 - 0.99, media, desviacion),
+        "ES histórico al 95%": movil.apply(lambda x: x[x <= x.quantile(0.05)].mean()),
+        "ES histórico al 99%": movil.apply(lambda x: x[x <= x.quantile(0.01)].mean()),
+        "ES paramétrico al 95%": movil.apply(lambda x: x[x <= norm.ppf(1 - 0.95, np.mean(x), np.std(x))].mean()),
+        "ES paramétrico al 99%": movil.apply(lambda x: x[x <= norm.ppf(1 - 0.99, np.mean(x), np.std(x))].mean()),
+    }, index=rendimientos.index)
+
+
+## Rendimientos logarítmicos y estadísticas descriptivas (página de Análisis Financiero)
+def benchmark_rendimientos(n, repeticiones):
+    precios = precios_sinteticos(n, 1)["T0"]
+    t_rend, rendimientos = medir(lambda: rendimientos_log_matriz(precios), repeticiones)
+    t_estadisticas, _ = medir(lambda: estadisticas_descriptivas(rendimientos.dropna()), repeticiones)
+    print(f"Rendimientos (n={n}): logarítmicos {t_rend * 1e3:.2f} ms | estadísticas descriptivas {t_estadisticas * 1e3:.2f} ms")
+    return {f"rendimientos_log n={n}": t_rend, f"estadisticas_descriptivas n={n}": t_estadisticas}
+
+
+## Comparación del motor de ventanas móviles contra las lambdas originales
+def benchmark_var_es_movil(n, repeticiones):
+    rendimientos = rendimientos_sinteticos(n)
+    t_motor, resultado = medir(lambda: var_es_movil(rendimientos, 252, (0.95, 0.99)), repeticiones)
+    if n > N_MAXIMO_REFERENCIA:
+        print(f"VaR/ES móvil (n={n}): motor {t_motor:.4f} s")
+        return {f"var_es_movil n={n}": t_motor}
+    t_lambdas, referencia = medir(lambda: var_es_movil_lambdas(rendimientos), 1)
+    diferencia = np.nanmax(np.abs(resultado[referencia.columns].to_numpy() - referencia.to_numpy()))
+    print(f"VaR/ES móvil (n={n}): lambdas {t_lambdas:.3f} s | motor {t_motor:.4f} s | "
+          f"aceleración {t_lambdas / t_motor:.0f}x | diferencia máxima {diferencia:.2e}")
+    return {f"var_es_movil n={n}": t_motor, f"var_es_movil_lambdas n={n}": t_lambdas}
+
+
+## Comparación del ciclo original de la página de volatilidad móvil contra la versión vectorizada y la incremental
+def benchmark_volatilidad_movil(n, repeticiones, ventana=252):
+    rendimientos = rendimientos_sinteticos(n)
+
+    def incremental():
+        acumulador = MomentosMoviles.desde_historia(rendimientos.iloc[:ventana], ventana)
+        sigmas = [acumulador.desviacion]
+        for valor in rendimientos.iloc[ventana:-1].to_numpy():
+            sigmas.append(acumulador.agregar(valor))
+        return sigmas
+
+    t_vector, resultado = medir(lambda: var_volatilidad_movil(rendimientos, ventana), repeticiones)
+    t_incremental, sigmas = medir(incremental, repeticiones)
+    resultados = {f"volatilidad_movil n={n}": t_vector, f"volatilidad_movil_incremental n={n}": t_incremental}
+    if n > N_MAXIMO_REFERENCIA:
+        print(f"Volatilidad móvil (n={n}): vectorizado {t_vector:.4f} s | "
+              f"incremental {t_incremental / (n - ventana) * 1e6:.2f} µs/observación")
+        return resultados
+
+    t_ciclo, referencia = medir(lambda: [rendimientos.iloc[i - ventana:i].std() for i in range(ventana, len(rendimientos))], 1)
+    diferencia = max(np.max(np.abs(resultado["Sigma"].to_numpy() - referencia)), np.max(np.abs(np.array(sigmas) - referencia)))
+    print(f"Volatilidad móvil (n={n}): ciclo {t_ciclo:.3f} s | vectorizado {t_vector:.4f} s | "
+          f"incremental {t_incremental / (n - ventana) * 1e6:.2f} µs/observación | diferencia máxima {diferencia:.2e}")
+    resultados[f"volatilidad_movil_ciclo n={n}"] = t_ciclo
+    return resultados
+
+
+## Conteo de violaciones y pruebas de Kupiec y Christoffersen de las ocho métricas de la página Rolling Window
+def benchmark_violaciones(n, repeticiones):
+    rendimientos = rendimientos_sinteticos(n)
+    metricas = var_es_movil(rendimientos, 252, (0.95, 0.99))
+    probabilidades = [0.05, 0.01, 0.05, 0.01] + [np.nan] * 4
+    t_backtest, _ = medir(lambda: backtest(rendimientos, metricas, probabilidades), repeticiones)
+    print(f"Violaciones (n={n}, {metricas.shape[1]} métricas): {t_backtest * 1e3:.2f} ms")
+    return {f"violaciones n={n}": t_backtest}
+
+
+## Escalamiento del cálculo por lotes (matriz fechas × tickers) según el número de tickers
+def benchmark_lote(n, lista_tickers, repeticiones):
+    resultados = {}
+    for tickers in lista_tickers:
+        precios = precios_sinteticos(n, tickers)
+        t_rend, rendimientos = medir(lambda: rendimientos_log_matriz(precios), repeticiones)
+        t_estatico, _ = medir(lambda: [(var_es_parametrico(rendimientos, a), var_es_historico(rendimientos, a))
+                                       for a in (0.95, 0.975, 0.99)], repeticiones)
+        t_movil, metricas = medir(lambda: var_es_movil(rendimientos, 252, (0.95, 0.99)), 1)
+        t_vol, _ = medir(lambda: var_volatilidad_movil(rendimientos, 252), repeticiones)
+        t_backtest, _ = medir(lambda: backtest(rendimientos, metricas["95% VaR Histórico"]), repeticiones)
+        print(f"Lote de {tickers} tickers (n={n}): rendimientos {t_rend * 1e3:.2f} ms | VaR/ES estáticos {t_estatico * 1e3:.1f} ms | "
+              f"VaR/ES móvil {t_movil:.3f} s | volatilidad móvil {t_vol * 1e3:.1f} ms | violaciones {t_backtest * 1e3:.1f} ms")
+        sufijo = f"n={n} tickers={tickers}"
+        resultados.update({f"lote_rendimientos_log {sufijo}": t_rend, f"lote_var_es_estaticos {sufijo}": t_estatico,
+                           f"lote_var_es_movil {sufijo}": t_movil, f"lote_volatilidad_movil {sufijo}": t_vol,
+                           f"lote_violaciones {sufijo}": t_backtest})
+    return resultados
+
+
+## Diagnósticos de la distribución de la página Análisis Financiero (momentos, Jarque-Bera, cuantiles, histograma y
+## kde en una malla de 200 puntos) para todos los tickers a la vez, contra scipy y numpy ticker por ticker (con la
+## kde de gaussian_kde, que evalúa el kernel en cada par punto-dato), y momentos en ventanas móviles de 252 días
+def benchmark_diagnosticos(n, lista_tickers, repeticiones, puntos=200):
+    resultados = {}
+    for tickers in lista_tickers:
+        x = rendimientos_log_matriz(precios_sinteticos(n, tickers)).to_numpy()[1:]
+
+        def motor():
+            conteos, bordes = histograma(x)
+            malla = np.linspace(bordes[:, 0], bordes[:, -1], puntos, axis=1)
+            return diagnostico(x), conteos, densidad_kde(x, malla), malla
+
+        def referencia(columnas):
+            return [(skew(columna), kurtosis(columna), jarque_bera(columna).statistic,
+                     np.quantile(columna, (0.01, 0.05, 0.95, 0.99)), np.histogram(columna, 50)[0],
+                     gaussian_kde(columna)(malla_motor[i])) for i, columna in enumerate(columnas)]
+
+        t_motor, (estadisticas, conteos, densidad, malla_motor) = medir(motor, repeticiones)
+        t_movil, _ = medir(lambda: momentos_moviles(x, 252), 1)
+        ## La referencia se mide con a lo más 20 tickers y se extrapola al lote
+        muestra = min(tickers, 20)
+        t_muestra, esperado = medir(lambda: referencia(x[:, :muestra].T), 1)
+        t_referencia = t_muestra * tickers / muestra
+        diferencia = max(np.max(np.abs(np.array([e[j] for e in esperado]) - np.asarray(valores)[:muestra])
+                                / np.maximum(np.abs([e[j] for e in esperado]), 1))
+                         for j, valores in enumerate((estadisticas["Sesgo"], estadisticas["Curtosis"], estadisticas["Jarque-Bera"])))
+        kde = max(np.max(np.abs(e[5] - densidad[i])) / np.max(e[5]) for i, e in enumerate(esperado))
+        iguales = all((e[4] == conteos[i]).all() for i, e in enumerate(esperado))
+        print(f"Diagnósticos de {tickers} tickers (n={n}): motor {t_motor * 1e3:.1f} ms | scipy {t_referencia:.2f} s "
+              f"(aceleración {t_referencia / t_motor:.0f}x) | momentos móviles {t_movil * 1e3:.1f} ms | "
+              f"diferencia en momentos {diferencia:.1e} | kde {kde:.1e} relativa | histograma igual: {iguales}")
+        sufijo = f"n={n} tickers={tickers}"
+        resultados.update({f"diagnosticos {sufijo}": t_motor, f"diagnosticos_scipy {sufijo}": t_referencia,
+                           f"momentos_moviles {sufijo}": t_movil})
+    return resultados
+
+
+## Escenarios de estrés: todas las ventanas traslapadas de 10 días de la historia más 1,000 choques hipotéticos al
+## azar, revaluados en una sola operación, contra un ciclo de pandas con un escenario a la vez (medido con 200
+## escenarios y extrapolado), y el VaR y ES a 10 días escalado y directo
+def benchmark_escenarios(n, lista_tickers, repeticiones, horizonte=10, hipoteticos=1000):
+    resultados = {}
+    for tickers in lista_tickers:
+        rendimientos = rendimientos_log_matriz(precios_sinteticos(n, tickers))
+        generador = np.random.default_rng(0)
+        posiciones = generador.uniform(0, 10_000, tickers)
+        choques = {f"Choque {i}": dict(zip(rendimientos.columns, generador.uniform(-0.4, 0.1, tickers)))
+                   for i in range(hipoteticos)}
+
+        def ciclo(cuantos=200):
+            return [((np.exp(rendimientos.iloc[i:i + horizonte].sum()) - 1) * posiciones).sum() for i in range(cuantos)]
+
+        t_construccion, escenarios = medir(lambda: pd.concat([choques_ventanas(rendimientos, horizonte),
+                                                              choques_hipoteticos(choques, rendimientos.columns)]),
+                                           repeticiones)
+        t_motor, resultado = medir(lambda: evaluar_escenarios(escenarios, posiciones), repeticiones)
+        t_ciclo, referencia = medir(ciclo, 1)
+        total = len(resultado)
+        t_referencia = t_ciclo / 200 * total
+        diferencia = np.max(np.abs(resultado.to_numpy()[:200] - referencia))
+        t_horizonte, _ = medir(lambda: var_es_horizonte(rendimientos, posiciones, horizonte=horizonte), repeticiones)
+        print(f"Escenarios de {tickers} tickers (n={n}): {total:,} escenarios armados en {t_construccion * 1e3:.1f} ms y "
+              f"revaluados en {t_motor * 1e3:.1f} ms ({total / t_motor:,.0f} escenarios/s) | ciclo de pandas "
+              f"{total / t_referencia:,.0f} escenarios/s (aceleración {t_referencia / (t_construccion + t_motor):.0f}x) | "
+              f"VaR/ES a {horizonte} días {t_horizonte * 1e3:.1f} ms | diferencia máxima {diferencia:.1e}")
+        sufijo = f"n={n} tickers={tickers}"
+        resultados.update({f"escenarios_armado {sufijo}": t_construccion, f"escenarios {sufijo}": t_motor,
+                           f"escenarios_ciclo {sufijo}": t_referencia,
+                           f"var_es_horizonte {sufijo}": t_horizonte})
+    return resultados
+
+
+## Portafolio: covarianza de toda la historia (EWMA y ventana móvil), actualización con una fecha nueva,
+## descomposición del VaR y VaR/ES Montecarlo con draws correlacionados
+def benchmark_portafolio(n, lista_tickers, repeticiones):
+    resultados = {}
+    for tickers in (tickers for tickers in lista_tickers if tickers > 1):
+        rendimientos = rendimientos_log_matriz(precios_sinteticos(n, tickers)).to_numpy()
+        pesos = np.full(tickers, 1 / tickers)
+        t_ewma, _ = medir(lambda: CovarianzaEWMA(tickers).actualizar(rendimientos), repeticiones)
+        t_movil, _ = medir(lambda: CovarianzaMovil(tickers).actualizar(rendimientos), repeticiones)
+
+        ## Actualización fecha por fecha de las últimas 100 fechas, a partir de la historia anterior
+        ewma, movil = CovarianzaEWMA(tickers), CovarianzaMovil(tickers)
+        ewma.actualizar(rendimientos[:-100])
+        movil.actualizar(rendimientos[:-100])
+        t_fecha_ewma, _ = medir(lambda: [ewma.actualizar(fila) for fila in rendimientos[-100:]], 1)
+        t_fecha_movil, _ = medir(lambda: [movil.actualizar(fila) for fila in rendimientos[-100:]], 1)
+
+        covarianza = movil.covarianza
+        t_descomposicion, _ = medir(lambda: descomposicion_var(pesos, covarianza, 0.99), repeticiones)
+        t_mc, _ = medir(lambda: simular_var_es_portafolio(pesos, covarianza, (0.95, 0.99), n_sim=10000, procesos=1), repeticiones)
+        print(f"Portafolio de {tickers} tickers (n={n}): covarianza EWMA {t_ewma * 1e3:.1f} ms | ventana móvil {t_movil * 1e3:.1f} ms | "
+              f"por fecha {t_fecha_ewma * 10:.2f} / {t_fecha_movil * 10:.2f} ms | descomposición {t_descomposicion * 1e3:.2f} ms | "
+              f"Montecarlo (10,000) {t_mc * 1e3:.0f} ms")
+        sufijo = f"n={n} tickers={tickers}"
+        resultados.update({f"portafolio_covarianza_ewma {sufijo}": t_ewma, f"portafolio_covarianza_movil {sufijo}": t_movil,
+                           f"portafolio_fecha_ewma {sufijo}": t_fecha_ewma / 100, f"portafolio_fecha_movil {sufijo}": t_fecha_movil / 100,
+                           f"portafolio_descomposicion {sufijo}": t_descomposicion, f"portafolio_montecarlo {sufijo}": t_mc})
+    return resultados
+
+
+## Motor Montecarlo: tiempo con uno y con varios procesos, y verificación de que el resultado no cambia
+def benchmark_montecarlo(n_sim, repeticiones):
+    alphas = (0.95, 0.99, 0.999)
+    t_serial, (var_serial, es_serial) = medir(lambda: simular_var_es(0.0, 0.01, alphas, n_sim=n_sim, procesos=1), repeticiones)
+    t_paralelo, (var_paralelo, es_paralelo) = medir(lambda: simular_var_es(0.0, 0.01, alphas, n_sim=n_sim), repeticiones)
+    identicos = np.array_equal(var_serial, var_paralelo) and np.array_equal(es_serial, es_paralelo)
+    print(f"Montecarlo ({n_sim:,} simulaciones): 1 proceso {t_serial:.3f} s | {os.cpu_count()} procesos {t_paralelo:.3f} s | "
+          f"resultados idénticos: {identicos}")
+    return {f"montecarlo_serial n_sim={n_sim}": t_serial, f"montecarlo_paralelo n_sim={n_sim}": t_paralelo}
+
+
+## Bootstrap por bloques del VaR y ES (15 años de rendimientos diarios), en un proceso y repartido entre procesos
+def benchmark_bootstrap(n_replicas, repeticiones, n=15 * 252):
+    rendimientos = rendimientos_sinteticos(n).to_numpy()
+    alphas = (0.95, 0.975, 0.99)
+    t_serial, (var_serial, _) = medir(lambda: bootstrap_var_es(rendimientos, alphas, n_replicas, procesos=1), repeticiones)
+    t_paralelo, (var_paralelo, _) = medir(lambda: bootstrap_var_es(rendimientos, alphas, n_replicas), repeticiones)
+    print(f"Bootstrap por bloques ({n_replicas:,} réplicas de {n:,} días): 1 proceso {t_serial:.3f} s | "
+          f"{os.cpu_count()} procesos {t_paralelo:.3f} s | resultados idénticos: {np.array_equal(var_serial, var_paralelo)}")
+    return {f"bootstrap_serial replicas={n_replicas}": t_serial, f"bootstrap_paralelo replicas={n_replicas}": t_paralelo}
+
+
+## Tabla de VaR y ES en una sola llamada contra el ciclo original por alpha, con la malla de alphas de la página y una de 0.001
+def benchmark_tabla_var_es(n, repeticiones):
+    rendimientos = rendimientos_sinteticos(n)
+
+    def ciclo(alphas):
+        return [(var_es_parametrico(rendimientos, a), var_es_parametrico(rendimientos, a, 't-student'),
+                 var_es_historico(rendimientos, a), var_es_montecarlo(rendimientos, a)) for a in alphas]
+
+    resultados = {}
+    for alphas in ((0.95, 0.975, 0.99), tuple(np.round(np.arange(0.9, 0.9995, 0.001), 3))):
+        t_ciclo, _ = medir(lambda: ciclo(alphas), repeticiones)
+        t_tabla, _ = medir(lambda: tabla_var_es(rendimientos, alphas), repeticiones)
+        print(f"Tabla VaR/ES ({len(alphas)} alphas, n={n}): ciclo {t_ciclo * 1e3:.1f} ms | una llamada {t_tabla * 1e3:.2f} ms")
+        resultados.update({f"tabla_var_es_ciclo n={n} alphas={len(alphas)}": t_ciclo,
+                           f"tabla_var_es n={n} alphas={len(alphas)}": t_tabla})
+    return resultados
+
+
+## t de Student ajustada en todas las ventanas móviles: sin y con arranque en caliente, y VaR/ES de colas pesadas
+## completo (t y Cornish-Fisher) para varios tickers
+def benchmark_colas_pesadas(n, lista_tickers, repeticiones, ventana=252):
+    resultados = {}
+    if n <= ventana:
+        return resultados
+    ventanas = np.lib.stride_tricks.sliding_window_view(rendimientos_sinteticos(n).to_numpy(), ventana)
+    t_frio, _ = medir(lambda: ajustar_t(ventanas), repeticiones)
+    t_caliente, _ = medir(lambda: ajustar_t_anclas(ventanas), repeticiones)
+    print(f"t de Student móvil ({len(ventanas):,} ventanas de {ventana}): desde momentos {t_frio:.3f} s | "
+          f"arranque en caliente {t_caliente:.3f} s")
+    resultados.update({f"t_movil_frio n={n}": t_frio, f"t_movil_caliente n={n}": t_caliente})
+    for tickers in (tickers for tickers in lista_tickers if tickers <= 50):  ## Cada ticker cuesta lo mismo que una serie
+        rendimientos = rendimientos_log_matriz(precios_sinteticos(n, tickers))
+        t_colas, _ = medir(lambda: var_es_movil_colas_pesadas(rendimientos, ventana, (0.95, 0.99)), 1)
+        print(f"VaR/ES móvil de colas pesadas ({tickers} tickers, n={n}): {t_colas:.3f} s")
+        resultados[f"colas_pesadas_movil n={n} tickers={tickers}"] = t_colas
+    return resultados
+
+
+## Modelos EWMA y GARCH(1,1): tiempo de estimación y throughput del filtrado para muchos tickers
+def benchmark_volatilidad_condicional(n, lista_tickers, repeticiones):
+    ## Rendimientos simulados de un GARCH(1,1) con omega = 2e-6, alpha = 0.08 y beta = 0.9
+    generador = np.random.default_rng(0)
+    rendimientos, varianza = np.empty(n), 1e-4
+    for i in range(n):
+        rendimientos[i] = np.sqrt(varianza) * generador.standard_normal()
+        varianza = 2e-6 + 0.08 * rendimientos[i] ** 2 + 0.9 * varianza
+    t_ajuste, parametros = medir(lambda: ajustar_garch(rendimientos), repeticiones)
+    print(f"GARCH(1,1) (n={n}): estimación {t_ajuste * 1e3:.1f} ms | alpha {parametros['alpha']:.3f} beta {parametros['beta']:.3f}")
+    resultados = {f"ajuste_garch n={n}": t_ajuste}
+    for tickers in lista_tickers:
+        matriz = rendimientos_log_matriz(precios_sinteticos(n, tickers).to_numpy())
+        t_ewma, _ = medir(lambda: varianza_ewma(matriz), repeticiones)
+        t_garch, _ = medir(lambda: varianza_garch(matriz, [parametros] * tickers), repeticiones)
+        ## Estimación conjunta de todos los tickers (parámetros distintos por ticker en el filtrado)
+        t_ajuste_matriz, _ = medir(lambda: ajustar_garch(matriz), repeticiones)
+        print(f"Volatilidad condicional ({tickers} tickers): EWMA {n * tickers / t_ewma / 1e6:.1f} M obs/s | "
+              f"GARCH {n * tickers / t_garch / 1e6:.1f} M obs/s | estimación GARCH {t_ajuste_matriz * 1e3:.1f} ms")
+        resultados.update({f"varianza_ewma n={n} tickers={tickers}": t_ewma, f"varianza_garch n={n} tickers={tickers}": t_garch,
+                           f"ajuste_garch n={n} tickers={tickers}": t_ajuste_matriz})
+    return resultados
+
+
+## Modo de flujo: barras por segundo que procesa un solo ticker (un núcleo), y comparación con el cálculo por lotes
+def benchmark_flujo(n, ventanas=(390, 2520)):
+    rendimientos = rendimientos_sinteticos(n).to_numpy() / 10  ## Escala de barras de 1 minuto
+    precios = 100 * np.exp(np.concatenate(([0.0], np.cumsum(rendimientos))))
+    barras = pd.DataFrame({"Datetime": pd.date_range("2024-01-02 09:30", periods=n + 1, freq="min"), "Ticker": "T0", "Close": precios})
+    resultados = {}
+    for ventana in (ventana for ventana in ventanas if ventana < n):
+        motor = MotorFlujo(FuenteReproduccion(barras), ventana=ventana, historia=n)
+        segundos, _ = medir(motor.actualizar, 1)
+        metricas = motor.riesgos["T0"].historia_df()
+        referencia = var_es_movil(rendimientos, ventana, (0.95, 0.99))
+        diferencia = np.nanmax(np.abs(metricas[referencia.columns].to_numpy() - referencia.to_numpy()))
+        print(f"Flujo intradía (n={n}, ventana {ventana}): {(n + 1) / segundos:,.0f} barras/s por ticker | diferencia máxima {diferencia:.2e}")
+        resultados[f"flujo n={n} ventana={ventana}"] = segundos
+    return resultados
+
+
+## Ventana ordenada por bloques contra una lista ordenada con bisect: cada paso elimina el valor más antiguo, agrega
+## uno nuevo y, como RiesgoIncremental, consulta dos cuantiles con dos promedios de cola cada uno. La lista desplaza
+## O(ventana) elementos por paso; el cruce entre ambas fija cuantiles.VENTANA_MINIMA_BLOQUES
+def benchmark_cuantiles(n, ventanas=(20, 252, 2520, 5000, 20000)):
+    rendimientos = rendimientos_sinteticos(n).tolist()
+    resultados = {}
+    for ventana in (ventana for ventana in ventanas if ventana < n):
+        def recorrer(ordenada):
+            for saliente, entrante in zip(rendimientos, rendimientos[ventana:]):
+                ordenada.eliminar(saliente)
+                ordenada.agregar(entrante)
+                for p in (0.05, 0.01):
+                    posicion = p * (ventana - 1)
+                    bajo = int(posicion)
+                    menor = ordenada.kesimo(bajo)
+                    cuantil = menor + (posicion - bajo) * (ordenada.kesimo(bajo + 1) - menor)
+                    ordenada.media_cola(cuantil)
+                    ordenada.media_cola(cuantil * 1.01)
+
+        def con_ventana_ordenada():
+            recorrer(VentanaOrdenada(rendimientos[:ventana]))
+
+        def con_lista():
+            recorrer(ListaOrdenada(rendimientos[:ventana]))
+
+        t_bloques, _ = medir(con_ventana_ordenada, 1)
+        t_lista, _ = medir(con_lista, 1)
+        pasos = n - ventana
+        print(f"Cuantiles móviles (n={n}, ventana {ventana}): ventana ordenada {t_bloques / pasos * 1e6:.1f} µs/paso | "
+              f"lista ordenada {t_lista / pasos * 1e6:.1f} µs/paso")
+        resultados[f"cuantiles_ventana_ordenada n={n} ventana={ventana}"] = t_bloques
+        resultados[f"cuantiles_lista n={n} ventana={ventana}"] = t_lista
+    return resultados
+
+
+## Gráfica de la página Rolling Window (rendimientos y ocho métricas): imagen de matplotlib contra plotly, con y sin
+## reducción de puntos. Se mide el tiempo de generar lo que se envía al navegador y su tamaño en bytes
+def benchmark_graficas(n, repeticiones):
+    import io
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    rendimientos = rendimientos_sinteticos(n).set_axis(pd.date_range("2010-01-01", periods=n, freq="h"))
+    series = {"Rendimientos": rendimientos * 100, **{nombre: columna * 100 for nombre, columna in var_es_movil(rendimientos).items()}}
+
+    def imagen():
+        fig, ax = plt.subplots(figsize=(14, 7))
+        for nombre, serie in series.items():
+            ax.plot(serie.index, serie, label=nombre)
+        ax.legend()
+        ax.grid(True)
+        fig.tight_layout()
+        contenido = io.BytesIO()
+        fig.savefig(contenido, format="png", dpi=200, bbox_inches="tight")  ## Como lo hace st.pyplot
+        plt.close(fig)
+        return contenido.getvalue()
+
+    def interactiva(puntos):
+        fig = figura("", "Fecha", "Valor (%)")
+        for nombre, serie in series.items():
+            agregar_serie(fig, serie, nombre, None, puntos=puntos, metodo="minmax" if nombre == "Rendimientos" else "lttb")
+        return fig.to_json().encode()
+
+    resultados = {}
+    for clave, funcion in (("matplotlib", imagen), ("plotly_completa", lambda: interactiva(n)), ("plotly_reducida", lambda: interactiva(ANCHO_PIXELES))):
+        segundos, contenido = medir(funcion, repeticiones)
+        resultados[f"grafica_{clave} n={n}"] = segundos
+        print(f"Gráfica {clave} (n={n}, {len(series)} series): {segundos * 1e3:.1f} ms | {len(contenido) / 1024:.0f} KiB")
+    return resultados
+
+
+## Código que mide en un proceso nuevo los rendimientos y el VaR y ES móviles de una matriz de precios guardada en un
+## archivo .npy, como DataFrame (float64) o como panel (float64 o float32): el tiempo y el RSS máximo del proceso
+_MEDIR_PANEL = """
+import json, resource, sys, time
+import numpy as np, pandas as pd
+from panel import Panel
+from riesgo import rendimientos_log_matriz, var_es_movil
+modo, archivo, ventana = sys.argv[1], sys.argv[2], int(sys.argv[3])
+precios = pd.DataFrame(np.load(archivo))
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+inicio = time.perf_counter()
+if modo == "dataframe":
+    resultado = var_es_movil(rendimientos_log_matriz(precios), ventana)
+    tamaño = resultado.memory_usage(index=False).sum()
+else:
+    resultado = var_es_movil(Panel.rendimientos(precios, modo), ventana)
+    tamaño = resultado.nbytes
+segundos = time.perf_counter() - inicio
+pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({"segundos": segundos, "base": base, "pico": pico, "resultado": tamaño / 2 ** 20}))
+"""
+
+
+## VaR y ES móviles de muchos tickers como DataFrame y como panel compacto (ver panel.py): tiempo, RSS máximo del
+## proceso (en MiB, con los precios ya cargados como base) y diferencia máxima del panel float32 contra float64
+def benchmark_panel(n, tickers=5000, ventana=252):
+    import subprocess
+    import tempfile
+
+    from panel import Panel
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        archivo = os.path.join(directorio, "precios.npy")
+        np.save(archivo, precios_sinteticos(n, tickers).to_numpy())
+        for modo in ("dataframe", "float64", "float32"):
+            salida = subprocess.run([sys.executable, "-c", _MEDIR_PANEL, modo, archivo, str(ventana)], capture_output=True,
+                                    text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if salida.returncode != 0:
+                print(f"VaR y ES móviles como {modo} (n={n}, {tickers} tickers): falló ({salida.stderr.strip().splitlines()[-1:]})")
+                continue
+            medicion = json.loads(salida.stdout.strip().splitlines()[-1])
+            print(f"VaR y ES móviles como {modo} (n={n}, {tickers} tickers): {medicion['segundos']:.2f} s | RSS máximo "
+                  f"{medicion['pico']:,.0f} MiB (base {medicion['base']:,.0f} MiB) | resultado {medicion['resultado']:,.0f} MiB")
+            resultados[f"panel_{modo} n={n} tickers={tickers}"] = medicion["segundos"]
+
+    ## Precisión de float32 en una muestra de tickers
+    precios = precios_sinteticos(n, min(tickers, 50))
+    exacto = var_es_movil(Panel.rendimientos(precios, np.float64), ventana).valores
+    compacto = var_es_movil(Panel.rendimientos(precios, np.float32), ventana).valores
+    with np.errstate(invalid="ignore"):
+        relativa = np.nanmax(np.abs(compacto - exacto) / np.abs(exacto))
+    print(f"Panel float32 contra float64: diferencia máxima {np.nanmax(np.abs(compacto - exacto)):.1e} (relativa {relativa:.1e})")
+    return resultados
+
+
+## Módulos pesados cuya importación se reporta en el arranque de las páginas
+MODULOS_PESADOS = ("scipy.stats", "yfinance", "matplotlib.pyplot", "plotly.express", "seaborn")
+
+## Código que mide una página en un proceso nuevo. Streamlit ya está importado en el servidor, por lo que no se cuenta.
+## Con "importaciones" se miden solo las instrucciones import de la página; con "ejecucion", la primera ejecución
+## (importaciones, carga de datos y cálculos en frío, como la primera visita después de iniciar el servidor) y la
+## siguiente (con los módulos y la caché ya cargados)
+_MEDIR_PAGINA = """
+import ast, json, sys, time
+import streamlit
+from streamlit.testing.v1 import AppTest
+modo, pagina, pesados = sys.argv[1], sys.argv[2], sys.argv[3].split(",")
+resultado = {}
+if modo == "importaciones":
+    arbol = ast.parse(open(pagina, encoding="utf-8").read())
+    codigo = compile(ast.Module([nodo for nodo in arbol.body if isinstance(nodo, (ast.Import, ast.ImportFrom))], []), pagina, "exec")
+    inicio = time.perf_counter()
+    exec(codigo, {})
+    resultado["importaciones"] = time.perf_counter() - inicio
+    resultado["pesados"] = [modulo for modulo in pesados if modulo in sys.modules]
+else:
+    prueba = AppTest.from_file(pagina, default_timeout=600)
+    for clave in ("primera", "siguiente"):
+        inicio = time.perf_counter()
+        prueba.run()
+        resultado[clave] = time.perf_counter() - inicio
+    resultado["error"] = str(prueba.exception[0].value) if prueba.exception else None
+print(json.dumps(resultado))
+"""
+
+
+## Tiempo de importación y de la primera ejecución de cada página, cada una en un proceso nuevo. Las páginas usan
+## los datos del entorno (por ejemplo, PRECIOS_LOCALES para no descargar de Yahoo Finance)
+def benchmark_paginas(paginas=None):
+    import glob
+    import subprocess
+
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    paginas = paginas or [os.path.join(raiz, "Homepage.py")] + sorted(glob.glob(os.path.join(raiz, "pages", "*.py")))
+    resultados = {}
+    for pagina in paginas:
+        medicion = {}
+        for modo in ("importaciones", "ejecucion"):
+            salida = subprocess.run([sys.executable, "-c", _MEDIR_PAGINA, modo, pagina, ",".join(MODULOS_PESADOS)],
+                                    capture_output=True, text=True, cwd=raiz)
+            medicion.update(json.loads(salida.stdout.strip().splitlines()[-1]))
+        nombre = os.path.splitext(os.path.basename(pagina))[0]
+        error = f" | error: {medicion['error']}" if medicion["error"] else ""
+        print(f"Página {nombre}: importaciones {medicion['importaciones'] * 1e3:.0f} ms "
+              f"({', '.join(medicion['pesados']) or 'sin módulos pesados'}) | primera ejecución {medicion['primera']:.2f} s | "
+              f"siguiente {medicion['siguiente'] * 1e3:.0f} ms{error}")
+        resultados[f"pagina_importaciones {nombre}"] = medicion["importaciones"]
+        resultados[f"pagina_primera {nombre}"] = medicion["primera"]
+    return resultados
+
+
+## Descripción del equipo y de las versiones, para saber si dos archivos de resultados son comparables
+def entorno():
+    return {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+        "sistema": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+## Compara los tiempos con los de una línea base; regresa las mediciones más lentas que la base por más de la tolerancia
+def comparar(resultados, base, tolerancia=0.25):
+    regresiones = []
+    print(f"\n{'Medición':<60} {'base':>10} {'actual':>10} {'razón':>7}")
+    for nombre, segundos in resultados.items():
+        if nombre not in base:
+            continue
+        razon = segundos / base[nombre]
+        marca = ""
+        if razon > 1 + tolerancia:
+            regresiones.append(nombre)
+            marca = "  <- más lento"
+        print(f"{nombre:<60} {base[nombre] * 1e3:>8.2f}ms {segundos * 1e3:>8.2f}ms {razon:>6.2f}x{marca}")
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de las métricas de riesgo")
+    parser.add_argument("--n", type=int, nargs="+", default=[4000], help="Longitudes de las series sintéticas (p. ej. 1000 1000000)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--n-sim", type=int, default=10_000_000, help="Simulaciones del motor Montecarlo")
+    parser.add_argument("--replicas", type=int, default=10_000, help="Réplicas del bootstrap por bloques")
+    parser.add_argument("--tickers", type=int, nargs="+", default=[1, 50, 500], help="Números de tickers del lote")
+    parser.add_argument("--guardar", default=None, help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", default=None, help="Archivo JSON con una línea base para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Aumento relativo permitido respecto a la base")
+    parser.add_argument("--paginas", action="store_true", help="Medir también la importación y la primera ejecución de las páginas")
+    parser.add_argument("--panel", type=int, default=None, help="Número de tickers para medir el RSS máximo con el panel compacto (p. ej. 5000)")
+    args = parser.parse_args()
+
+    resultados = {}
+    for n in args.n:
+        resultados.update(benchmark_rendimientos(n, args.repeticiones))
+        resultados.update(benchmark_var_es_movil(n, args.repeticiones))
+        resultados.update(benchmark_volatilidad_movil(n, args.repeticiones))
+        resultados.update(benchmark_violaciones(n, args.repeticiones))
+        resultados.update(benchmark_tabla_var_es(n, args.repeticiones))
+        resultados.update(benchmark_lote(n, args.tickers, args.repeticiones))
+        resultados.update(benchmark_diagnosticos(n, args.tickers, args.repeticiones))
+        resultados.update(benchmark_escenarios(n, args.tickers, args.repeticiones))
+        resultados.update(benchmark_volatilidad_condicional(n, args.tickers, args.repeticiones))
+        resultados.update(benchmark_portafolio(n, args.tickers, args.repeticiones))
+        resultados.update(benchmark_colas_pesadas(n, args.tickers, args.repeticiones))
+        resultados.update(benchmark_flujo(n))
+        resultados.update(benchmark_cuantiles(n))
+        resultados.update(benchmark_graficas(n, args.repeticiones))
+    resultados.update(benchmark_montecarlo(args.n_sim, args.repeticiones))
+    resultados.update(benchmark_bootstrap(args.replicas, args.repeticiones))
+    if args.panel:
+        for n in args.n:
+            resultados.update(benchmark_panel(n, args.panel))
+    if args.paginas:
+        resultados.update(benchmark_paginas())
+
+    if args.guardar:
+        contenido = {"entorno": entorno(), "parametros": vars(args), "resultados": resultados}
+        with open(args.guardar, "w") as archivo:
+            json.dump(contenido, archivo, ensure_ascii=False, indent=1)
+        print(f"\nResultados guardados en {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            regresiones = comparar(resultados, json.load(archivo)["resultados"], args.tolerancia)
+        if regresiones:
+            print(f"\n{len(regresiones)} mediciones más lentas que la base: {', '.join(regresiones)}")
+            sys.exit(1)
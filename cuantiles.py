@@ -0,0 +1,225 @@
+"""
+En este código se encuentra la ventana ordenada que usan los cálculos incrementales de cuantiles y promedios de cola.
+
+Los valores se guardan en bloques ordenados de a lo más ``2 * carga`` elementos (una lista ordenada por bloques).
+Insertar o eliminar un valor cuesta una búsqueda binaria sobre los máximos de los bloques, más un desplazamiento
+dentro de un solo bloque, cuyo tamaño no depende de la ventana. Los conteos y las sumas de los bloques se guardan en
+árboles de Fenwick, de modo que el k-ésimo valor, la suma de los k menores y el número de valores que no superan un
+umbral se obtienen en O(log w). Con esto, cada paso de la ventana móvil responde varios cuantiles y el promedio de la
+cola debajo de cada uno sin ordenar la ventana completa.
+"""
+
+import bisect
+import math
+
+## Tamaño de referencia de los bloques
+CARGA = 64
+
+## Ventana a partir de la cual la ventana por bloques es más rápida que una lista ordenada (ver benchmark_cuantiles)
+VENTANA_MINIMA_BLOQUES = 4_000
+
+
+class VentanaOrdenada:
+    """
+    Multiconjunto ordenado de números con inserción y eliminación en O(log w) y consultas de orden.
+
+    Las sumas de los árboles se actualizan con altas y bajas; cada ``reanclaje`` cambios se recalculan de manera exacta
+    a partir de los bloques, para que el error de redondeo no se acumule (igual que en ``riesgo.MomentosMoviles``).
+    """
+
+    def __init__(self, valores=(), carga=CARGA, reanclaje=10_000):
+        self.carga = carga
+        self.reanclaje = reanclaje
+        ordenados = sorted(float(valor) for valor in valores)
+        self._bloques = [ordenados[i:i + carga] for i in range(0, len(ordenados), carga)]
+        self._n = len(ordenados)
+        self._cambios = 0
+        self._reconstruir()
+
+    def __len__(self):
+        return self._n
+
+    ## Recalcula de manera exacta los máximos y las sumas de todos los bloques, y los árboles
+    def _reconstruir(self):
+        self._maximos = [bloque[-1] for bloque in self._bloques]
+        self._sumas = [math.fsum(bloque) for bloque in self._bloques]
+        self._construir_arboles()
+
+    ## Construye los árboles de Fenwick a partir de los tamaños y las sumas de los bloques, en O(número de bloques)
+    def _construir_arboles(self):
+        m = len(self._bloques)
+        self._arbol_conteos = [0] + [len(bloque) for bloque in self._bloques]
+        self._arbol_sumas = [0.0] + self._sumas
+        for i in range(1, m + 1):
+            padre = i + (i & -i)
+            if padre <= m:
+                self._arbol_conteos[padre] += self._arbol_conteos[i]
+                self._arbol_sumas[padre] += self._arbol_sumas[i]
+        ## La mayor potencia de 2 que no supera el número de bloques, para el descenso en el árbol
+        self._paso_inicial = 1 << (m.bit_length() - 1) if m else 0
+
+    ## Reemplaza los bloques [a, b) por ``nuevos`` (al dividir o unir bloques) y reconstruye los árboles
+    def _reemplazar(self, a, b, nuevos):
+        self._bloques[a:b] = nuevos
+        self._maximos[a:b] = [bloque[-1] for bloque in nuevos]
+        self._sumas[a:b] = [math.fsum(bloque) for bloque in nuevos]
+        self._construir_arboles()
+
+    def _actualizar(self, i, conteo, suma):
+        self._sumas[i] += suma
+        i += 1
+        m = len(self._bloques)
+        while i <= m:
+            self._arbol_conteos[i] += conteo
+            self._arbol_sumas[i] += suma
+            i += i & -i
+
+    ## Número y suma de los valores de los primeros ``j`` bloques
+    def _prefijo(self, j):
+        conteo, suma = 0, 0.0
+        while j > 0:
+            conteo += self._arbol_conteos[j]
+            suma += self._arbol_sumas[j]
+            j -= j & -j
+        return conteo, suma
+
+    ## Bloque que contiene la posición k (0 <= k < n), con el número y la suma de los valores de los bloques anteriores
+    def _ubicar(self, k):
+        j, conteo, suma = 0, 0, 0.0
+        paso = self._paso_inicial
+        while paso:
+            siguiente = j + paso
+            if siguiente <= len(self._bloques) and conteo + self._arbol_conteos[siguiente] <= k:
+                j = siguiente
+                conteo += self._arbol_conteos[siguiente]
+                suma += self._arbol_sumas[siguiente]
+            paso >>= 1
+        return j, conteo, suma
+
+    def _contar_cambio(self):
+        self._cambios += 1
+        if self._cambios % self.reanclaje == 0:
+            self._reconstruir()
+
+    def agregar(self, valor):
+        valor = float(valor)
+        self._n += 1
+        if not self._bloques:
+            self._reemplazar(0, 0, [[valor]])
+            return
+        i = min(bisect.bisect_left(self._maximos, valor), len(self._bloques) - 1)
+        bloque = self._bloques[i]
+        bisect.insort(bloque, valor)
+        if len(bloque) > 2 * self.carga:  ## El bloque se divide en dos
+            self._reemplazar(i, i + 1, [bloque[:self.carga], bloque[self.carga:]])
+            return
+        self._maximos[i] = bloque[-1]
+        self._actualizar(i, 1, valor)
+        self._contar_cambio()
+
+    def eliminar(self, valor):
+        valor = float(valor)
+        i = bisect.bisect_left(self._maximos, valor)
+        bloque = self._bloques[i] if i < len(self._bloques) else []
+        j = bisect.bisect_left(bloque, valor)
+        if j == len(bloque) or bloque[j] != valor:
+            raise ValueError(f"{valor} no está en la ventana")
+        del bloque[j]
+        self._n -= 1
+        ## Los bloques muy pequeños se unen con su vecino para que el número de bloques se mantenga acotado
+        if len(bloque) < self.carga // 4 and len(self._bloques) > 1:
+            vecino = i + 1 if i + 1 < len(self._bloques) else i - 1
+            a, b = min(i, vecino), max(i, vecino)
+            unido = self._bloques[a] + self._bloques[b]
+            mitad = len(unido) // 2
+            self._reemplazar(a, b + 1, [unido] if len(unido) <= 2 * self.carga else [unido[:mitad], unido[mitad:]])
+            return
+        if not bloque:
+            self._reemplazar(i, i + 1, [])
+            return
+        self._maximos[i] = bloque[-1]
+        self._actualizar(i, -1, -valor)
+        self._contar_cambio()
+
+    ## k-ésimo valor más pequeño (empezando en 0)
+    def kesimo(self, k):
+        if not 0 <= k < self._n:
+            raise IndexError("Posición fuera de la ventana")
+        j, conteo, _ = self._ubicar(k)
+        return self._bloques[j][k - conteo]
+
+    ## Suma de los k valores más pequeños
+    def suma_menores(self, k):
+        if k <= 0:
+            return 0.0
+        if k >= self._n:
+            return self._prefijo(len(self._bloques))[1]
+        j, conteo, suma = self._ubicar(k)
+        return suma + math.fsum(self._bloques[j][:k - conteo])
+
+    ## Número de valores que no superan el umbral
+    def contar_hasta(self, umbral):
+        j = bisect.bisect_right(self._maximos, umbral)
+        conteo, _ = self._prefijo(j)
+        return conteo + (bisect.bisect_right(self._bloques[j], umbral) if j < len(self._bloques) else 0)
+
+    ## Cuantil con interpolación lineal, igual que ``np.quantile``
+    def cuantil(self, p):
+        posicion = p * (self._n - 1)
+        bajo = int(math.floor(posicion))
+        valor = self.kesimo(bajo)
+        if bajo + 1 < self._n and posicion > bajo:
+            valor += (posicion - bajo) * (self.kesimo(bajo + 1) - valor)
+        return valor
+
+    ## Promedio de los valores que no superan el umbral (NaN si no hay ninguno)
+    def media_cola(self, umbral):
+        ## El conteo y la suma de los bloques completos salen del mismo recorrido del árbol
+        j = bisect.bisect_right(self._maximos, umbral)
+        conteo, suma = self._prefijo(j)
+        if j < len(self._bloques):
+            bloque = self._bloques[j]
+            posicion = bisect.bisect_right(bloque, umbral)
+            conteo += posicion
+            suma += math.fsum(bloque[:posicion])
+        return suma / conteo if conteo else math.nan
+
+
+class ListaOrdenada:
+    """
+    Lista ordenada simple con la misma interfaz que ``VentanaOrdenada`` (``agregar``, ``eliminar``, ``kesimo`` y
+    ``media_cola``). Insertar y eliminar desplazan O(w) elementos y el promedio de cola suma la cola completa, pero
+    con código compilado (``bisect`` y ``math.fsum``) que en ventanas pequeñas es más rápido que los árboles.
+    """
+
+    def __init__(self, valores=()):
+        self._valores = sorted(float(valor) for valor in valores)
+
+    def __len__(self):
+        return len(self._valores)
+
+    def agregar(self, valor):
+        bisect.insort(self._valores, float(valor))
+
+    def eliminar(self, valor):
+        valor = float(valor)
+        i = bisect.bisect_left(self._valores, valor)
+        if i == len(self._valores) or self._valores[i] != valor:
+            raise ValueError(f"{valor} no está en la ventana")
+        del self._valores[i]
+
+    ## k-ésimo valor más pequeño (empezando en 0)
+    def kesimo(self, k):
+        if not 0 <= k < len(self._valores):
+            raise IndexError("Posición fuera de la ventana")
+        return self._valores[k]
+
+    ## Promedio de los valores que no superan el umbral (NaN si no hay ninguno)
+    def media_cola(self, umbral):
+        k = bisect.bisect_right(self._valores, umbral)
+        return math.fsum(self._valores[:k]) / k if k else math.nan
+
+
+def ventana_ordenada(ventana):
+    """Estructura ordenada más rápida para una ventana de ``ventana`` valores (ver ``VENTANA_MINIMA_BLOQUES``)."""
+    return VentanaOrdenada() if ventana >= VENTANA_MINIMA_BLOQUES else ListaOrdenada()
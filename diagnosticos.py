@@ -0,0 +1,279 @@
+"""
+En este código se encuentra el motor de diagnósticos de la distribución de los rendimientos de la página Análisis
+Financiero: momentos (media, varianza, sesgo y curtosis en exceso), cuantiles de las colas, prueba de Jarque-Bera,
+histograma y densidad kernel (KDE). Todas las funciones reciben una serie o una matriz (fechas × tickers) y calculan
+todas las columnas a la vez; los datos faltantes se omiten.
+
+- Momentos en una sola pasada: los datos se recorren por bloques de fechas y de cada bloque se acumulan las sumas de
+  las potencias 1 a 4 de los rendimientos menos un centro (la media del primer bloque, para que no haya cancelación
+  numérica); los momentos centrales salen de esas sumas con el binomio de Newton. Las mismas sumas acumuladas por
+  fecha dan los momentos de todas las ventanas móviles en O(n).
+- Histograma: cada valor se asigna a su intervalo con una división (con los mismos bordes que ``np.histogram``) y
+  los conteos de todas las columnas salen de un solo ``np.bincount``.
+- KDE gaussiana por binning lineal y FFT: cada valor se reparte entre los dos puntos vecinos de una malla regular, en
+  proporción a su distancia, y la densidad en la malla es la convolución de esos pesos con el kernel, que se hace con
+  la FFT en O(M log M) en lugar de evaluar el kernel en cada par (punto, dato), que cuesta O(n · M). El ancho de
+  banda es el de Scott, como en ``scipy.stats.gaussian_kde``, y la malla tiene al menos ``PUNTOS_POR_ANCHO`` puntos
+  por ancho de banda, con lo que la diferencia contra ``gaussian_kde`` es del orden de 1e-4 de la densidad máxima.
+
+Como en riesgo.py, el sesgo y la curtosis son los estimadores sin corrección por sesgo (los de ``scipy.stats.skew``
+y ``scipy.stats.kurtosis``), con los que se calcula el estadístico de Jarque-Bera, ``n / 6 * (S² + K² / 4)``, cuyo
+p-valor (ji cuadrada con 2 grados de libertad) es ``exp(-JB / 2)``.
+"""
+
+import numpy as np
+
+## Número de valores (fechas × tickers) que se procesan a la vez
+TAMAÑO_BLOQUE = 2 ** 20
+
+## Probabilidades de los cuantiles de las colas que se reportan
+PROBABILIDADES_COLAS = (0.01, 0.05, 0.95, 0.99)
+
+## Malla de la KDE: puntos por ancho de banda, anchos de banda de margen a cada lado de los datos y límites del
+## número de puntos (potencias de 2, para la FFT)
+PUNTOS_POR_ANCHO = 4
+MARGEN_ANCHOS = 4
+PUNTOS_MINIMOS = 512
+PUNTOS_MAXIMOS = 2 ** 14
+
+
+## Rendimientos como matriz (fechas × tickers), junto con si la entrada era una sola serie. Los valores float32 (por
+## ejemplo, de un panel) no se copian: los cálculos se hacen en float64 por bloques
+def _matriz(rendimientos):
+    x = np.asarray(rendimientos)
+    if x.dtype not in (np.float32, np.float64):
+        x = x.astype(np.float64)
+    return (x[:, None], True) if x.ndim == 1 else (x, False)
+
+
+## Media de cada columna omitiendo los NaN (cero en las columnas sin datos), que sirve de centro de las sumas
+def _centro(x):
+    return np.nansum(x, axis=0, dtype=np.float64) / np.maximum((~np.isnan(x)).sum(axis=0), 1)
+
+
+## Mínimo y máximo de cada columna omitiendo los NaN (NaN en las columnas sin datos)
+def _extremos(x):
+    if not len(x):
+        return np.full(x.shape[1], np.nan), np.full(x.shape[1], np.nan)
+    return np.fmin.reduce(x, axis=0).astype(np.float64), np.fmax.reduce(x, axis=0).astype(np.float64)
+
+
+## Quita la dimensión de los tickers a los resultados de una sola serie
+def _salida(valores, una_serie):
+    if not una_serie:
+        return valores
+    return {nombre: (float(valor[0]) if np.ndim(valor) == 1 else valor[..., 0]) for nombre, valor in valores.items()}
+
+
+## Sumas de las potencias 1 a 4 de ``x - centro`` (y número de datos) por columna, omitiendo los NaN
+def _sumas_bloque(x, centro):
+    d = x - centro
+    validos = ~np.isnan(d)
+    d[~validos] = 0.0
+    d2 = d * d
+    return np.array([validos.sum(axis=0), d.sum(axis=0), d2.sum(axis=0), (d2 * d).sum(axis=0), (d2 * d2).sum(axis=0)])
+
+
+## Media, momentos centrales 2 a 4 (ddof=0), varianza (ddof=1), sesgo, curtosis en exceso y Jarque-Bera a partir de
+## las sumas de potencias alrededor de ``centro`` (arreglos de cualquier forma, por ejemplo fechas × tickers)
+def _momentos_de_sumas(n, s1, s2, s3, s4, centro):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        m1, e2, e3, e4 = s1 / n, s2 / n, s3 / n, s4 / n
+        m1_2 = m1 * m1  ## Productos en lugar de potencias, que son mucho más lentas en numpy
+        m2 = np.maximum(e2 - m1_2, 0.0)
+        m3 = e3 - m1 * (3 * e2 - 2 * m1_2)
+        m4 = e4 - m1 * (4 * e3 - m1 * (6 * e2 - 3 * m1_2))
+        sesgo = m3 / (m2 * np.sqrt(m2))
+        curtosis = m4 / (m2 * m2) - 3
+        jarque_bera = n / 6 * (sesgo * sesgo + curtosis * curtosis / 4)
+        return {"Observaciones": n, "Media": centro + m1, "Varianza": m2 * n / (n - 1), "Sesgo": sesgo,
+                "Curtosis": curtosis, "Jarque-Bera": jarque_bera, "p-valor Jarque-Bera": np.exp(-jarque_bera / 2)}
+
+
+def momentos(rendimientos, tamaño_bloque=TAMAÑO_BLOQUE):
+    """
+    Momentos de cada columna en una sola pasada por bloques de fechas: regresa un diccionario con el número de
+    observaciones, la media, la varianza (ddof=1), el sesgo, la curtosis en exceso, el estadístico de Jarque-Bera y
+    su p-valor; cada valor es un arreglo por ticker, o un escalar para una serie.
+    """
+    x, una_serie = _matriz(rendimientos)
+    filas = max(1, tamaño_bloque // x.shape[1])
+    centro = _centro(x[:filas])
+    sumas = np.zeros((5, x.shape[1]))
+    for inicio in range(0, len(x), filas):
+        sumas += _sumas_bloque(x[inicio:inicio + filas], centro)
+    return _salida(_momentos_de_sumas(*sumas, centro), una_serie)
+
+
+def cuantiles_colas(rendimientos, probabilidades=PROBABILIDADES_COLAS):
+    """
+    Cuantiles (con interpolación lineal, como pandas) de cada columna: un arreglo de tamaño
+    (len(probabilidades), tickers), o uno por probabilidad para una serie. Sin datos faltantes se usa
+    ``np.quantile``, que solo particiona; con datos faltantes se ordena cada columna una sola vez.
+    """
+    x, una_serie = _matriz(rendimientos)
+    probabilidades = np.asarray(probabilidades, dtype=np.float64)
+    faltantes = np.isnan(x)
+    if not faltantes.any():
+        cuantiles = np.quantile(x, probabilidades, axis=0)
+    else:
+        ordenadas = np.sort(x, axis=0)  ## Los NaN quedan al final de cada columna
+        n = (~faltantes).sum(axis=0)
+        posicion = probabilidades[:, None] * np.maximum(n - 1, 0)
+        bajo = np.floor(posicion).astype(np.int64)
+        alto = np.minimum(bajo + 1, np.maximum(n - 1, 0))
+        cuantiles = np.take_along_axis(ordenadas, bajo, axis=0)
+        cuantiles = cuantiles + (posicion - bajo) * (np.take_along_axis(ordenadas, alto, axis=0) - cuantiles)
+        cuantiles[:, n == 0] = np.nan
+    return cuantiles[:, 0] if una_serie else cuantiles
+
+
+def diagnostico(rendimientos, probabilidades=PROBABILIDADES_COLAS):
+    """Momentos, Jarque-Bera y cuantiles de las colas (con nombres como ``Cuantil 1%``) en un solo diccionario."""
+    resultado = momentos(rendimientos)
+    for probabilidad, valores in zip(probabilidades, cuantiles_colas(rendimientos, probabilidades)):
+        resultado[f"Cuantil {probabilidad * 100:g}%"] = float(valores) if np.ndim(valores) == 0 else valores
+    return resultado
+
+
+def momentos_moviles(rendimientos, ventana=252):
+    """
+    Momentos de cada ventana que termina en la fecha i (incluida), para todas las columnas: las mismas claves que
+    ``momentos`` con arreglos (fechas × tickers), con NaN en las primeras ``ventana - 1`` fechas y en las ventanas
+    con datos faltantes. Las sumas de potencias de cada ventana son diferencias de sumas acumuladas, alrededor de la
+    media de cada columna; las columnas se procesan por grupos para acotar la memoria.
+    """
+    x, una_serie = _matriz(rendimientos)
+    n, m = x.shape
+    nombres = list(_momentos_de_sumas(*np.ones((6, 1))))
+    resultado = {nombre: np.full((n, m), np.nan) for nombre in nombres}
+    if n >= ventana:
+        por_grupo = max(1, TAMAÑO_BLOQUE // n)
+        for inicio in range(0, m, por_grupo):
+            grupo = slice(inicio, inicio + por_grupo)
+            bloque = x[:, grupo]
+            centro = _centro(bloque)
+            d = bloque - centro
+            faltantes = np.isnan(d)
+            d[faltantes] = 0.0
+            d2 = d * d
+            acumuladas = np.zeros((5, n + 1, d.shape[1]))
+            for fila, potencia in enumerate((faltantes, d, d2, d2 * d, d2 * d2)):
+                np.cumsum(potencia, axis=0, out=acumuladas[fila, 1:])
+            sumas = acumuladas[:, ventana:] - acumuladas[:, :-ventana]
+            observaciones = np.where(sumas[0] == 0, float(ventana), np.nan)  ## Ventanas con faltantes: NaN
+            valores = _momentos_de_sumas(observaciones, *sumas[1:], centro)
+            for nombre in nombres:
+                resultado[nombre][ventana - 1:, grupo] = valores[nombre]
+    return {nombre: valores[:, 0] for nombre, valores in resultado.items()} if una_serie else resultado
+
+
+def histograma(rendimientos, intervalos=50):
+    """
+    Histograma de cada columna con ``intervalos`` intervalos iguales entre su mínimo y su máximo (los mismos bordes
+    y conteos que ``np.histogram``). Regresa los conteos (tickers × intervalos) y los bordes
+    (tickers × intervalos + 1), o un arreglo de cada uno para una serie.
+    """
+    x, una_serie = _matriz(rendimientos)
+    m = x.shape[1]
+    minimo, maximo = _extremos(x)
+    iguales = minimo == maximo  ## Como np.histogram: con un solo valor el rango es (valor - 0.5, valor + 0.5)
+    minimo, maximo = np.where(iguales, minimo - 0.5, minimo), np.where(iguales, maximo + 0.5, maximo)
+    bordes = np.linspace(minimo, maximo, intervalos + 1, axis=1)
+
+    conteos = np.zeros(m * intervalos, dtype=np.int64)
+    filas = max(1, TAMAÑO_BLOQUE // m)
+    planos, base = bordes.ravel(), np.arange(m) * (intervalos + 1)
+    for inicio in range(0, len(x), filas):
+        bloque = x[inicio:inicio + filas]
+        validos = ~np.isnan(bloque)
+        with np.errstate(invalid="ignore"):
+            posicion = (bloque - minimo) * (intervalos / (maximo - minimo))
+        if not validos.all():
+            posicion[~validos] = 0.0
+        indice = np.clip(posicion.astype(np.int64), 0, intervalos - 1)  ## Las posiciones son positivas: truncar es floor
+        ## Corrección por redondeo junto a los bordes, igual que np.histogram
+        indice += base
+        indice -= bloque < planos[indice]
+        indice += (bloque >= planos[indice + 1]) & ((indice - base) != intervalos - 1)
+        indice -= np.arange(m)  ## De la posición en los bordes (intervalos + 1 por ticker) a la de los conteos
+        conteos += np.bincount(indice[validos] if not validos.all() else indice.ravel(), minlength=m * intervalos)
+    conteos = conteos.reshape(m, intervalos)
+    return (conteos[0], bordes[0]) if una_serie else (conteos, bordes)
+
+
+## Número de puntos de la malla de la KDE: suficientes para ``PUNTOS_POR_ANCHO`` por ancho de banda
+def _puntos_malla(rango, ancho):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        necesarios = np.nanmax(PUNTOS_POR_ANCHO * (rango / ancho + 2 * MARGEN_ANCHOS))
+    if not np.isfinite(necesarios):
+        return PUNTOS_MINIMOS
+    return int(min(PUNTOS_MAXIMOS, max(PUNTOS_MINIMOS, 2 ** int(np.ceil(np.log2(necesarios))))))
+
+
+def densidad_kde(rendimientos, malla=None, ancho=None):
+    """
+    Densidad kernel gaussiana de cada columna por binning lineal y FFT, con el ancho de banda de Scott
+    (``desviación * n^(-1/5)``) o el dado. Sin ``malla`` regresa la malla regular (tickers × M) y la densidad en
+    ella; con ``malla`` (un arreglo de puntos común a todas las columnas, o uno por columna) regresa la densidad
+    interpolada en esos puntos. Para una serie se quita la dimensión de los tickers.
+    """
+    x, una_serie = _matriz(rendimientos)
+    m = x.shape[1]
+    resumen = momentos(x)
+    n = resumen["Observaciones"]
+    if ancho is None:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ancho = np.sqrt(resumen["Varianza"]) * n ** -0.2
+    ancho = np.broadcast_to(np.asarray(ancho, dtype=np.float64), (m,))
+    minimo, maximo = _extremos(x)
+    puntos = _puntos_malla(maximo - minimo, ancho)
+    inicio_malla = minimo - MARGEN_ANCHOS * ancho
+    paso = (maximo - minimo + 2 * MARGEN_ANCHOS * ancho) / (puntos - 1)
+
+    ## Binning lineal: cada dato suma 1 - w a su punto de la malla y w al siguiente
+    pesos = np.zeros(m * puntos)
+    filas = max(1, TAMAÑO_BLOQUE // m)
+    desplazamiento = np.arange(m) * puntos
+    for inicio in range(0, len(x), filas):
+        bloque = x[inicio:inicio + filas]
+        with np.errstate(invalid="ignore", divide="ignore"):  ## Columnas constantes: ancho de banda cero
+            posicion = (bloque - inicio_malla) / paso
+        validos = np.isfinite(posicion)
+        if not validos.all():
+            posicion = np.where(validos, posicion, 0.0)
+        indice = np.minimum(posicion.astype(np.int64), puntos - 2)  ## Las posiciones son positivas: truncar es floor
+        fraccion = posicion - indice
+        indice += desplazamiento
+        if not validos.all():
+            indice, fraccion = indice[validos], fraccion[validos]
+        pesos += np.bincount(indice.ravel(), weights=(1 - fraccion).ravel(), minlength=m * puntos)
+        pesos += np.bincount(indice.ravel() + 1, weights=fraccion.ravel(), minlength=m * puntos)
+    pesos = pesos.reshape(m, puntos)
+
+    ## Convolución con el kernel por FFT, con la malla extendida al doble para que no se mezclen los extremos. La
+    ## transformada del kernel gaussiano muestreado es a su vez gaussiana (con al menos ``PUNTOS_POR_ANCHO`` puntos
+    ## por ancho de banda el error por muestrear es despreciable), así que no se calcula el kernel en la malla
+    largo = 2 * puntos
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        frecuencias = 2 * np.pi * np.arange(largo // 2 + 1) / largo * (ancho / paso)[:, None]
+        transformada = np.exp(-0.5 * frecuencias * frecuencias)
+        densidad = np.fft.irfft(np.fft.rfft(pesos, largo) * transformada, largo)[:, :puntos]
+        densidad = np.maximum(densidad, 0.0) / (n * paso)[:, None]
+    malla_regular = inicio_malla[:, None] + paso[:, None] * np.arange(puntos)
+
+    if malla is None:
+        return (malla_regular[0], densidad[0]) if una_serie else (malla_regular, densidad)
+
+    ## Interpolación lineal en la malla regular (fuera de ella la densidad es prácticamente cero). Las columnas sin
+    ## datos o constantes no tienen densidad (NaN), como en gaussian_kde
+    malla = np.broadcast_to(np.asarray(malla, dtype=np.float64), (m, np.shape(malla)[-1]))
+    validas = (paso > 0)[:, None]
+    posicion = np.where(validas, malla - inicio_malla[:, None], 0.0) / np.where(validas, paso[:, None], 1.0)
+    indice = np.clip(np.nan_to_num(posicion), 0, puntos - 2).astype(np.int64)
+    fraccion = np.clip(posicion - indice, 0.0, 1.0)
+    izquierda = np.take_along_axis(densidad, indice, axis=1)
+    valores = izquierda + fraccion * (np.take_along_axis(densidad, indice + 1, axis=1) - izquierda)
+    valores[(posicion < 0) | (posicion > puntos - 1)] = 0.0
+    valores[~np.broadcast_to(validas, valores.shape)] = np.nan
+    return valores[0] if una_serie else valores
@@ -0,0 +1,169 @@
+"""
+En este código se encuentran las distribuciones de colas pesadas para el VaR y ES paramétrico: la t de Student
+ajustada por máxima verosimilitud y la expansión de Cornish-Fisher.
+
+La t de Student (media, escala y grados de libertad) se ajusta con Fisher scoring: cada iteración usa el gradiente
+de la log-verosimilitud y la matriz de información esperada, que para la t tiene forma cerrada. Las iteraciones se
+hacen a la vez para todas las series (filas de una matriz: tickers o ventanas móviles) y cada serie deja de iterar
+cuando converge. Las series pueden empezar en parámetros dados (arranque en caliente, por ejemplo los de una ventana
+vecina ya ajustada); si no, empiezan en los que dan la media, la varianza y la curtosis de la muestra.
+Como el scoring no siempre sube la verosimilitud, un paso que la baja se reduce a la mitad hasta que la sube.
+
+El VaR y el ES de ambas distribuciones tienen forma cerrada. Como en riesgo.py, el VaR es un rendimiento (negativo)
+y el ES una pérdida (positiva).
+"""
+
+import numpy as np
+from scipy.special import digamma, gammaln, polygamma
+from scipy.stats import norm, t
+
+## Grados de libertad permitidos: con menos de 2 la varianza no existe; con muchos la t es prácticamente normal
+GRADOS_MINIMOS = 2.05
+GRADOS_MAXIMOS = 500.0
+
+
+## Media, varianza (ddof=0), sesgo y curtosis en exceso de cada fila
+def momentos_filas(muestras):
+    media = muestras.mean(axis=1)
+    centradas = muestras - media[:, None]
+    cuadrados = centradas * centradas
+    varianza = cuadrados.mean(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sesgo = (cuadrados * centradas).mean(axis=1) / varianza ** 1.5
+        curtosis = (cuadrados * cuadrados).mean(axis=1) / varianza ** 2 - 3
+    return media, varianza, sesgo, curtosis
+
+
+## Parámetros iniciales por momentos: grados de libertad con la curtosis de la t, 6 / (grados - 4)
+def _inicio_momentos(muestras):
+    media, varianza, _, curtosis = momentos_filas(muestras)
+    grados = np.clip(4 + 6 / np.maximum(curtosis, 1e-3), 2.5, 100.0)
+    return media, np.sqrt(varianza * (grados - 2) / grados), grados
+
+
+def ajustar_t(muestras, inicial=None, tolerancia=1e-6, max_iter=100):
+    """
+    Ajusta una t de Student con media, escala y grados de libertad por máxima verosimilitud a cada fila de
+    ``muestras`` (o a una serie). ``inicial`` es una terna (media, escala, grados) para el arranque en caliente.
+    Regresa la terna de parámetros ajustados, con un valor por fila. Las filas no deben tener datos faltantes.
+    """
+    muestras = np.asarray(muestras, dtype=np.float64)
+    una_serie = muestras.ndim == 1
+    muestras = np.atleast_2d(muestras)
+    n = muestras.shape[1]
+    media, escala, grados = (_inicio_momentos(muestras) if inicial is None else
+                             (np.array(valor, dtype=np.float64).reshape(-1).copy() for valor in inicial))
+
+    ## Último paso de cada fila en (media, log escala, log grados) y log-verosimilitud del último punto aceptado
+    pasos = np.zeros((3, len(muestras)))
+    aceptada = np.full(len(muestras), -np.inf)
+    activas = np.arange(len(muestras))
+    for _ in range(max_iter):
+        if not len(activas):
+            break
+        m, s, v = media[activas], escala[activas], grados[activas]
+        z = (muestras[activas] - m[:, None]) / s[:, None]
+        a = z * z / v[:, None]
+        q = 1 + a
+        suma_log = np.log(q).sum(axis=1)
+        verosimilitud = n * (gammaln((v + 1) / 2) - gammaln(v / 2) - 0.5 * np.log(v * np.pi) - np.log(s)) - (v + 1) / 2 * suma_log
+
+        ## Si el último paso bajó la verosimilitud (el scoring no siempre sube), se regresa a la mitad del paso
+        rechazadas = ~(verosimilitud >= aceptada[activas])
+        if rechazadas.any():
+            filas = activas[rechazadas]
+            pasos[:, filas] *= 0.5
+            media[filas] -= pasos[0, filas]
+            escala[filas] *= np.exp(-pasos[1, filas])
+            grados[filas] *= np.exp(-pasos[2, filas])
+        aceptada[activas[~rechazadas]] = verosimilitud[~rechazadas]
+
+        ## Gradiente de la log-verosimilitud
+        cociente = (a / q).sum(axis=1)
+        g_media = (v + 1) / v * (z / q).sum(axis=1) / s
+        g_escala = ((v + 1) * cociente - n) / s
+        g_grados = n * (0.5 * (digamma((v + 1) / 2) - digamma(v / 2)) - 0.5 / v) - 0.5 * suma_log + (v + 1) / (2 * v) * cociente
+
+        ## Información esperada: la media es ortogonal a (escala, grados), que forman un bloque de 2 × 2
+        i_media = n * (v + 1) / ((v + 3) * s * s)
+        i_escala = n * 2 * v / ((v + 3) * s * s)
+        i_cruzada = -n * 2 / ((v + 1) * (v + 3) * s)
+        i_grados = n * (0.25 * (polygamma(1, v / 2) - polygamma(1, (v + 1) / 2)) - (v + 5) / (2 * v * (v + 1) * (v + 3)))
+        determinante = i_escala * i_grados - i_cruzada * i_cruzada
+
+        ## Paso en escala logarítmica para la escala y los grados; el paso completo se reduce (sin cambiar su dirección,
+        ## que es de ascenso) para que ninguna coordenada se mueva demasiado y los grados no salgan de su rango
+        paso_media = g_media / i_media / s
+        paso_escala = (i_grados * g_escala - i_cruzada * g_grados) / determinante / s
+        paso_grados = (i_escala * g_grados - i_cruzada * g_escala) / determinante / v
+        ## Si los grados saldrían de su rango se dejan fijos en el límite y la escala da su paso sola
+        limite = ((v >= GRADOS_MAXIMOS * (1 - 1e-9)) & (paso_grados > 0)) | ((v <= GRADOS_MINIMOS * (1 + 1e-9)) & (paso_grados < 0))
+        paso_escala = np.where(limite, g_escala / i_escala / s, paso_escala)
+        paso_grados = np.where(limite, 0.0, paso_grados)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            hasta_limite = np.where(paso_grados > 0, np.log(GRADOS_MAXIMOS / v), np.log(GRADOS_MINIMOS / v)) / paso_grados
+            factor = np.minimum.reduce([np.ones_like(v), 0.5 / np.abs(paso_media), 0.5 / np.abs(paso_escala),
+                                        0.7 / np.abs(paso_grados), np.where(paso_grados != 0, hasta_limite, 1.0)])
+        paso_media *= factor * s
+        paso_escala *= factor
+        paso_grados = np.clip(np.log(v) + factor * paso_grados, np.log(GRADOS_MINIMOS), np.log(GRADOS_MAXIMOS)) - np.log(v)
+
+        aceptadas = activas[~rechazadas]
+        nuevos = np.array([paso_media, paso_escala, paso_grados])[:, ~rechazadas]
+        pasos[:, aceptadas] = nuevos
+        media[aceptadas] += nuevos[0]
+        escala[aceptadas] *= np.exp(nuevos[1])
+        grados[aceptadas] *= np.exp(nuevos[2])
+
+        ## Convergencia: el paso (aceptado o reducido) es menor que la tolerancia
+        tamaño = np.maximum.reduce([np.abs(pasos[0, activas]) / escala[activas], np.abs(pasos[1, activas]), np.abs(pasos[2, activas])])
+        activas = activas[tamaño > tolerancia]
+
+    if una_serie:
+        return float(media[0]), float(escala[0]), float(grados[0])
+    return media, escala, grados
+
+
+## Ajuste de muchas filas con arranque en caliente: primero se ajusta una de cada ``paso`` filas desde los momentos,
+## y cada fila empieza en los parámetros de la fila ajustada más cercana anterior (útil para ventanas móviles)
+def ajustar_t_anclas(muestras, paso=16, **opciones):
+    muestras = np.asarray(muestras, dtype=np.float64)
+    anclas = ajustar_t(muestras[::paso], **opciones)
+    cercana = np.arange(len(muestras)) // paso
+    return ajustar_t(muestras, inicial=tuple(parametro[cercana] for parametro in anclas), **opciones)
+
+
+def var_es_t(media, escala, grados, alphas):
+    """
+    VaR y ES de una t de Student con media, escala y grados de libertad dados (escalares o arreglos), para varios
+    alphas. Regresa arreglos de tamaño (len(alphas),) + forma de los parámetros. El ES de la cola izquierda es
+    ``E[X | X <= VaR] = media - escala * (grados + q²) / (grados - 1) * f(q) / (1 - alpha)``, con q el cuantil estándar.
+    """
+    alphas = np.asarray(alphas, dtype=np.float64).reshape((-1,) + (1,) * np.ndim(grados))
+    cola = 1 - alphas
+    q = t.ppf(cola, grados)
+    var = media + escala * q
+    es = -(media - escala * (grados + q * q) / (grados - 1) * t.pdf(q, grados) / cola)
+    return var, es
+
+
+def var_es_cornish_fisher(media, desviacion, sesgo, curtosis, alphas):
+    """
+    VaR y ES con la expansión de Cornish-Fisher, que corrige el cuantil normal por el sesgo y la curtosis en exceso.
+    El ES es el promedio del cuantil corregido en la cola, que tiene forma cerrada con los momentos de la normal
+    truncada; regresa arreglos de tamaño (len(alphas),) + forma de los parámetros.
+    """
+    alphas = np.asarray(alphas, dtype=np.float64).reshape((-1,) + (1,) * np.ndim(media))
+    cola = 1 - alphas
+    z = norm.ppf(cola)
+
+    def corregido(z1, z2, z3):  ## z1, z2, z3: z, z² y z³ (o sus promedios en la cola)
+        return (z1 + (z2 - 1) * sesgo / 6 + (z3 - 3 * z1) * curtosis / 24 - (2 * z3 - 5 * z1) * sesgo ** 2 / 36)
+
+    var = media + desviacion * corregido(z, z * z, z ** 3)
+
+    ## Momentos de la normal estándar truncada en la cola: E[Z^k | Z <= z]
+    razon = norm.pdf(z) / cola
+    momento_1, momento_2, momento_3 = -razon, 1 - z * razon, -(z * z + 2) * razon
+    es = -(media + desviacion * corregido(momento_1, momento_2, momento_3))
+    return var, es
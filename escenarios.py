@@ -0,0 +1,191 @@
+"""
+En este código se encuentra el motor de escenarios de estrés: revalúa las posiciones actuales (montos invertidos en
+cada ticker) con los rendimientos de periodos históricos de crisis y con choques hipotéticos definidos por el
+usuario, y calcula las pérdidas a varios días (10 por defecto) con ventanas traslapadas.
+
+Un escenario es un rendimiento logarítmico acumulado por ticker, de modo que todos los escenarios forman una matriz
+(escenarios × tickers) y la pérdida y ganancia de todos ellos es un solo producto ``expm1(choques) @ posiciones``
+(revaluación completa de posiciones lineales). Los rendimientos acumulados de cualquier periodo son diferencias de
+las sumas acumuladas de los rendimientos diarios, por lo que miles de periodos (por ejemplo, todas las ventanas de
+10 días de la historia) se obtienen con una sola indexación.
+
+El VaR y ES a varios días se calculan de dos formas: escalando los de un día por la raíz del horizonte (regla de la
+raíz del tiempo, que supone rendimientos independientes e idénticamente distribuidos) y directamente con la pérdida
+y ganancia de las ventanas traslapadas. Las ventanas traslapadas no son independientes entre sí (comparten días),
+por lo que el cuantil directo es más ruidoso que el de un día con el mismo número de fechas.
+"""
+
+import numpy as np
+import pandas as pd
+
+from riesgo import var_es_historico
+
+## Periodos de estrés históricos (del cierre de la fecha inicial al cierre de la fecha final) dentro de las fechas
+## de los datos del proyecto (desde 2010, ver almacen.py)
+ESCENARIOS_HISTORICOS = {
+    "Crisis de deuda europea (2011)": ("2011-07-22", "2011-10-03"),
+    "Devaluación del yuan (2015)": ("2015-08-10", "2015-08-25"),
+    "Volmageddon (2018)": ("2018-01-26", "2018-02-08"),
+    "Caída del cuarto trimestre (2018)": ("2018-09-20", "2018-12-24"),
+    "COVID-19 (2020)": ("2020-02-19", "2020-03-23"),
+    "Mercado bajista (2022)": ("2022-01-03", "2022-10-12"),
+    "Crisis bancaria regional (2023)": ("2023-03-08", "2023-03-13"),
+}
+
+## Horizonte (en días hábiles) de las pérdidas a varios días
+HORIZONTE = 10
+
+## Número de valores (escenarios × tickers) que se revalúan a la vez
+TAMAÑO_BLOQUE = 2 ** 20
+
+
+## Rendimientos como matriz (fechas × tickers), con sus fechas y tickers
+def _matriz(rendimientos):
+    if isinstance(rendimientos, pd.Series):
+        rendimientos = rendimientos.to_frame()
+    if isinstance(rendimientos, pd.DataFrame):
+        return rendimientos.to_numpy(dtype=np.float64), rendimientos.index, rendimientos.columns
+    x = np.asarray(rendimientos, dtype=np.float64)
+    x = x[:, None] if x.ndim == 1 else x
+    return x, pd.RangeIndex(len(x)), pd.RangeIndex(x.shape[1])
+
+
+## Sumas acumuladas (con una fila inicial de ceros) de los rendimientos, con los faltantes en cero, y del número de
+## faltantes (None si no hay): el rendimiento del periodo (i, j] es sumas[j] - sumas[i]
+def _acumuladas(x):
+    faltantes = np.isnan(x)
+    hay_faltantes = faltantes.any()
+    sumas = np.zeros((len(x) + 1, x.shape[1]))
+    np.cumsum(np.where(faltantes, 0.0, x) if hay_faltantes else x, axis=0, out=sumas[1:])
+    if not hay_faltantes:
+        return sumas, None
+    conteos = np.zeros((len(x) + 1, x.shape[1]), dtype=np.int64)
+    np.cumsum(faltantes, axis=0, out=conteos[1:])
+    return sumas, conteos
+
+
+## Rendimientos de los periodos (inicio, fin] (posiciones en las sumas acumuladas, como arreglos o rebanadas), NaN
+## para los tickers con datos faltantes en el periodo
+def _rendimientos_periodos(sumas, conteos, inicio, fin):
+    rendimientos = sumas[fin] - sumas[inicio]
+    if conteos is not None:
+        rendimientos[conteos[fin] != conteos[inicio]] = np.nan
+    return rendimientos
+
+
+## Sumas de todas las ventanas de ``horizonte`` filas por duplicación: de las sumas de ventanas de p filas salen las
+## de 2p con una suma vectorizada, y las de ``horizonte`` combinan las potencias de 2 de su representación binaria
+## (O(n log horizonte) operaciones sin la dependencia secuencial de cumsum, y sin acumular error de redondeo). Un NaN
+## en la ventana da NaN
+def _sumas_moviles(x, horizonte):
+    resultado, cubiertas = None, 0
+    potencia, p = x, 1
+    while True:
+        if horizonte & 1:
+            if resultado is None:
+                resultado, cubiertas = potencia, p
+            else:
+                largo = len(x) - cubiertas - p + 1
+                resultado = resultado[:largo] + potencia[cubiertas:cubiertas + largo]
+                cubiertas += p
+        horizonte >>= 1
+        if not horizonte:
+            return resultado.copy() if resultado is x else resultado
+        potencia = potencia[:-p] + potencia[p:]
+        p *= 2
+
+
+def choques_historicos(rendimientos, escenarios=ESCENARIOS_HISTORICOS):
+    """
+    Rendimiento logarítmico acumulado de cada ticker en cada periodo histórico ``nombre -> (inicio, fin)``, del
+    cierre de ``inicio`` al cierre de ``fin``: un DataFrame (escenarios × tickers). Los periodos que no caben en las
+    fechas de los rendimientos, y los tickers con datos faltantes dentro del periodo, quedan en NaN.
+    """
+    x, fechas, tickers = _matriz(rendimientos)
+    inicios = pd.to_datetime([inicio for inicio, _ in escenarios.values()])
+    fines = pd.to_datetime([fin for _, fin in escenarios.values()])
+    ## Los rendimientos de las fechas posteriores a ``inicio`` hasta ``fin`` (incluida)
+    i = np.searchsorted(fechas, inicios, side="right")
+    j = np.searchsorted(fechas, fines, side="right")
+    choques = _rendimientos_periodos(*_acumuladas(x), i, j)
+    fuera = (inicios < fechas[0]) | (fines > fechas[-1]) | (j <= i)
+    choques[fuera] = np.nan
+    return pd.DataFrame(choques, index=list(escenarios), columns=tickers)
+
+
+def choques_ventanas(rendimientos, horizonte=HORIZONTE):
+    """
+    Rendimientos logarítmicos de todas las ventanas traslapadas de ``horizonte`` días: un DataFrame
+    ((fechas - horizonte + 1) × tickers) indexado por la última fecha de cada ventana. Cada ventana sirve de
+    escenario histórico; con ``horizonte=1`` son los rendimientos diarios.
+    """
+    x, fechas, tickers = _matriz(rendimientos)
+    return pd.DataFrame(_sumas_moviles(x, horizonte), index=fechas[horizonte - 1:], columns=tickers)
+
+
+def choques_hipoteticos(choques, tickers):
+    """
+    Escenarios definidos por el usuario ``nombre -> choque``, donde el choque es un rendimiento simple que se aplica a
+    todos los tickers (por ejemplo, -0.2) o un diccionario ``ticker -> rendimiento simple`` (los tickers que no
+    aparecen no cambian). Regresa los rendimientos logarítmicos como DataFrame (escenarios × tickers).
+    """
+    tickers = list(tickers)
+    columnas = {ticker: columna for columna, ticker in enumerate(tickers)}
+    valores = np.zeros((len(choques), len(tickers)))
+    for fila, choque in enumerate(choques.values()):
+        if isinstance(choque, dict):
+            desconocidos = set(choque) - set(columnas)
+            if desconocidos:
+                raise ValueError(f"Tickers sin posición en el escenario: {sorted(desconocidos)}")
+            valores[fila, [columnas[ticker] for ticker in choque]] = list(choque.values())
+        else:
+            valores[fila] = choque
+    if (valores <= -1).any():
+        raise ValueError("Un choque no puede ser una caída de 100% o más")
+    return pd.DataFrame(np.log1p(valores), index=list(choques), columns=tickers)
+
+
+def evaluar_escenarios(choques, posiciones):
+    """
+    Pérdida y ganancia de las posiciones (montos por ticker, o una matriz tickers × portafolios) en cada escenario
+    de ``choques`` (rendimientos logarítmicos, escenarios × tickers): ``expm1(choques) @ posiciones``, por bloques
+    de escenarios. Un escenario con un choque NaN en un ticker con posición da NaN. Regresa una serie (o DataFrame
+    con una columna por portafolio) con el índice de los escenarios, o un arreglo si ``choques`` es un arreglo.
+    """
+    valores = np.asarray(choques, dtype=np.float64)
+    posiciones = np.asarray(posiciones, dtype=np.float64)
+    if valores.shape[1] != posiciones.shape[0]:
+        raise ValueError("Las posiciones no corresponden a los tickers de los escenarios")
+    resultado = np.empty((len(valores),) + posiciones.shape[1:])
+    filas = max(1, TAMAÑO_BLOQUE // valores.shape[1])
+    for inicio in range(0, len(valores), filas):
+        bloque = np.expm1(valores[inicio:inicio + filas])
+        ## Los NaN de tickers sin posición no afectan al escenario
+        bloque[:, np.all(posiciones.reshape(len(posiciones), -1) == 0, axis=1)] = 0.0
+        resultado[inicio:inicio + filas] = bloque @ posiciones
+    if isinstance(choques, pd.DataFrame):
+        if resultado.ndim == 1:
+            return pd.Series(resultado, index=choques.index, name="Pérdida y ganancia")
+        return pd.DataFrame(resultado, index=choques.index)
+    return resultado
+
+
+def var_es_horizonte(rendimientos, posiciones, alphas=(0.95, 0.975, 0.99), horizonte=HORIZONTE):
+    """
+    VaR y ES históricos (en las unidades de las posiciones) de la pérdida y ganancia de un día y de ``horizonte``
+    días: escalados por ``sqrt(horizonte)`` desde los de un día y directos, con las ventanas traslapadas. Como en
+    riesgo.py, el VaR es una pérdida y ganancia negativa y el ES una pérdida positiva. Regresa un DataFrame con una
+    fila por alpha y la razón entre el VaR directo y el escalado.
+    """
+    diaria = evaluar_escenarios(choques_ventanas(rendimientos, 1), posiciones).dropna().to_numpy()
+    ventanas = evaluar_escenarios(choques_ventanas(rendimientos, horizonte), posiciones).dropna().to_numpy()
+    escala = np.sqrt(horizonte)
+    filas = []
+    for alpha in alphas:
+        var_1, es_1 = var_es_historico(diaria, alpha)
+        var_h, es_h = var_es_historico(ventanas, alpha)
+        filas.append({"Alpha": alpha, "VaR 1 día": var_1, f"VaR {horizonte} días (√t)": var_1 * escala,
+                      f"VaR {horizonte} días (directo)": var_h, "ES 1 día": es_1,
+                      f"ES {horizonte} días (√t)": es_1 * escala, f"ES {horizonte} días (directo)": es_h,
+                      "Directo / √t": var_h / (var_1 * escala)})
+    return pd.DataFrame(filas)
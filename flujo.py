@@ -0,0 +1,204 @@
+"""
+En este código se encuentra el modo de flujo (streaming) para barras intradía, por ejemplo de 1 minuto.
+
+Las barras (fecha, ticker, precio de cierre) llegan de una fuente intercambiable: ``FuenteReproduccion`` reproduce
+un archivo guardado (útil sin conexión y en pruebas) y ``FuenteYahooIntradia`` consulta Yahoo Finance cada cierto
+tiempo. Cada fuente tiene un método ``leer()`` que regresa las barras nuevas desde la llamada anterior.
+
+Para cada ticker, ``RiesgoIncremental`` actualiza con cada barra el rendimiento logarítmico, la media y varianza
+móviles (``riesgo.MomentosMoviles``), la ventana ordenada (``cuantiles.ventana_ordenada``) y el VaR y ES histórico y
+paramétrico, con las mismas definiciones que ``riesgo.var_es_movil``. La memoria está acotada: solo se guardan la
+ventana y las últimas ``historia`` barras.
+
+Uso (para guardar barras y reproducirlas después): python flujo.py GOOGL AAPL [--salida barras.parquet]
+"""
+
+import math
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from cuantiles import ventana_ordenada
+from riesgo import MomentosMoviles, columnas_var_es_movil
+
+## Tamaño de ventana por defecto para barras de 1 minuto: una sesión de 6.5 horas
+VENTANA_INTRADIA = 390
+
+
+## Fuente que reproduce barras guardadas en un archivo (CSV o Parquet) o en un DataFrame
+class FuenteReproduccion:
+    """
+    Los datos deben tener las columnas ``Datetime`` y ``Close``, y opcionalmente ``Ticker`` (si no está, se usa el
+    nombre del archivo). Con ``barras_por_segundo`` las barras se entregan a ese ritmo, simulando un mercado en vivo;
+    sin él, cada lectura entrega todas las barras restantes (o ``maximo``).
+    """
+
+    def __init__(self, datos, barras_por_segundo=None):
+        if not isinstance(datos, pd.DataFrame):
+            ruta = Path(datos)
+            datos = pd.read_parquet(ruta) if ruta.suffix == ".parquet" else pd.read_csv(ruta, parse_dates=["Datetime"])
+            if "Ticker" not in datos:
+                datos = datos.assign(Ticker=ruta.stem)
+        datos = datos.sort_values("Datetime", kind="stable")
+        self._fechas = datos["Datetime"].to_numpy()
+        self._tickers = datos["Ticker"].to_numpy(dtype=object)
+        self._precios = datos["Close"].to_numpy(dtype=np.float64)
+        self._posicion = 0
+        self._inicio = None
+        self.barras_por_segundo = barras_por_segundo
+
+    @property
+    def terminada(self):
+        return self._posicion >= len(self._precios)
+
+    def leer(self, maximo=None):
+        fin = len(self._precios)
+        if self.barras_por_segundo is not None:
+            if self._inicio is None:
+                self._inicio = time.perf_counter()
+            fin = min(fin, int((time.perf_counter() - self._inicio) * self.barras_por_segundo))
+        if maximo is not None:
+            fin = min(fin, self._posicion + maximo)
+        tramo = slice(self._posicion, max(fin, self._posicion))
+        self._posicion = tramo.stop
+        return self._fechas[tramo], self._tickers[tramo], self._precios[tramo]
+
+
+## Fuente de barras intradía de Yahoo Finance: consulta el día en curso como máximo cada ``pausa`` segundos
+class FuenteYahooIntradia:
+    terminada = False  ## El mercado sigue generando barras
+
+    def __init__(self, tickers, intervalo="1m", pausa=30):
+        self.tickers = list(tickers)
+        self.intervalo = intervalo
+        self.pausa = pausa
+        self._ultima_consulta = -np.inf
+        self._ultimas = {}  ## Última fecha entregada de cada ticker
+
+    def leer(self, maximo=None):
+        import yfinance as yf
+
+        vacio = (np.array([], dtype="datetime64[ns]"), np.array([], dtype=object), np.array([], dtype=np.float64))
+        if time.perf_counter() - self._ultima_consulta < self.pausa:
+            return vacio
+        self._ultima_consulta = time.perf_counter()
+        datos = yf.download(self.tickers, period="1d", interval=self.intervalo, progress=False)
+        if datos.empty:
+            return vacio
+        cierre = datos["Close"].reindex(columns=self.tickers) if isinstance(datos["Close"], pd.DataFrame) else datos[["Close"]].set_axis(self.tickers, axis=1)
+        barras = cierre.rename_axis("Datetime").reset_index().melt("Datetime", var_name="Ticker", value_name="Close").dropna()
+        nuevas = [ticker not in self._ultimas or fecha > self._ultimas[ticker] for fecha, ticker in zip(barras["Datetime"], barras["Ticker"])]
+        barras = barras[nuevas].sort_values("Datetime", kind="stable").iloc[:maximo]
+        self._ultimas.update(barras.groupby("Ticker")["Datetime"].max().to_dict())
+        return barras["Datetime"].to_numpy(), barras["Ticker"].to_numpy(dtype=object), barras["Close"].to_numpy(dtype=np.float64)
+
+
+class RiesgoIncremental:
+    """
+    VaR y ES móviles de un ticker, actualizados con cada barra sin recalcular la ventana completa. La ventana ordenada
+    es una lista con bisect en ventanas pequeñas y la ventana por bloques (O(log ventana)) en las grandes.
+
+    Las métricas tienen los nombres y las definiciones de ``riesgo.var_es_movil``: cuantil con interpolación lineal
+    para el VaR histórico, normal con desviación muestral para el VaR paramétrico, y promedio de los rendimientos que
+    no superan el umbral para el ES. Son NaN mientras la ventana no está completa.
+    """
+
+    def __init__(self, ventana=VENTANA_INTRADIA, alphas=(0.95, 0.99), historia=10_000):
+        self.ventana = ventana
+        self.alphas = tuple(alphas)
+        self.columnas = columnas_var_es_movil(self.alphas)
+        self.historia = deque(maxlen=historia)  ## (fecha, rendimiento, métricas...) de las últimas barras
+        self._momentos = MomentosMoviles(ventana)
+        self._llegada = deque()  ## Rendimientos de la ventana en orden de llegada
+        self._ordenadas = ventana_ordenada(ventana)  ## Los mismos rendimientos, ordenados
+        self._precio = None
+
+        ## Para cada alpha: posiciones del cuantil en la ventana ordenada y cuantil de la normal estándar
+        self._parametros = []
+        for alpha in self.alphas:
+            posicion = (1 - alpha) * (ventana - 1)
+            bajo = int(math.floor(posicion))
+            self._parametros.append((bajo, min(bajo + 1, ventana - 1), posicion - bajo, float(norm.ppf(1 - alpha))))
+        self._ajuste_poblacional = math.sqrt((ventana - 1) / ventana)  ## np.std (ddof=0), como en var_es_movil
+
+    def agregar(self, fecha, precio):
+        """Procesa una barra; regresa las métricas (en el orden de ``columnas``) o None si no hubo rendimiento."""
+        precio = float(precio)
+        if not precio > 0:  ## Precios faltantes o inválidos no generan rendimiento
+            return None
+        anterior, self._precio = self._precio, precio
+        if anterior is None:
+            return None
+        rendimiento = math.log(precio / anterior)
+
+        if len(self._llegada) == self.ventana:
+            saliente = self._llegada.popleft()
+            self._ordenadas.eliminar(saliente)
+        self._llegada.append(rendimiento)
+        self._ordenadas.agregar(rendimiento)
+        self._momentos.agregar(rendimiento)
+
+        if len(self._llegada) < self.ventana:
+            metricas = (math.nan,) * len(self.columnas)
+        else:
+            ordenadas = self._ordenadas
+            media, desviacion = self._momentos.media, math.sqrt(self._momentos.varianza)
+            metricas = []
+            for bajo, alto, fraccion, z in self._parametros:
+                menor = ordenadas.kesimo(bajo)
+                var_hist = menor + fraccion * (ordenadas.kesimo(alto) - menor)
+                metricas += (var_hist, media + z * desviacion, ordenadas.media_cola(var_hist),
+                             ordenadas.media_cola(media + z * desviacion * self._ajuste_poblacional))
+            metricas = tuple(metricas)
+        self.historia.append((fecha, rendimiento, *metricas))
+        return metricas
+
+    ## Historia reciente como DataFrame (índice de fechas, columnas Returns y métricas)
+    def historia_df(self):
+        return pd.DataFrame(list(self.historia), columns=["Datetime", "Returns", *self.columnas]).set_index("Datetime")
+
+
+class MotorFlujo:
+    """Lee las barras de ``fuente`` y actualiza un ``RiesgoIncremental`` por ticker."""
+
+    def __init__(self, fuente, ventana=VENTANA_INTRADIA, alphas=(0.95, 0.99), historia=10_000):
+        self.fuente = fuente
+        self.ventana = ventana
+        self.alphas = tuple(alphas)
+        self.historia = historia
+        self.riesgos = {}
+        self.barras = 0
+
+    ## Procesa las barras disponibles en la fuente (como máximo ``maximo``); regresa cuántas se procesaron
+    def actualizar(self, maximo=None):
+        fechas, tickers, precios = self.fuente.leer(maximo)
+        for fecha, ticker, precio in zip(fechas, tickers, precios.tolist()):
+            riesgo = self.riesgos.get(ticker)
+            if riesgo is None:
+                riesgo = self.riesgos[ticker] = RiesgoIncremental(self.ventana, self.alphas, self.historia)
+            riesgo.agregar(fecha, precio)
+        self.barras += len(precios)
+        return len(precios)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import yfinance as yf
+
+    parser = argparse.ArgumentParser(description="Guarda barras intradía de Yahoo Finance para reproducirlas después")
+    parser.add_argument("tickers", nargs="*", default=["GOOGL"])
+    parser.add_argument("--intervalo", default="1m")
+    parser.add_argument("--periodo", default="7d", help="Yahoo Finance conserva 7 días de barras de 1 minuto")
+    parser.add_argument("--salida", default="barras.parquet")
+    args = parser.parse_args()
+
+    datos = yf.download(args.tickers, period=args.periodo, interval=args.intervalo, progress=False)["Close"]
+    barras = datos.rename_axis("Datetime").reset_index().melt("Datetime", var_name="Ticker", value_name="Close").dropna()
+    barras = barras.sort_values("Datetime", kind="stable")
+    barras.to_parquet(args.salida, index=False) if args.salida.endswith(".parquet") else barras.to_csv(args.salida, index=False)
+    print(f"{len(barras):,} barras guardadas en {args.salida}")
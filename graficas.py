@@ -0,0 +1,105 @@
+"""
+En este código se preparan las gráficas de series largas que muestran las páginas.
+
+En lugar de enviar al navegador una imagen de matplotlib con todos los puntos, cada serie se reduce en el servidor
+a aproximadamente el número de píxeles del ancho de la gráfica y se dibuja con plotly (``Scattergl``, que usa
+WebGL). Hay dos métodos de reducción que conservan la forma de la serie:
+
+- ``lttb`` (Largest-Triangle-Three-Buckets): en cada grupo de puntos se conserva el que forma el triángulo de mayor
+  área con el punto elegido en el grupo anterior y el promedio del grupo siguiente. Es adecuado para curvas suaves
+  como el VaR o el ES móviles.
+- ``minmax``: en cada grupo se conservan el mínimo y el máximo, de modo que ningún rendimiento extremo (por ejemplo,
+  una violación del VaR) desaparece de la gráfica.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+## Número de puntos al que se reduce cada serie (aproximadamente el ancho en píxeles de una gráfica)
+ANCHO_PIXELES = 1500
+
+
+## Posiciones de los puntos que conserva LTTB, incluyendo siempre el primero y el último
+def lttb(x, y, puntos):
+    n = len(y)
+    if puntos >= n or puntos < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    ## Los n - 2 puntos intermedios se dividen en puntos - 2 grupos; el promedio de cada grupo es el vértice
+    ## "siguiente" del grupo anterior, y para el último grupo es el último punto de la serie
+    bordes = np.linspace(1, n - 1, puntos - 1).astype(np.int64)
+    tamaños = np.diff(bordes)
+    promedio_x = np.append(np.add.reduceat(x[:n - 1], bordes[:-1]) / tamaños, x[-1])
+    promedio_y = np.append(np.add.reduceat(y[:n - 1], bordes[:-1]) / tamaños, y[-1])
+
+    ## El doble del área del triángulo (a, j, c) es |p * y_j + q * x_j - (p * ay + q * ax)|, con p y q fijos en cada grupo
+    bordes, promedio_x, promedio_y = bordes.tolist(), promedio_x.tolist(), promedio_y.tolist()
+    elegidos = np.empty(puntos, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    a = 0
+    for i in range(puntos - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        ax, ay = float(x[a]), float(y[a])
+        cx, cy = promedio_x[i + 1], promedio_y[i + 1]
+        p, q = ax - cx, cy - ay
+        areas = np.abs(p * y[inicio:fin] + q * x[inicio:fin] - (p * ay + q * ax))
+        a = inicio + int(areas.argmax())
+        elegidos[i + 1] = a
+    return elegidos
+
+
+## Posiciones del mínimo y el máximo de cada grupo de puntos consecutivos, más el primero y el último
+def min_max(y, puntos):
+    n = len(y)
+    if puntos >= n:
+        return np.arange(n)
+    ## Grupos de ``tamaño`` puntos; el último se completa repitiendo el último valor, que no cambia su mínimo ni su máximo
+    tamaño = -(-n // max(1, puntos // 2))
+    grupos = -(-n // tamaño)
+    y = np.asarray(y, dtype=np.float64)
+    matriz = np.concatenate((y, np.full(grupos * tamaño - n, y[-1]))).reshape(grupos, tamaño)
+    inicios = np.arange(grupos) * tamaño
+    minimos = np.minimum(inicios + matriz.argmin(axis=1), n - 1)
+    maximos = np.minimum(inicios + matriz.argmax(axis=1), n - 1)
+    return np.unique(np.concatenate(([0, n - 1], minimos, maximos)))
+
+
+## Reduce una serie (índice de fechas o números) a cerca de ``puntos`` puntos; los datos faltantes se omiten
+def reducir(serie, puntos=ANCHO_PIXELES, metodo="lttb"):
+    serie = serie.dropna()
+    if metodo == "lttb":
+        indice = serie.index
+        x = indice.asi8 if isinstance(indice, pd.DatetimeIndex) else np.asarray(indice, dtype=np.float64)
+        posiciones = lttb(x - x[0] if len(x) else x, serie.to_numpy(), puntos)
+    elif metodo == "minmax":
+        posiciones = min_max(serie.to_numpy(), puntos)
+    else:
+        raise ValueError("El método debe ser 'lttb' o 'minmax'")
+    return serie.iloc[posiciones]
+
+
+## Figura vacía con el formato común de las páginas
+def figura(titulo, eje_x, eje_y, alto=500):
+    fig = go.Figure()
+    fig.update_layout(title=titulo, xaxis_title=eje_x, yaxis_title=eje_y, height=alto, hovermode="x unified",
+                      legend=dict(orientation="h", yanchor="bottom", y=1.02, x=0), margin=dict(t=90, b=40))
+    return fig
+
+
+def agregar_serie(fig, serie, nombre, color, rango=None, puntos=ANCHO_PIXELES, metodo="lttb", **opciones):
+    """
+    Agrega ``serie`` a ``fig`` como una línea WebGL, reducida a ``puntos`` puntos con ``metodo``.
+
+    ``rango`` es un par de fechas (inicio, fin): solo se reduce esa parte de la serie, de modo que al acercarse a un
+    periodo la gráfica muestra más detalle. Las demás ``opciones`` se pasan a ``go.Scattergl`` (por ejemplo,
+    ``fill="tozeroy"`` para dibujar los rendimientos como barras).
+    """
+    if rango is not None:
+        serie = serie.loc[pd.Timestamp(rango[0]):pd.Timestamp(rango[1])]
+    reducida = reducir(serie, puntos, metodo)
+    fig.add_trace(go.Scattergl(x=reducida.index, y=reducida.to_numpy(), name=nombre, mode="lines",
+                               line=dict(color=color, width=1.2), **opciones))
+    return fig
@@ -0,0 +1,265 @@
+"""
+En este código se encuentra la instrumentación de las páginas: el tiempo de los tramos del cálculo (carga de datos,
+cada métrica y cada gráfica), los aciertos y fallos de las funciones en caché y el tiempo de cada ejecución de una
+página, con un panel opcional en la barra lateral.
+
+Se activa con la variable de entorno ``INSTRUMENTACION=1`` (o con ``activar()``). Apagada, ``tramo`` regresa un
+contexto vacío compartido y las funciones de ``cache_medida`` llaman directamente a ``st.cache_data``, de modo que
+el costo es una comparación por llamada.
+
+- ``tramo(nombre)``: contexto que mide un tramo; los tramos pueden anidarse.
+- ``cache_medida(**opciones)``: reemplaza a ``st.cache_data``. Cuenta por función las llamadas que se sirven de la
+  caché (aciertos) y las que calculan (fallos), y mide el cálculo como un tramo con el nombre de la función.
+- ``iniciar_pagina(nombre)`` al inicio de una página y ``panel(nombre)`` al final: miden la ejecución completa,
+  guardan sus tramos y muestran en la barra lateral los tramos, los contadores de las cachés y los percentiles de las
+  ejecuciones de cada página. Una ejecución que termina antes (por ejemplo, con ``st.stop()``) no se cuenta.
+
+Los resultados se exportan como texto de Prometheus (``prometheus()``: resúmenes con los percentiles 50, 95 y 99 de
+las últimas ``MUESTRAS`` mediciones, y contadores) y como una línea JSON por ejecución en el logger
+``instrumentacion``. Con ``INSTRUMENTACION_LOG=<archivo>`` las líneas se agregan a ese archivo, y con
+``INSTRUMENTACION_PROMETHEUS=<archivo>`` el texto se reescribe después de cada ejecución (para el textfile collector
+de node_exporter).
+"""
+
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+## Número de mediciones recientes de cada tramo y de cada página con las que se calculan los percentiles
+MUESTRAS = 1000
+
+## Percentiles que se reportan
+CUANTILES = (0.5, 0.95, 0.99)
+
+_activa = os.environ.get("INSTRUMENTACION", "") not in ("", "0")
+_nulo = contextlib.nullcontext()
+_local = threading.local()  ## Ejecución en curso, profundidad de los tramos y pila de las llamadas a las cachés
+
+registro_log = logging.getLogger("instrumentacion")
+if os.environ.get("INSTRUMENTACION_LOG"):
+    registro_log.addHandler(logging.FileHandler(os.environ["INSTRUMENTACION_LOG"], encoding="utf-8"))
+    registro_log.setLevel(logging.INFO)
+
+
+def activar(valor=True):
+    global _activa
+    _activa = valor
+
+
+def activa():
+    return _activa
+
+
+class Resumen:
+    """Número y suma de las mediciones de un tramo o página, con las últimas ``MUESTRAS`` para los percentiles."""
+
+    def __init__(self, muestras=MUESTRAS):
+        self.n = 0
+        self.suma = 0.0
+        self.recientes = deque(maxlen=muestras)
+
+    def agregar(self, segundos):
+        self.n += 1
+        self.suma += segundos
+        self.recientes.append(segundos)
+
+    def cuantiles(self, cuantiles=CUANTILES):
+        return np.quantile(np.fromiter(self.recientes, dtype=np.float64), cuantiles)
+
+
+class Registro:
+    """
+    Mediciones de todo el proceso: las páginas de todas las sesiones se ejecutan en hilos distintos, por lo que se
+    actualizan con un candado.
+    """
+
+    def __init__(self):
+        self._candado = threading.Lock()
+        self.tramos = {}
+        self.ejecuciones = {}
+        self.caches = {}  ## Función -> [aciertos, fallos]
+
+    def medir_tramo(self, nombre, segundos):
+        with self._candado:
+            self.tramos.setdefault(nombre, Resumen()).agregar(segundos)
+
+    def medir_ejecucion(self, pagina, segundos):
+        with self._candado:
+            self.ejecuciones.setdefault(pagina, Resumen()).agregar(segundos)
+
+    def contar(self, funcion, fallo):
+        with self._candado:
+            self.caches.setdefault(funcion, [0, 0])[fallo] += 1
+
+    def reiniciar(self):
+        with self._candado:
+            self.tramos, self.ejecuciones, self.caches = {}, {}, {}
+
+
+REGISTRO = Registro()
+
+
+class _Tramo:
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.profundidad = getattr(_local, "profundidad", 0)
+        _local.profundidad = self.profundidad + 1
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *error):
+        segundos = time.perf_counter() - self.inicio
+        _local.profundidad = self.profundidad
+        REGISTRO.medir_tramo(self.nombre, segundos)
+        ejecucion = getattr(_local, "ejecucion", None)
+        if ejecucion is not None:
+            ejecucion["tramos"].append({"tramo": self.nombre, "profundidad": self.profundidad,
+                                        "inicio": self.inicio - ejecucion["reloj"], "segundos": segundos})
+        return False
+
+
+## Contexto que mide un tramo (si la instrumentación está apagada, un contexto vacío)
+def tramo(nombre):
+    return _Tramo(nombre) if _activa else _nulo
+
+
+def cache_medida(**opciones):
+    """
+    Decorador que reemplaza a ``st.cache_data(**opciones)``. La función solo se ejecuta cuando la caché no tiene el
+    resultado, por lo que cada llamada marca en una pila (por hilo, porque las funciones en caché se llaman unas a
+    otras) si la función se ejecutó: una llamada sin marca fue un acierto.
+    """
+    import streamlit as st
+
+    def decorador(funcion):
+        nombre = funcion.__name__
+
+        @functools.wraps(funcion)
+        def calcular(*args, **kwargs):
+            pila = getattr(_local, "pila", None)
+            if pila:
+                pila[-1] = True
+            with tramo(nombre):
+                return funcion(*args, **kwargs)
+
+        en_cache = st.cache_data(**opciones)(calcular)
+
+        @functools.wraps(funcion)
+        def llamar(*args, **kwargs):
+            if not _activa:
+                return en_cache(*args, **kwargs)
+            pila = _local.__dict__.setdefault("pila", [])
+            pila.append(False)
+            try:
+                return en_cache(*args, **kwargs)
+            finally:
+                REGISTRO.contar(nombre, pila.pop())
+
+        llamar.clear = en_cache.clear
+        return llamar
+
+    return decorador
+
+
+## Empieza a medir una ejecución de la página
+def iniciar_pagina(pagina):
+    if _activa:
+        _local.ejecucion = {"pagina": pagina, "reloj": time.perf_counter(), "tramos": []}
+
+
+## Termina la ejecución de la página: la registra, la escribe en el log y actualiza el archivo de Prometheus
+def terminar_pagina(pagina):
+    ejecucion = getattr(_local, "ejecucion", None)
+    _local.ejecucion = None
+    if ejecucion is None or ejecucion["pagina"] != pagina:
+        return None
+    ejecucion["segundos"] = time.perf_counter() - ejecucion.pop("reloj")
+    ejecucion["fecha"] = time.time()
+    REGISTRO.medir_ejecucion(pagina, ejecucion["segundos"])
+    registro_log.info(json.dumps(ejecucion, ensure_ascii=False))
+    archivo = os.environ.get("INSTRUMENTACION_PROMETHEUS")
+    if archivo:
+        temporal = f"{archivo}.tmp"
+        with open(temporal, "w", encoding="utf-8") as salida:
+            salida.write(prometheus())
+        os.replace(temporal, archivo)  ## Reemplazo atómico, para que el recolector no lea un archivo a medias
+    return ejecucion
+
+
+def _etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus(registro=REGISTRO):
+    """Texto en el formato de exposición de Prometheus con los tramos, las ejecuciones y las cachés."""
+    lineas = []
+    with registro._candado:
+        for metrica, etiqueta, resumenes, ayuda in (
+                ("riesgo_tramo_segundos", "tramo", registro.tramos, "Duración de los tramos instrumentados"),
+                ("riesgo_ejecucion_segundos", "pagina", registro.ejecuciones, "Duración de cada ejecución de una página")):
+            lineas += [f"# HELP {metrica} {ayuda}", f"# TYPE {metrica} summary"]
+            for nombre, resumen in sorted(resumenes.items()):
+                valor = f'{etiqueta}="{_etiqueta(nombre)}"'
+                for cuantil, segundos in zip(CUANTILES, resumen.cuantiles()):
+                    lineas.append(f'{metrica}{{{valor},quantile="{cuantil}"}} {segundos:.6g}')
+                lineas += [f"{metrica}_sum{{{valor}}} {resumen.suma:.6g}", f"{metrica}_count{{{valor}}} {resumen.n}"]
+        lineas += ["# HELP riesgo_cache_total Llamadas a las funciones en caché", "# TYPE riesgo_cache_total counter"]
+        for funcion, (aciertos, fallos) in sorted(registro.caches.items()):
+            lineas += [f'riesgo_cache_total{{funcion="{_etiqueta(funcion)}",resultado="acierto"}} {aciertos}',
+                       f'riesgo_cache_total{{funcion="{_etiqueta(funcion)}",resultado="fallo"}} {fallos}']
+    return "\n".join(lineas) + "\n"
+
+
+## Tablas del panel: percentiles (en milisegundos) de cada tramo o página, y contadores de las cachés
+def _tabla_resumenes(resumenes, columna):
+    import pandas as pd
+
+    filas = [{columna: nombre, "n": resumen.n, **{f"p{cuantil * 100:g} (ms)": segundos * 1000
+                                                 for cuantil, segundos in zip(CUANTILES, resumen.cuantiles())}}
+             for nombre, resumen in resumenes.items()]
+    return pd.DataFrame(filas)
+
+
+def panel(pagina):
+    """
+    Termina la ejecución de la página y, si la instrumentación está activa, muestra en la barra lateral sus tramos,
+    los contadores de las cachés y los percentiles de las ejecuciones por página, con el texto de Prometheus y el
+    log de la ejecución para descargar.
+    """
+    if not _activa:
+        return
+    import pandas as pd
+    import streamlit as st
+
+    ejecucion = terminar_pagina(pagina)
+    with st.sidebar.expander("⏱️ Instrumentación", expanded=False):
+        if ejecucion is not None:
+            st.markdown(f"**Esta ejecución:** {ejecucion['segundos'] * 1000:,.1f} ms")
+            tramos = pd.DataFrame(ejecucion["tramos"], columns=["tramo", "profundidad", "inicio", "segundos"])
+            tramos["tramo"] = ["· " * p + nombre for p, nombre in zip(tramos["profundidad"], tramos["tramo"])]
+            tramos["ms"] = tramos["segundos"] * 1000
+            st.dataframe(tramos.sort_values("inicio")[["tramo", "ms"]].style.format({"ms": "{:,.1f}"}), hide_index=True)
+        with REGISTRO._candado:
+            ejecuciones = _tabla_resumenes(REGISTRO.ejecuciones, "página")
+            tramos_totales = _tabla_resumenes(REGISTRO.tramos, "tramo")
+            caches = pd.DataFrame([{"función": funcion, "aciertos": aciertos, "fallos": fallos}
+                                   for funcion, (aciertos, fallos) in REGISTRO.caches.items()])
+        st.markdown("**Ejecuciones por página**")
+        st.dataframe(ejecuciones, hide_index=True)
+        st.markdown("**Tramos (todas las ejecuciones)**")
+        st.dataframe(tramos_totales, hide_index=True)
+        st.markdown("**Cachés**")
+        st.dataframe(caches, hide_index=True)
+        st.download_button("Descargar métricas (Prometheus)", prometheus(), file_name="metricas.prom", mime="text/plain")
+        if ejecucion is not None:
+            st.download_button("Descargar log de la ejecución (JSON)", json.dumps(ejecucion, ensure_ascii=False),
+                               file_name="ejecucion.json", mime="application/json")
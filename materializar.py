@@ -0,0 +1,171 @@
+"""
+Trabajo por lotes que precalcula las métricas de riesgo que muestran las páginas, fuera de Streamlit.
+
+Para cada ticker se guardan en ``materializado/<ticker>/<versión>/`` los arreglos ``fechas.npy`` y ``metricas.npy``
+(rendimientos, VaR/ES móviles y VaR con volatilidad móvil, una fila por fecha) y ``tabla.npy`` (tabla de VaR y ES),
+y en ``materializado/<ticker>/meta.json`` los nombres de las columnas, los parámetros y la versión vigente. Las
+páginas los leen con ``np.load(mmap_mode="r")``. Cada ejecución solo calcula las fechas posteriores a la última fila
+guardada; si los precios históricos cambiaron (por ejemplo, por un ajuste de dividendos) se recalcula todo.
+
+Los tres arreglos se escriben en una carpeta temporal que se renombra a su versión, y al final ``meta.json`` se
+reemplaza de forma atómica para apuntar a ella: una página lee siempre los archivos de una misma ejecución, nunca una
+mezcla de la anterior y la nueva. Las versiones anteriores se borran después.
+
+Uso: python materializar.py GOOGL AAPL [--directorio materializado]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from almacen import FECHA_INICIO, almacen_por_defecto
+from riesgo import columnas_var_es_movil, etiqueta_alpha, rendimientos_log_matriz, tabla_var_es, var_es_movil, volatilidad_movil
+
+## Parámetros con los que se materializan las métricas (los mismos que usan las páginas)
+VENTANA = 252
+ALPHAS_MOVIL = (0.95, 0.99)
+ALPHAS_VOLATILIDAD = (0.05, 0.01)
+ALPHAS_TABLA = (0.95, 0.975, 0.99)
+
+
+## Carpeta de las métricas materializadas; puede cambiarse con la variable de entorno MATERIALIZADO
+def directorio_por_defecto():
+    return Path(os.environ.get("MATERIALIZADO", Path(__file__).parent / "materializado"))
+
+
+## Nombres de las columnas de metricas.npy
+def _columnas():
+    movil = columnas_var_es_movil(ALPHAS_MOVIL)
+    volatilidad = [f"VaR volatilidad móvil {etiqueta_alpha(alpha)}" for alpha in ALPHAS_VOLATILIDAD]
+    return ["Returns"] + movil + volatilidad + ["Sigma"]
+
+
+def _parametros():
+    return {"ventana": VENTANA, "alphas_movil": list(ALPHAS_MOVIL), "alphas_volatilidad": list(ALPHAS_VOLATILIDAD),
+            "alphas_tabla": list(ALPHAS_TABLA), "columnas": _columnas()}
+
+
+## Escribe un archivo de texto de forma atómica, para que una página nunca lea un archivo a medias
+def _escribir_atomico(ruta, texto):
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    temporal.write_text(texto)
+    os.replace(temporal, ruta)
+
+
+## Lee las métricas materializadas de un ticker (memoria mapeada); regresa None si no existen
+def leer_metricas(ticker, directorio=None):
+    carpeta = Path(directorio or directorio_por_defecto()) / ticker
+    if not (carpeta / "meta.json").exists():
+        return None
+    meta = json.loads((carpeta / "meta.json").read_text())
+    if "version" not in meta:  ## Formato anterior, sin versiones: se vuelve a materializar
+        return None
+    version = carpeta / meta["version"]
+    try:
+        fechas = np.load(version / "fechas.npy", mmap_mode="r")
+        metricas = np.load(version / "metricas.npy", mmap_mode="r")
+        tabla = np.load(version / "tabla.npy")
+    except FileNotFoundError:  ## Una ejecución posterior ya reemplazó y borró esta versión
+        return None
+    return {
+        "meta": meta,
+        "fechas": fechas,
+        "metricas": pd.DataFrame(metricas, columns=meta["columnas"], copy=False),
+        "tabla": pd.DataFrame(tabla, columns=meta["columnas_tabla"]),
+    }
+
+
+## Guarda los arreglos en una nueva versión de la carpeta del ticker y cambia ``meta.json`` a ella; regresa el nombre
+## de la versión
+def _publicar(carpeta, arreglos, meta):
+    version = f"v{time.time_ns()}"
+    temporal = carpeta / f"{version}.tmp"
+    temporal.mkdir()
+    for nombre, arreglo in arreglos.items():
+        np.save(temporal / nombre, arreglo)
+    os.replace(temporal, carpeta / version)
+    _escribir_atomico(carpeta / "meta.json", json.dumps(dict(meta, version=version), ensure_ascii=False, indent=1))
+
+    ## Versiones anteriores (y archivos del formato sin versiones); en Windows, una página puede tener abierto un
+    ## archivo y se borra en la siguiente ejecución
+    for ruta in carpeta.iterdir():
+        if ruta.name not in (version, "meta.json"):
+            if ruta.is_dir():
+                shutil.rmtree(ruta, ignore_errors=True)
+            else:
+                ruta.unlink(missing_ok=True)
+    return version
+
+
+## Indica si los rendimientos guardados son los actuales; tras un ajuste por dividendos o splits las fechas son las
+## mismas, pero los rendimientos cambian
+def rendimientos_coinciden(guardados, rendimientos):
+    return len(guardados) == len(rendimientos) and np.allclose(guardados, rendimientos, rtol=0, atol=1e-12)
+
+
+## Calcula las filas de metricas.npy a partir de la posición ``inicio`` de los rendimientos ``x``
+def _calcular_filas(x, inicio):
+    desde = max(0, inicio - VENTANA)  ## La volatilidad de la fecha i usa los VENTANA rendimientos previos
+    tramo = x[desde:]
+    movil = var_es_movil(tramo, VENTANA, ALPHAS_MOVIL).to_numpy()
+    sigma = volatilidad_movil(tramo, VENTANA)
+    volatilidad = np.column_stack([norm.ppf(alpha) * sigma for alpha in ALPHAS_VOLATILIDAD])
+    return np.column_stack([tramo, movil, volatilidad, sigma])[inicio - desde:]
+
+
+def materializar(ticker, rendimientos, directorio=None):
+    """
+    Actualiza las métricas materializadas de ``ticker`` con la serie de ``rendimientos`` (índice de fechas).
+    Regresa el número de filas calculadas.
+    """
+    carpeta = Path(directorio or directorio_por_defecto()) / ticker
+    carpeta.mkdir(parents=True, exist_ok=True)
+    x = rendimientos.to_numpy(dtype=np.float64)
+    fechas = rendimientos.index.to_numpy(dtype="datetime64[ns]")
+    parametros = _parametros()
+
+    ## Se reutilizan las filas guardadas solo si los parámetros y los rendimientos coinciden con los actuales
+    previo = leer_metricas(ticker, directorio)
+    inicio = 0
+    if previo is not None and all(previo["meta"].get(clave) == valor for clave, valor in parametros.items()):
+        n_previo = len(previo["fechas"])
+        guardados = previo["metricas"]["Returns"].to_numpy()
+        if (n_previo <= len(x) and np.array_equal(previo["fechas"], fechas[:n_previo])
+                and rendimientos_coinciden(guardados, x[:n_previo])):
+            inicio = n_previo
+
+    if inicio == len(x) and previo is not None:
+        return 0
+
+    nuevas = _calcular_filas(x, inicio)
+    metricas = np.concatenate((np.asarray(previo["metricas"])[:inicio], nuevas)) if inicio else nuevas
+    tabla = tabla_var_es(x, ALPHAS_TABLA)
+
+    arreglos = {"fechas.npy": fechas, "metricas.npy": np.ascontiguousarray(metricas),
+                "tabla.npy": tabla.to_numpy(dtype=np.float64)}
+    meta = dict(parametros, columnas_tabla=list(tabla.columns),
+                ultima_fecha=str(pd.Timestamp(fechas[-1]).date()) if len(fechas) else None)
+    _publicar(carpeta, arreglos, meta)
+    return len(nuevas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precalcula las métricas de riesgo de las páginas")
+    parser.add_argument("tickers", nargs="*", default=["GOOGL"])
+    parser.add_argument("--directorio", default=None, help="Carpeta de salida (por defecto materializado/)")
+    args = parser.parse_args()
+
+    fin = datetime.datetime.today().strftime('%Y-%m-%d')
+    precios = almacen_por_defecto().obtener_varios(args.tickers, FECHA_INICIO, fin)
+    for ticker in args.tickers:
+        rendimientos = rendimientos_log_matriz(precios[ticker].dropna())
+        filas = materializar(ticker, rendimientos.dropna(), args.directorio)
+        print(f"{ticker}: {filas} filas nuevas ({len(rendimientos.dropna())} en total)")
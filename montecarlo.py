@@ -0,0 +1,150 @@
+"""
+En este código se encuentra el motor de simulación Montecarlo para el VaR y ES.
+
+Las trayectorias se generan en bloques de tamaño fijo; el bloque i usa su propio generador, obtenido con
+``SeedSequence(semilla).spawn``, de modo que el resultado depende solo de la semilla y no del número de procesos.
+
+Como los rendimientos simulados son normales, el cuantil de cada alpha se conoce de antemano salvo por el error de
+muestreo, así que se fija un intervalo ``[inferior, superior]`` alrededor de cada VaR con un margen de varias
+desviaciones estándar de ese error. De cada bloque solo se conservan el número y la suma de los valores menores que
+``inferior`` y los valores dentro del intervalo: la memoria crece con la raíz del número de simulaciones (el ancho
+del intervalo), no con la cola completa. Si por azar un percentil queda fuera de su intervalo, se amplía el margen
+y se repite la simulación (con las mismas semillas, el resultado no cambia).
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from scipy.stats import norm
+
+## Número de valores simulados (trayectorias × tickers) que se generan por bloque
+TAMAÑO_BLOQUE = 2 ** 20
+
+## Desviaciones estándar del error de muestreo del percentil que cubre el intervalo alrededor de cada VaR
+MARGEN_INTERVALO = 6.0
+
+
+## Simula un bloque de rendimientos normales y, para cada alpha, regresa el número y la suma por columna de los
+## valores menores que ``inferior`` y los valores dentro de ``[inferior, superior]`` con su columna
+def _simular_bloque(argumentos):
+    indice, semilla, n, media, desviacion, inferiores, superiores = argumentos
+    generador = np.random.default_rng(semilla)
+    simulados = generador.standard_normal((n, len(media)))
+    simulados *= desviacion
+    simulados += media
+    conteos = np.empty(inferiores.shape, dtype=np.int64)
+    sumas = np.empty(inferiores.shape)
+    cercanos = []
+    for i, (inferior, superior) in enumerate(zip(inferiores, superiores)):
+        debajo = simulados < inferior
+        conteos[i] = debajo.sum(axis=0)
+        sumas[i] = simulados.sum(axis=0, where=debajo)
+        filas, columnas = np.nonzero(~debajo & (simulados <= superior))
+        cercanos.append((simulados[filas, columnas], columnas))
+    return indice, conteos, sumas, cercanos
+
+
+## Simula todos los bloques y regresa los conteos y sumas totales por (alpha, columna) y, por alpha, los valores
+## dentro del intervalo ordenados por columna y valor
+def _simular_intervalos(argumentos, procesos, forma):
+    conteos = np.zeros(forma, dtype=np.int64)
+    sumas = np.zeros((len(argumentos),) + forma)  ## Por bloque, para sumar siempre en el mismo orden
+    cercanos = [[] for _ in range(forma[0])]
+
+    def guardar(resultado):
+        indice, conteos_bloque, sumas_bloque, cercanos_bloque = resultado
+        conteos[...] += conteos_bloque
+        sumas[indice] = sumas_bloque
+        for lista, valores in zip(cercanos, cercanos_bloque):
+            lista.append(valores)
+
+    procesos = os.cpu_count() if procesos is None else procesos
+    if procesos > 1 and len(argumentos) > 1:
+        ## Envío acotado: como máximo dos bloques por proceso esperan a ser recogidos
+        trabajadores = min(procesos, len(argumentos))
+        with ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+            pendientes = set()
+            for argumento in argumentos:
+                if len(pendientes) >= 2 * trabajadores:
+                    listos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                    for futuro in listos:
+                        guardar(futuro.result())
+                pendientes.add(ejecutor.submit(_simular_bloque, argumento))
+            for futuro in wait(pendientes).done:
+                guardar(futuro.result())
+    else:
+        for argumento in argumentos:
+            guardar(_simular_bloque(argumento))
+
+    ordenados = []
+    for lista in cercanos:
+        valores = np.concatenate([valores for valores, _ in lista])
+        columnas = np.concatenate([columnas for _, columnas in lista])
+        orden = np.lexsort((valores, columnas))
+        ordenados.append((valores[orden], columnas[orden]))
+    return conteos, sumas.sum(axis=0), ordenados
+
+
+def simular_var_es(media, desviacion, alphas, n_sim=10000, semilla=0, procesos=None, tamaño_bloque=TAMAÑO_BLOQUE):
+    """
+    Estima el VaR y ES de rendimientos normales ``N(media, desviacion)`` con ``n_sim`` simulaciones por columna.
+
+    ``media`` y ``desviacion`` pueden ser escalares o vectores (un valor por ticker). Regresa dos arreglos de
+    tamaño (len(alphas), tickers): el VaR, igual a ``np.percentile`` de todas las simulaciones, y el ES como el
+    promedio (con signo invertido) de las simulaciones que no superan el VaR.
+    """
+    media = np.atleast_1d(np.asarray(media, dtype=np.float64))
+    desviacion = np.atleast_1d(np.asarray(desviacion, dtype=np.float64))
+    media, desviacion = np.broadcast_arrays(media, desviacion)
+    alphas = np.atleast_1d(np.asarray(alphas, dtype=np.float64))
+    var = np.full((len(alphas), len(media)), np.nan)
+    es = np.full((len(alphas), len(media)), np.nan)
+
+    ## Las columnas sin media o desviación (por ejemplo, sin datos) quedan en NaN
+    validas = np.isfinite(media) & np.isfinite(desviacion)
+    if not validas.any():
+        return var, es
+    media, desviacion = media[validas], desviacion[validas]
+    m = len(media)
+
+    ## Posiciones del percentil (interpolación lineal) en las simulaciones ordenadas
+    posiciones = (1 - alphas) * (n_sim - 1)
+    bajo = np.floor(posiciones).astype(int)
+    alto = np.minimum(bajo + 1, n_sim - 1)
+
+    ## Bloques de tamaño fijo: su división no depende del número de procesos
+    por_bloque = max(1, tamaño_bloque // m)
+    tamaños = [min(por_bloque, n_sim - inicio) for inicio in range(0, n_sim, por_bloque)]
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamaños))
+
+    proporciones = (posiciones + 0.5) / n_sim
+    margen = MARGEN_INTERVALO
+    while True:
+        ## Intervalo de probabilidades alrededor de cada percentil, con el error de muestreo de la proporción
+        ancho = margen * np.sqrt(proporciones * (1 - proporciones) / n_sim) + 2 / n_sim
+        ## Cuantiles normales acotados para que una desviación de cero no dé 0 × infinito
+        inferiores = media + desviacion * np.maximum(norm.ppf(np.clip(proporciones - ancho, 0, 1)), -40)[:, None]
+        superiores = media + desviacion * np.minimum(norm.ppf(np.clip(proporciones + ancho, 0, 1)), 40)[:, None]
+        argumentos = [(i, s, n, media, desviacion, inferiores, superiores)
+                      for i, (s, n) in enumerate(zip(semillas, tamaños))]
+        conteos, sumas, cercanos = _simular_intervalos(argumentos, procesos, (len(alphas), m))
+
+        ## Los dos valores del percentil deben quedar dentro del intervalo de su alpha
+        totales = np.stack([np.bincount(columnas, minlength=m) for _, columnas in cercanos])
+        if np.all((conteos <= bajo[:, None]) & (alto[:, None] < conteos + totales)):
+            break
+        margen *= 4
+
+    for i, (valores, columnas) in enumerate(cercanos):
+        inicios = np.concatenate(([0], np.cumsum(totales[i])[:-1]))
+        valor_bajo = valores[inicios + bajo[i] - conteos[i]]
+        valor_alto = valores[inicios + alto[i] - conteos[i]]
+        var_alpha = valor_bajo + (posiciones[i] - bajo[i]) * (valor_alto - valor_bajo)
+
+        ## ES: promedio de los valores que no superan el VaR (todos los menores que ``inferior`` y parte del intervalo)
+        en_cola = valores <= var_alpha[columnas]
+        n_cola = conteos[i] + np.bincount(columnas, weights=en_cola, minlength=m)
+        suma_cola = sumas[i] + np.bincount(columnas, weights=np.where(en_cola, valores, 0.0), minlength=m)
+        var[i, validas], es[i, validas] = var_alpha, -suma_cola / n_cola
+    return var, es
@@ -1,17 +1,13 @@
-import pandas as pd
 import numpy as np
-import plotly.express as px
-import matplotlib.pyplot as plt
-import yfinance as yf
-import datetime
+import plotly.graph_objects as go
 import streamlit as st
-import seaborn as sns
-from scipy.stats import kurtosis, skew
-from scipy.stats import norm, t
-from utils import obtener_datos, rendimientos_logaritmicos
+from utils import diagnosticos_rendimientos, rendimientos_sesion
+from graficas import agregar_serie, figura
+from instrumentacion import iniciar_pagina, panel, tramo
 
 ## Configuración de la página
 st.set_page_config(page_title="📊 Análisis Financiero", layout="wide")
+iniciar_pagina("Análisis Financiero")  ## Instrumentación opcional (ver instrumentacion.py)
 
 st.title("📈 Análisis de datos de Google")
 st.markdown("""
@@ -24,15 +20,16 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-## Hacemos la carga de datos, con spinner para el tiempo de espera
+## Hacemos la carga de datos, con spinner para el tiempo de espera. Los rendimientos se cargan una vez por sesión
+## y se comparten con las demás páginas (ver utils.py)
 with st.spinner('⏳ Cargando datos...'):
-    df = obtener_datos(['GOOGL'])
-    df_rendimientos = rendimientos_logaritmicos(df)
+    df_rendimientos = rendimientos_sesion(['GOOGL'])
 
-## Calculamos las métricas estadísticas
-media = df_rendimientos["Returns"].mean()
-curtosis_valor = kurtosis(df_rendimientos["Returns"], fisher=True)
-sesgo_valor = skew(df_rendimientos["Returns"])
+## Calculamos las métricas estadísticas, el histograma y la densidad en una sola función en caché (ver diagnosticos.py)
+with tramo("estadísticas descriptivas"):
+    diagnosticos = diagnosticos_rendimientos(['GOOGL'])
+    estadisticas = diagnosticos["estadisticas"]
+    media, curtosis_valor, sesgo_valor = estadisticas["Media"], estadisticas["Curtosis"], estadisticas["Sesgo"]
 
 st.subheader("📊 Estadísticas de los rendimientos de GOOGLE")
 col1, col2, col3 = st.columns(3)
@@ -45,6 +42,18 @@ with col2:
 
 with col3:
     st.metric(label="📉 Sesgo", value=f"{sesgo_valor:.5f}")
+
+col1, col2, col3 = st.columns(3)
+
+with col1:
+    st.metric(label="📐 Desviación estándar", value=f"{np.sqrt(estadisticas['Varianza']):.5f}")
+
+with col2:
+    st.metric(label="🧪 Jarque-Bera", value=f"{estadisticas['Jarque-Bera']:,.1f}",
+              help=f"p-valor: {estadisticas['p-valor Jarque-Bera']:.3g}. Un p-valor bajo rechaza que los rendimientos sean normales.")
+
+with col3:
+    st.metric(label="🔻 Cuantiles 1% / 99%", value=f"{estadisticas['Cuantil 1%']:.4f} / {estadisticas['Cuantil 99%']:.4f}")
     
 
 ## Elaboramos una gráfica con los rendimientos diarios:
@@ -57,29 +66,30 @@ Para el cálculo de los rendimientos diarios, se optó por calcular los **Rendim
             cálculo del VaR paramétrico. 
 """, unsafe_allow_html=True)
 
-fig, ax = plt.subplots(figsize=(10, 5))
-ax.bar(df_rendimientos["Date"], df_rendimientos["Returns"], color="#7F7FFF", width=14, edgecolor='none')
-ax.axhline(y=0, color='#ea314e', linestyle='--', linewidth=1.5)
-ax.set_title("Evolución de los rendimientos de Google")
-ax.set_xlabel("Fecha")
-ax.set_ylabel("Rendimiento Diario")
-st.pyplot(fig)
+## Los rendimientos se reducen al ancho de la gráfica conservando el mínimo y el máximo de cada grupo de días (ver graficas.py)
+with tramo("gráfica de rendimientos"):
+    serie_rendimientos = df_rendimientos.set_index("Date")["Returns"]
+    fig = figura("Evolución de los rendimientos de Google", "Fecha", "Rendimiento Diario")
+    agregar_serie(fig, serie_rendimientos, "Rendimiento Diario", "#7F7FFF", metodo="minmax", fill="tozeroy", showlegend=False)
+    fig.add_hline(y=0, line_color="#ea314e", line_dash="dash", line_width=1.5)
+    st.plotly_chart(fig, use_container_width=True)
 
 
 
 ## Elaboramos un histograma de los rendimientos diarios del activo
 st.subheader("📊 Histograma de los rendimientos de Google")
-fig, ax = plt.subplots(figsize=(10, 5))
-
-# Usamos seaborn para hacer el histograma con kde (estimación de densidad)
-sns.histplot(df_rendimientos["Returns"], bins=50, kde=True, color="blue", edgecolor="black", ax=ax)
-
-ax.axvline(x=media, color='#f84848', linestyle='--', label=f"Media: {media:.5f}")
-ax.legend()
-ax.set_title("Histograma de los rendimientos de Google")
-ax.set_xlabel("Rendimiento Diario")
-ax.set_ylabel("Frecuencia")
-st.pyplot(fig)
+## El histograma y la densidad (kde) se calculan en el servidor, así solo se envían los 50 conteos y la curva
+with tramo("histograma"):
+    conteos, bordes = diagnosticos["conteos"], diagnosticos["bordes"]
+    malla, densidad = diagnosticos["malla"], diagnosticos["densidad"]
+
+    fig = figura("Histograma de los rendimientos de Google", "Rendimiento Diario", "Frecuencia")
+    fig.add_trace(go.Bar(x=(bordes[:-1] + bordes[1:]) / 2, y=conteos, width=np.diff(bordes), name="Frecuencia",
+                         marker=dict(color="blue", opacity=0.5, line=dict(color="black", width=1))))
+    fig.add_trace(go.Scatter(x=malla, y=densidad, mode="lines", name="Densidad (kde)", line=dict(color="blue")))
+    fig.add_trace(go.Scatter(x=[media, media], y=[0, conteos.max()], mode="lines", name=f"Media: {media:.5f}",
+                             line=dict(color="#f84848", dash="dash")))
+    st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("""
     <div style="font-size: 20px; font-family: Arial, sans-serif; color: #333333; line-height: 1.6; background-color: #f0f0f0; padding: 20px; border-radius: 8px;">
@@ -87,3 +97,5 @@ st.markdown("""
         entre 2020 y 2022 se aprecia un comportamiento extremo, lo que probablemente esté asociado con el impacto de eventos globales como la pandemia del COVID-19.</p>
     </div>
 """, unsafe_allow_html=True)
+
+panel("Análisis Financiero")
@@ -1,17 +1,11 @@
 ## Importamos librerías necesarias para el proyecto
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import matplotlib.pyplot as plt
-import yfinance as yf
-import datetime
 import streamlit as st
-from scipy.stats import kurtosis, skew
-from scipy.stats import norm, t
-from utils import obtener_datos, rendimientos_logaritmicos
+from utils import resultados_bootstrap, resultados_var_es
+from instrumentacion import iniciar_pagina, panel
 
 ## Configuración de la página
 st.set_page_config(page_title="📉 Cálculo de VaR y ES", layout="wide")
+iniciar_pagina("Cálculo de VaR y ES")  ## Instrumentación opcional (ver instrumentacion.py)
 
 st.title("📉 VaR y ES de Google")
 st.markdown("""
@@ -24,66 +18,23 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-## Hacemos la carga de datos, con spinner para el tiempo de espera
-with st.spinner('⏳ Cargando datos...'):
-    df = obtener_datos(['GOOGL'])
-    df_rendimientos = rendimientos_logaritmicos(df)
-
-
-## Calculamos el VaR y ES de acuerdo a diversos métodos.
-## Paramétrico
-@st.cache_data
-def var_es_parametrico(rendimientos, alpha, dist='normal'):
-    if dist == 'normal':
-        var = norm.ppf(1 - alpha, loc=rendimientos.mean(), scale=rendimientos.std())
-        es = -rendimientos[rendimientos <= var].mean()
-    elif dist == 't-student':
-        df = len(rendimientos) - 1  # Grados de libertad
-        var = t.ppf(1 - alpha, df, loc=rendimientos.mean(), scale=rendimientos.std())
-        es = -rendimientos[rendimientos <= var].mean()
-    else:
-        raise ValueError("La distribución debe ser 'normal' o 't-student'")
-    return var, es
-
-## Método histórico
-@st.cache_data
-def var_es_historico(rendimientos, alpha):
-    var = rendimientos.quantile(1 - alpha)
-    es = -rendimientos[rendimientos <= var].mean()
-    return var, es
-
-## Montecarlo
-@st.cache_data
-def var_es_montecarlo(rendimientos, alpha, n_sim=10000):
-    media = rendimientos.mean()
-    std = rendimientos.std()
-    sim_rendimientos = np.random.normal(media, std, n_sim)  # Asumiendo distribución normal (para simular solamente)
-    var = np.percentile(sim_rendimientos, 100 * (1 - alpha))
-    es = -sim_rendimientos[sim_rendimientos <= var].mean()
-    return var, es
+## Calculamos el VaR y ES de acuerdo a diversos métodos (paramétrico normal, t-Student y Cornish-Fisher, histórico,
+## Montecarlo y simulación histórica filtrada).
+## Los rendimientos se ordenan una sola vez y todos los alphas se calculan en la misma llamada (ver riesgo.py).
+## La simulación Montecarlo usa una semilla fija, por lo que da el mismo resultado en cada interacción con la página.
 
 ## Definimos nuestro vector de alphas:
-alphas = [0.95, 0.975, 0.99]
-resultados = []
-
-## Utilizamos 'df_rendimientos' (el DataFrame de rendimientos logarítmicos)
-## Ya que 'Returns' es el nombre de la columna con los rendimientos logaritmicos:
-rendimientos = df_rendimientos['Returns']
+alphas = (0.95, 0.975, 0.99)
 
-### Hacemos que corra sobre el vector de alphas
-for alpha in alphas:
-    var_normal, es_normal = var_es_parametrico(rendimientos, alpha, dist='normal')
-    var_t, es_t = var_es_parametrico(rendimientos, alpha, dist='t-student')
-    var_hist, es_hist = var_es_historico(rendimientos, alpha)
-    var_mc, es_mc = var_es_montecarlo(rendimientos, alpha)
-
-    resultados.append([alpha, var_normal, es_normal, var_t, es_t, var_hist, es_hist, var_mc, es_mc])
-
-## Elaboramos un DataFrame del VaR Obtenido y el ES:
+## Elaboramos un DataFrame del VaR Obtenido y el ES (los rendimientos se cargan dentro de la función en caché),
+## con spinner para el tiempo de espera
+with st.spinner('⏳ Cargando datos...'):
+    df_resultados = resultados_var_es(['GOOGL'], alphas)
 
-columnas = ['Alpha', 'VaR Normal', 'ES Normal', 'VaR t-Student', 'ES t-Student',
-           'VaR Histórico', 'ES Histórico', 'VaR Monte Carlo', 'ES Monte Carlo']
-df_resultados = pd.DataFrame(resultados, columns=columnas)
+## Agregamos la simulación histórica filtrada y los intervalos de confianza bootstrap al 95% (10,000 réplicas
+## por bloques, con semilla fija), que se calculan en lotes repartidos entre procesos (ver remuestreo.py)
+with st.spinner('⏳ Calculando intervalos de confianza bootstrap...'):
+    df_resultados = df_resultados.merge(resultados_bootstrap(['GOOGL'], alphas), on="Alpha")
 
 ## Imprimimos los resultados
 print(df_resultados)
@@ -91,4 +42,12 @@ print(df_resultados)
 ## Mostramos los resultados en la página
 st.subheader("📊 Resultados del VaR y ES")
 bonito_df = df_resultados.style.format("{:.5f}").applymap(lambda x: "color: red;" if x < 0 else "")
-st.dataframe(bonito_df, use_container_width=True)
\ No newline at end of file
+st.dataframe(bonito_df, use_container_width=True)
+st.markdown("""
+📌 **t-Student**: los grados de libertad, la media y la escala se ajustan por máxima verosimilitud, y el VaR y ES se calculan en forma cerrada.  
+📌 **Cornish-Fisher**: el cuantil normal se corrige con el sesgo y la curtosis de los rendimientos.  
+📌 **Filtrado**: simulación histórica filtrada; los rendimientos se estandarizan con su volatilidad EWMA y se reescalan con la volatilidad pronosticada para mañana.  
+📏 **IC inf. / IC sup.**: intervalo de confianza al 95% del VaR y ES histórico y filtrado, obtenido con 10,000 réplicas bootstrap por bloques de la serie.
+""")
+
+panel("Cálculo de VaR y ES")
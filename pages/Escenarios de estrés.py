@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from utils import resultados_escenarios
+from graficas import figura
+from riesgo import etiqueta_alpha
+from instrumentacion import iniciar_pagina, panel, tramo
+
+## Configuración de la página
+st.set_page_config(page_title="💥 Escenarios de Estrés", layout="wide")
+iniciar_pagina("Escenarios de estrés")  ## Instrumentación opcional (ver instrumentacion.py)
+
+st.title("💥 Escenarios de estrés")
+st.markdown("""
+En esta sección se revalúan las posiciones actuales (monto invertido en cada acción) con escenarios de estrés, en lugar de
+métricas estadísticas:
+- **Escenarios históricos**: el rendimiento de cada acción en periodos de crisis (por ejemplo, la caída por el COVID-19 en 2020).
+- **Escenarios hipotéticos**: choques definidos por el usuario, como una caída de 20% de todas las acciones.
+- **Pérdidas a varios días**: el VaR y ES a 10 días escalando el de un día por la raíz del tiempo, comparado con el cálculo directo
+  sobre los rendimientos de todas las ventanas traslapadas de 10 días.
+""")
+
+## Configuración de las posiciones: tickers y monto invertido en cada uno
+tickers = st.text_input("Tickers (separados por comas):", "GOOGL, AAPL, MSFT, AMZN")
+tickers = [ticker.strip().upper() for ticker in tickers.split(",") if ticker.strip()]
+if not tickers:
+    st.info("📌 Escribe al menos un ticker.")
+    st.stop()
+
+col1, col2 = st.columns([2, 1])
+with col1:
+    posiciones = st.data_editor(pd.DataFrame({"Ticker": tickers, "Monto": 10_000.0}), hide_index=True,
+                                disabled=["Ticker"], use_container_width=True)["Monto"]
+with col2:
+    horizonte = st.number_input("Horizonte de las pérdidas (días):", min_value=2, max_value=60, value=10)
+if not np.abs(posiciones).sum():
+    st.warning("⚠️ Las posiciones no pueden ser todas cero.")
+    st.stop()
+
+## Choques hipotéticos en porcentaje (rendimiento simple de cada acción); se pueden agregar o quitar escenarios
+st.subheader("✍️ Escenarios hipotéticos")
+choques = st.data_editor(pd.DataFrame({"Escenario": ["Caída del mercado", "Caída severa", "Rebote"],
+                                       **{ticker: [-20.0, -35.0, 10.0] for ticker in tickers}}),
+                         num_rows="dynamic", hide_index=True, use_container_width=True,
+                         column_config={ticker: st.column_config.NumberColumn(f"{ticker} (%)", min_value=-99.0)
+                                        for ticker in tickers})
+choques = choques.dropna(subset=["Escenario"]).fillna(0.0)
+choques = tuple((nombre, tuple(fila / 100)) for nombre, fila in zip(choques["Escenario"], choques[tickers].to_numpy()))
+
+## Los resultados están en caché (ver utils.py); se recalculan solo si cambian las posiciones o los escenarios
+alphas = (0.95, 0.975, 0.99)
+with st.spinner('⏳ Evaluando los escenarios...'):
+    historicos, hipoteticos, horizontes, ventanas = resultados_escenarios(tuple(tickers), tuple(posiciones), choques,
+                                                                          horizonte, alphas)
+
+formato = {"Rendimiento del portafolio (%)": "{:.2f}%", "Pérdida y ganancia": "${:,.2f}"}
+st.dataframe(hipoteticos.style.format(formato, na_rep="sin datos"), use_container_width=True)
+
+st.subheader("🏛️ Escenarios históricos")
+st.dataframe(historicos.style.format(formato, na_rep="sin datos"), use_container_width=True)
+st.markdown("""
+📌 Cada escenario va del cierre de la fecha inicial al cierre de la fecha final. Los periodos fuera de las fechas disponibles, o con
+acciones que aún no cotizaban, se marcan **sin datos**. La columna *Mayor pérdida* indica la acción que más perdió en el escenario.
+""")
+
+with tramo("gráfica de escenarios"):
+    escenarios = pd.concat([historicos["Pérdida y ganancia"], hipoteticos["Pérdida y ganancia"]]).dropna().sort_values()
+    fig = go.Figure(go.Bar(x=escenarios.to_numpy(), y=escenarios.index, orientation="h",
+                           marker_color=np.where(escenarios.to_numpy() < 0, "#ea314e", "#004c99")))
+    fig.update_layout(title="Pérdida y ganancia por escenario", xaxis_title="Pérdida y ganancia ($)", height=450)
+    st.plotly_chart(fig, use_container_width=True)
+
+st.subheader(f"📆 Pérdidas a {horizonte} días")
+st.dataframe(horizontes.style.format({"Alpha": etiqueta_alpha, "Directo / √t": "{:.3f}"}
+                                      | {columna: "${:,.2f}" for columna in horizontes.columns[1:-1]}),
+             use_container_width=True, hide_index=True)
+st.markdown(f"""
+📌 La regla de la **raíz del tiempo** supone rendimientos independientes e idénticamente distribuidos. Una razón *Directo / √t*
+mayor a 1 indica que el escalamiento subestima la pérdida a {horizonte} días (por ejemplo, por rachas de caídas); menor a 1, que la
+sobreestima. Las ventanas traslapadas comparten días, por lo que el cálculo directo es más ruidoso.
+""")
+
+## Histograma de la pérdida y ganancia de todas las ventanas (calculado en el servidor, solo se envían los conteos)
+with tramo("histograma de ventanas"):
+    conteos, bordes = np.histogram(ventanas, bins=60)
+    fig = figura(f"Pérdida y ganancia de las ventanas traslapadas de {horizonte} días", "Pérdida y ganancia ($)", "Frecuencia")
+    fig.add_trace(go.Bar(x=(bordes[:-1] + bordes[1:]) / 2, y=conteos, width=np.diff(bordes), name="Ventanas",
+                         marker=dict(color="#7F7FFF", line=dict(color="black", width=1))))
+    for alpha, var in zip(alphas, horizontes[f"VaR {horizonte} días (directo)"]):
+        fig.add_vline(x=var, line_dash="dash", line_color="#ea314e", annotation_text=f"VaR {etiqueta_alpha(alpha)}")
+    st.plotly_chart(fig, use_container_width=True)
+
+panel("Escenarios de estrés")
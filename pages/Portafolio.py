@@ -0,0 +1,75 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+from utils import resultados_portafolio
+from graficas import agregar_serie, figura
+from riesgo import etiqueta_alpha
+from instrumentacion import iniciar_pagina, panel, tramo
+
+## Configuración de la página
+st.set_page_config(page_title="💼 Riesgo de Portafolio", layout="wide")
+iniciar_pagina("Portafolio")  ## Instrumentación opcional (ver instrumentacion.py)
+
+st.title("💼 VaR y ES de un portafolio")
+st.markdown("""
+En esta sección, el **VaR** y el **ES** se calculan para un portafolio de varias acciones. La matriz de covarianza de los
+rendimientos logarítmicos se estima con **EWMA** (RiskMetrics, λ = 0.94) o con una **ventana móvil**, y con ella se obtienen:
+- El VaR y ES **paramétrico** (normal) del portafolio.
+- El VaR y ES **Monte Carlo**, con rendimientos simulados correlacionados mediante la factorización de **Cholesky**.
+- La **descomposición** del riesgo: VaR marginal y VaR por componente de cada acción, que suman el VaR del portafolio.
+""")
+
+## Configuración del portafolio: tickers y pesos (se normalizan para que sumen 1)
+tickers = st.text_input("Tickers (separados por comas):", "GOOGL, AAPL")
+tickers = [ticker.strip().upper() for ticker in tickers.split(",") if ticker.strip()]
+if len(tickers) < 2:
+    st.info("📌 Escribe al menos dos tickers para formar un portafolio.")
+    st.stop()
+
+pesos = st.data_editor(pd.DataFrame({"Ticker": tickers, "Peso": 1 / len(tickers)}), hide_index=True,
+                       disabled=["Ticker"], use_container_width=True)["Peso"]
+if pesos.sum() <= 0:
+    st.warning("⚠️ Los pesos deben sumar una cantidad positiva.")
+    st.stop()
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    estimador = st.radio("Estimador de la covarianza:", ["EWMA", "Ventana móvil"], horizontal=True)
+with col2:
+    ventana = st.number_input("Tamaño de ventana (días):", min_value=20, max_value=2520, value=252,
+                              disabled=estimador == "EWMA")
+with col3:
+    alphas = (0.95, 0.975, 0.99)
+    alpha = st.selectbox("Nivel de confianza de la descomposición:", alphas, index=2, format_func=etiqueta_alpha)
+
+## Los resultados están en caché (ver utils.py); se recalculan solo si cambia el portafolio o el estimador
+with st.spinner('⏳ Calculando el riesgo del portafolio...'):
+    tabla, descomposicion, rendimientos = resultados_portafolio(
+        tuple(tickers), tuple(pesos), alphas, "ewma" if estimador == "EWMA" else "movil", ventana, alpha)
+
+st.subheader("📊 VaR y ES del portafolio")
+st.dataframe(tabla.style.format("{:.5f}").map(lambda x: "color: red;" if x < 0 else ""), use_container_width=True, hide_index=True)
+
+st.subheader(f"🧩 Descomposición del VaR al {etiqueta_alpha(alpha)}")
+st.dataframe(descomposicion.style.format({"Peso": "{:.4f}", "VaR Marginal": "{:.5f}", "VaR Componente": "{:.5f}",
+                                          "Contribución (%)": "{:.2f}%", "ES Componente": "{:.5f}",
+                                          "ES Componente Monte Carlo": "{:.5f}"}), use_container_width=True)
+st.markdown("""
+📌 El **VaR marginal** es el cambio del VaR del portafolio al aumentar el peso de una acción, y el **VaR por componente** es el peso por
+el VaR marginal; la contribución indica qué proporción del riesgo del portafolio aporta cada acción.
+""")
+
+## Gráficas: contribución de cada acción y rendimientos del portafolio
+col1, col2 = st.columns(2)
+with col1:
+    with tramo("gráfica de contribuciones"):
+        fig = go.Figure(go.Bar(x=descomposicion.index, y=descomposicion["Contribución (%)"], marker_color="#004c99"))
+        fig.update_layout(title="Contribución al VaR por acción", xaxis_title="Ticker", yaxis_title="Contribución (%)", height=450)
+        st.plotly_chart(fig, use_container_width=True)
+with col2:
+    with tramo("gráfica del portafolio"):
+        fig = figura("Rendimientos logarítmicos diarios del portafolio", "Fecha", "Rendimiento (%)", alto=450)
+        agregar_serie(fig, rendimientos * 100, "Portafolio", "#7F7FFF", metodo="minmax", fill="tozeroy")
+        st.plotly_chart(fig, use_container_width=True)
+
+panel("Portafolio")
@@ -0,0 +1,80 @@
+import os
+
+import streamlit as st
+from flujo import VENTANA_INTRADIA, FuenteReproduccion, FuenteYahooIntradia, MotorFlujo
+from graficas import agregar_serie, figura
+from instrumentacion import iniciar_pagina, panel, tramo
+
+## Configuración de la página
+st.set_page_config(page_title="⏱️ Riesgo Intradía", layout="wide")
+iniciar_pagina("Riesgo intradía")  ## Instrumentación opcional (ver instrumentacion.py)
+
+st.title("⏱️ VaR y ES intradía en tiempo real")
+st.markdown("""
+En esta sección, el **VaR** y el **ES** histórico y paramétrico se actualizan con cada barra intradía (por ejemplo, de 1 minuto)
+conforme llega, sin volver a calcular la ventana completa (ver flujo.py). Las barras pueden venir de **Yahoo Finance** o de la
+**reproducción de un archivo** guardado con `python flujo.py GOOGL`, que permite simular el mercado sin conexión.
+""")
+
+## Configuración del flujo
+fuente = st.radio("Fuente de las barras:", ["Reproducción de archivo", "Yahoo Finance (1 minuto)"], horizontal=True)
+col1, col2, col3 = st.columns(3)
+with col1:
+    ventana = st.number_input("Tamaño de ventana (barras):", min_value=30, max_value=5000, value=VENTANA_INTRADIA)
+if fuente == "Reproducción de archivo":
+    with col2:
+        origen = st.text_input("Archivo de barras (CSV o Parquet):", os.environ.get("BARRAS_INTRADIA", "barras.parquet"))
+    with col3:
+        velocidad = st.number_input("Barras por segundo:", min_value=1, max_value=100_000, value=60)
+    if not os.path.exists(origen):
+        st.info(f"📂 No se encontró el archivo **{origen}**. Puede generarse con `python flujo.py GOOGL --salida {origen}`.")
+        st.stop()
+else:
+    with col2:
+        origen = st.text_input("Tickers (separados por comas):", "GOOGL")
+    velocidad = None
+
+## El motor se guarda en la sesión y solo se crea de nuevo si cambia la configuración
+configuracion = (fuente, ventana, origen, velocidad)
+if st.session_state.get("configuracion_flujo") != configuracion:
+    if velocidad is None:
+        lector = FuenteYahooIntradia([ticker.strip().upper() for ticker in origen.split(",") if ticker.strip()])
+    else:
+        lector = FuenteReproduccion(origen, barras_por_segundo=velocidad)
+    st.session_state["motor_flujo"] = MotorFlujo(lector, ventana=ventana, alphas=(0.95, 0.99))
+    st.session_state["configuracion_flujo"] = configuracion
+
+
+## Panel que se actualiza cada segundo; al ser un fragmento, el resto de la página no se vuelve a ejecutar
+@st.fragment(run_every=1)
+def panel_intradia():
+    motor = st.session_state["motor_flujo"]
+    nuevas = motor.actualizar()
+    st.caption(f"📡 {motor.barras:,} barras procesadas ({nuevas:,} en la última actualización)"
+               + (" · reproducción terminada" if motor.fuente.terminada else ""))
+    ## Un ticker puede tener motor sin rendimientos todavía (solo una barra, o precios faltantes o no positivos)
+    riesgos = {ticker: riesgo for ticker, riesgo in motor.riesgos.items() if riesgo.historia}
+    if not riesgos:
+        st.info("⏳ Esperando barras...")
+        return
+
+    for ticker, riesgo in riesgos.items():
+        historia = riesgo.historia_df()
+        ultima = historia.iloc[-1]
+        st.subheader(f"📈 {ticker}")
+        columnas = st.columns(4)
+        for columna, nombre in zip(columnas, ["95% VaR Histórico", "99% VaR Histórico", "ES histórico al 95%", "ES histórico al 99%"]):
+            columna.metric(label=nombre, value=f"{ultima[nombre] * 100:.4f}%")
+
+        with tramo("gráfica intradía"):
+            fig = figura(f"Rendimientos y métricas de riesgo de {ticker} (ventana de {riesgo.ventana} barras)", "Fecha", "Valor (%)", alto=450)
+            agregar_serie(fig, historia["Returns"] * 100, "Rendimientos (%)", "#7F7FFF", metodo="minmax")
+            for nombre, color in (("95% VaR Histórico", "darkblue"), ("99% VaR Histórico", "darkorange"),
+                                  ("ES histórico al 95%", "darkviolet"), ("ES histórico al 99%", "gold")):
+                agregar_serie(fig, historia[nombre] * 100, nombre, color)
+            st.plotly_chart(fig, use_container_width=True)
+
+
+panel_intradia()
+
+panel("Riesgo intradía")
@@ -1,14 +1,13 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import yfinance as yf
-import datetime
-from scipy.stats import norm, t
-from utils import obtener_datos, rendimientos_logaritmicos
+from utils import metricas_riesgo_movil_grafica, rendimientos_sesion, violaciones_riesgo_movil
+from graficas import agregar_serie, figura
+from riesgo import columnas_colas_pesadas, columnas_var_es_movil, etiqueta_alpha
+from instrumentacion import iniciar_pagina, panel, tramo
 
 ##Configuraos la página en Streamlit
 st.set_page_config(page_title="📊 Análisis de Riesgo en los Rendimientos", layout="wide")
+iniciar_pagina("Rolling Window")  ## Instrumentación opcional (ver instrumentacion.py)
 
 ## Introducción a la página: 
 st.markdown("""
@@ -21,134 +20,88 @@ Asimismo, se emplearon dos enfoques distintos para el cálculo de dichas métric
 1. **Paramétrico:** Se asume una distribución normal de los rendimientos logarítmicos.
 2. **Histórico:** Se basa en los datos observados de los rendimientos logarítmicos.
 
+También pueden graficarse dos enfoques paramétricos de colas pesadas: una **t de Student** ajustada por máxima verosimilitud
+en cada ventana y la expansión de **Cornish-Fisher**, que corrige el cuantil normal por el sesgo y la curtosis.
+
 Cada métrica se calculó bajo niveles de confianza del **95% y 99%**, utilizando una ventana de 252 días. Lo anterior facilitó contar con una mejor visualización 
-            de la evolución del riesgo de la acción, a lo largo del periodo estudiado.
+            de la evolución del riesgo de la acción, a lo largo del periodo estudiado. La ventana (de 20 a 2520 días) y los niveles de confianza pueden cambiarse abajo;
+            los comentarios al final de la página corresponden a los valores por defecto.
 """)
 
-## Definimos el tamaño de la ventana
-tamaño_ventana = 252
-
-## Hacemos la carga de datos, con spinner para el tiempo de espera
+## El usuario elige el tamaño de la ventana y los niveles de confianza (por defecto, 252 días al 95% y 99%)
+col1, col2 = st.columns(2)
+with col1:
+    tamaño_ventana = st.slider("Tamaño de ventana (días):", min_value=20, max_value=2520, value=252, step=1)
+with col2:
+    alphas = st.multiselect("Niveles de confianza:", [0.90, 0.95, 0.975, 0.99, 0.995], default=[0.95, 0.99],
+                            format_func=etiqueta_alpha)
+if not alphas:
+    st.warning("⚠️ Selecciona al menos un nivel de confianza.")
+    st.stop()
+alphas = tuple(sorted(alphas))
+
+## La página se organiza en etapas en caché (ver utils.py) que se invalidan por separado: la carga de datos,
+## las métricas móviles y la tabla de violaciones. La gráfica es un fragmento que se redibuja sin recalcularlas
+
+## Etapa 1: hacemos la carga de datos, con spinner para el tiempo de espera. Los rendimientos se comparten con las
+## demás páginas de la sesión y son de solo lectura (ver utils.py)
 with st.spinner('⏳ Cargando datos...'):
-    df = obtener_datos(['GOOGL'])
-    df_logrendimientos = rendimientos_logaritmicos(df)
-
-## Para evitar errores en el código, convertimos la columna de fechas a una columna por separado:
-df_logrendimientos['Date'] = df_logrendimientos.index
-
-## Obtenemos la media y la desviación estándar de los rendimientos logarítmicos
-rolling_mean = df_logrendimientos['Returns'].rolling(window=tamaño_ventana).mean()
-rolling_std = df_logrendimientos['Returns'].rolling(window=tamaño_ventana).std()
-
-## Calculamos el VaR histórico y paramétrico al 95% y 99%
-
-## VaR Paramétrico al 95%
-VaR_95_Para = norm.ppf(1-0.95, rolling_mean, rolling_std)
-VaR_Para_df_95 = pd.DataFrame({'Date': df_logrendimientos.index, '95% VaR Paramétrico': VaR_95_Para.squeeze()})
-VaR_Para_df_95.set_index('Date', inplace=True)
-VaR_Para_df_95 = VaR_Para_df_95.dropna()
-
-## VaR Paramétrico al 99%
-VaR_99_Para = norm.ppf(1-0.99, rolling_mean, rolling_std)
-VaR_Para_df_99 = pd.DataFrame({'Date': df_logrendimientos.index, '99% VaR Paramétrico': VaR_99_Para.squeeze()})
-VaR_Para_df_99.set_index('Date', inplace=True)
-VaR_Para_df_99 = VaR_Para_df_99.dropna()
-
-## VaR Histórico al 95%
-VaR_95_hist = df_logrendimientos['Returns'].rolling(window=tamaño_ventana).quantile(0.05)
-vaR_hist_df_95 = pd.DataFrame({'Date': df_logrendimientos.index, '95% VaR Histórico': VaR_95_hist.squeeze()})
-vaR_hist_df_95.set_index('Date', inplace=True)
-vaR_hist_df_95 = vaR_hist_df_95.dropna()
-
-## VaR Histórico al 99%
-VaR_99_hist = df_logrendimientos['Returns'].rolling(window=tamaño_ventana).quantile(0.01)
-vaR_hist_df_99 = pd.DataFrame({'Date': df_logrendimientos.index, '99% VaR Histórico': VaR_99_hist.squeeze()})
-vaR_hist_df_99.set_index('Date', inplace=True)
-vaR_hist_df_99 = vaR_hist_df_99.dropna()
-
-## Calculamos el ES histórico y paramétrico al 95% y 99%
-## ES Histórico al 95%
-ES_95_hist_df = df_logrendimientos['Returns'].rolling(window=tamaño_ventana).apply(lambda x: x[x <= x.quantile(0.05)].mean())
-ES_95_hist_df = ES_95_hist_df.dropna()
-ES_95_hist_df = ES_95_hist_df.rename( "ES histórico al 95%")
-
-## ES Histórico al 99%
-ES_99_hist_df = df_logrendimientos['Returns'].rolling(window=tamaño_ventana).apply(lambda x: x[x <= x.quantile(0.01)].mean())
-ES_99_hist_df = ES_99_hist_df.dropna()
-ES_99_hist_df = ES_99_hist_df.rename( "ES histórico al 99%")
-
-## ES Paramétrico al 95%
-ES_95_Para_df = df_logrendimientos['Returns'].rolling(window=tamaño_ventana).apply(lambda x: x[x <= norm.ppf(1-0.95, np.mean(x), np.std(x))].mean())
-ES_95_Para_df = ES_95_Para_df.dropna()
-ES_95_Para_df = ES_95_Para_df.rename( "ES paramétrico al 95%")
-
-## ES Paramétrico al 99%
-ES_99_Para_df = df_logrendimientos['Returns'].rolling(window=tamaño_ventana).apply(lambda x: x[x <= norm.ppf(1-0.99, np.mean(x), np.std(x))].mean())
-ES_99_Para_df = ES_99_Para_df.dropna()
-ES_99_Para_df = ES_99_Para_df.rename( "ES paramétrico al 99%")
-
-## Definimos opciones para la selección de métricas en nuestro gráfico:
-opciones_metricas = [
-    "VaR Histórico 95%",
-    "VaR Histórico 99%",
-    "VaR Paramétrico 95%",
-    "VaR Paramétrico 99%",
-    "ES Histórico 95%",
-    "ES Histórico 99%",
-    "ES Paramétrico 95%",
-    "ES Paramétrico 99%",
-    "Todas las métricas"
-]
-
-## Utilizamos un multiselect para que el usuario pueda elegir las métricas que desea visualizar
-seleccion = st.multiselect("Selecciona las métricas a visualizar:", opciones_metricas, default=["Todas las métricas"])
-
-## Si el usuario selecciona "Todas las métricas", mostramos todas
-if "Todas las métricas" in seleccion:
-    seleccion = opciones_metricas[:-1]
-
-## Creamos la gráfica
-st.subheader("📈 Rendimientos logarítmicos diarios con métricas de riesgo")
-plt.figure(figsize=(14, 7))
-
-## Graficamos los rendimientos logarítmicos
-plt.plot(df_logrendimientos.index, df_logrendimientos['Returns'] * 100, label='Rendimientos Logarítmicos Diarios (%)', color='#7F7FFF', alpha=0.8)
-
-## Graficamos solo las métricas seleccionadas
-if "VaR Histórico 95%" in seleccion:
-    plt.plot(vaR_hist_df_95.index, vaR_hist_df_95['95% VaR Histórico'] * 100, label='VaR Histórico 95%', color='darkblue')
-
-if "VaR Histórico 99%" in seleccion:
-    plt.plot(vaR_hist_df_99.index, vaR_hist_df_99['99% VaR Histórico'] * 100, label='VaR Histórico 99%', color='darkorange')
-
-if "VaR Paramétrico 95%" in seleccion:
-    plt.plot(VaR_Para_df_95.index, VaR_Para_df_95['95% VaR Paramétrico'] * 100, label='VaR Paramétrico 95%', color='mediumseagreen')
-
-if "VaR Paramétrico 99%" in seleccion:
-    plt.plot(VaR_Para_df_99.index, VaR_Para_df_99['99% VaR Paramétrico'] * 100, label='VaR Paramétrico 99%', color='firebrick')
-
-if "ES Histórico 95%" in seleccion:
-    plt.plot(ES_95_hist_df.index, ES_95_hist_df * 100, label='ES Histórico 95%', color='darkviolet')
-
-if "ES Histórico 99%" in seleccion:
-    plt.plot(ES_99_hist_df.index, ES_99_hist_df * 100, label='ES Histórico 99%', color='gold')
-
-if "ES Paramétrico 95%" in seleccion:
-    plt.plot(ES_95_Para_df.index, ES_95_Para_df * 100, label='ES Paramétrico 95%', color='dodgerblue')
-
-if "ES Paramétrico 99%" in seleccion:
-    plt.plot(ES_99_Para_df.index, ES_99_Para_df * 100, label='ES Paramétrico 99%', color='tan')
-
-
-plt.title('Rendimientos Logarítmicos Diarios con Métricas de Riesgo')
-plt.xlabel('Fecha')
-plt.ylabel('Valor (%)')
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-
-## Mostramos la gráfica en Streamlit
-st.pyplot(plt)
+    df_logrendimientos = rendimientos_sesion(['GOOGL'])
+
+## Guardamos las fechas para elegir el periodo de la gráfica
+fechas = pd.DatetimeIndex(df_logrendimientos['Date'])
+
+## Definimos las métricas que se pueden seleccionar en nuestro gráfico, con su columna y su color
+colores = ['darkblue', 'darkorange', 'mediumseagreen', 'firebrick', 'darkviolet', 'gold', 'dodgerblue', 'tan',
+           'teal', 'crimson', 'olive', 'slategray', 'hotpink', 'sienna', 'navy', 'limegreen', 'purple', 'goldenrod',
+           'steelblue', 'indianred']
+nombres = [f"{metodo} {etiqueta}" for etiqueta in map(etiqueta_alpha, alphas)
+           for metodo in ("VaR Histórico", "VaR Paramétrico", "ES Histórico", "ES Paramétrico")]
+nombres += [f"{metodo} {etiqueta}" for etiqueta in map(etiqueta_alpha, alphas)
+            for metodo in ("VaR t-Student", "ES t-Student", "VaR Cornish-Fisher", "ES Cornish-Fisher")]
+columnas = columnas_var_es_movil(alphas) + columnas_colas_pesadas(alphas)
+series_metricas = {nombre: (columna, colores[i % len(colores)]) for i, (nombre, columna) in enumerate(zip(nombres, columnas))}
+opciones_metricas = list(series_metricas) + ["Todas las métricas"]
+
+
+## Etapa 2: la gráfica. Al ser un fragmento, cambiar la selección o el periodo solo vuelve a ejecutar esta función
+@st.fragment
+def grafica_metricas():
+    ## Utilizamos un multiselect para que el usuario pueda elegir las métricas que desea visualizar
+    ## Por defecto se muestran las métricas históricas y normales; las de colas pesadas se agregan desde la lista
+    seleccion = st.multiselect("Selecciona las métricas a visualizar:", opciones_metricas,
+                               default=opciones_metricas[:4 * len(alphas)])
+
+    ## Si el usuario selecciona "Todas las métricas", mostramos todas
+    if "Todas las métricas" in seleccion:
+        seleccion = opciones_metricas[:-1]
+
+    ## Creamos la gráfica
+    st.subheader(f"📈 Rendimientos logarítmicos diarios con métricas de riesgo (ventana de {tamaño_ventana} días)")
+
+    ## Periodo a graficar: cada serie se reduce al ancho de la gráfica dentro de este periodo (ver graficas.py),
+    ## por lo que al elegir un periodo más corto se muestra más detalle
+    periodo = st.slider("Periodo a graficar:", min_value=fechas[0].date(), max_value=fechas[-1].date(),
+                        value=(fechas[0].date(), fechas[-1].date()), format="YYYY-MM-DD")
+
+    ## Las series reducidas al ancho de la gráfica para el periodo están en caché (ver utils.py)
+    with tramo("gráfica de métricas móviles"):
+        series = metricas_riesgo_movil_grafica(['GOOGL'], tamaño_ventana, alphas, periodo)
+        fig = figura('Rendimientos Logarítmicos Diarios con Métricas de Riesgo', 'Fecha', 'Valor (%)', alto=650)
+
+        ## Graficamos los rendimientos logarítmicos
+        agregar_serie(fig, series['Returns'], 'Rendimientos Logarítmicos Diarios (%)', '#7F7FFF', opacity=0.8)
+
+        ## Graficamos solo las métricas seleccionadas, siempre en el mismo orden
+        for opcion, (columna, color) in series_metricas.items():
+            if opcion in seleccion:
+                agregar_serie(fig, series[columna], opcion, color)
+
+        ## Mostramos la gráfica en Streamlit
+        st.plotly_chart(fig, use_container_width=True)
+
+
+grafica_metricas()
 
 st.markdown("""
 De manera general, se observa que el VaR siempre se encuentra por debajo del ES, lo cual es esperado, ya que el ES promedia las pérdidas que superan el VaR.
@@ -162,60 +115,23 @@ st.markdown("""
 Para evaluar la eficiencia de nuestras estimaciones de **VaR** y **ES**, analizamos el número y porcentaje de violaciones de nuestras medidas de riesgo sobre los rendimientos logarítmicos reales de **Google**.
 
 ✅ **Regla general**: Se considera que una buena estimación de riesgo debe generar un porcentaje de violaciones inferior pero cercano al **2.5%**.  
+🧪 Para el VaR se incluyen además las pruebas de **Kupiec** (proporción de violaciones), de **independencia de Christoffersen** (las violaciones no se agrupan) y de **cobertura condicional** (ambas); un p-valor menor a 0.05 indica que el modelo se rechaza.  
 📋 A continuación, se presenta una tabla con los resultados obtenidos:
 """, unsafe_allow_html=True)
 
-## Definimos el dataframe con las medidas de riesgo:
-df_Medidas_Riesgo = pd.concat([df_logrendimientos['Returns'].iloc[tamaño_ventana-1:], vaR_hist_df_95, vaR_hist_df_99, VaR_Para_df_95, VaR_Para_df_99, ES_95_hist_df, ES_95_Para_df, ES_99_hist_df, ES_99_Para_df], axis=1)
-
-violaciones_VaR_hist_95 = (df_Medidas_Riesgo['Returns'] < df_Medidas_Riesgo['95% VaR Histórico']).sum()
-porcentaje_violaciones_VaR_hist_95 = (violaciones_VaR_hist_95 / len(df_Medidas_Riesgo)) * 100
-#print("El porcentaje de violaciones para el VaR histórico al 95% es de: " , porcentaje_violaciones_VaR_hist_95.round(4), "%" )
-
-violaciones_VaR_hist_99 = (df_Medidas_Riesgo['Returns'] < df_Medidas_Riesgo['99% VaR Histórico']).sum()
-porcentaje_violaciones_VaR_hist_99 = (violaciones_VaR_hist_99 / len(df_Medidas_Riesgo)) * 100
-#print("El porcentaje de violaciones para el VaR histórico al 99% es de: " , porcentaje_violaciones_VaR_hist_99.round(4), "%" )
-
-violaciones_VaR_Para_95 = (df_Medidas_Riesgo['Returns'] < df_Medidas_Riesgo['95% VaR Paramétrico']).sum()
-porcentaje_violaciones_VaR_Para_95 = (violaciones_VaR_Para_95 / len(df_Medidas_Riesgo)) * 100
-#print("El porcentaje de violaciones para el VaR paramétrico al 95% es de: " , porcentaje_violaciones_VaR_Para_95.round(4), "%" )
-
-violaciones_VaR_Para_99 = (df_Medidas_Riesgo['Returns'] < df_Medidas_Riesgo['99% VaR Paramétrico']).sum()
-porcentaje_violaciones_VaR_Para_99 = (violaciones_VaR_Para_99 / len(df_Medidas_Riesgo)) * 100
-#print("El porcentaje de violaciones para el VaR paramétrico al 99% es de: " , porcentaje_violaciones_VaR_Para_99.round(4), "%" )
-
-violaciones_ES_hist_95 = (df_Medidas_Riesgo['Returns'] < df_Medidas_Riesgo['ES histórico al 95%']).sum()
-porcentaje_violaciones_ES_hist_95 = (violaciones_ES_hist_95 / len(df_Medidas_Riesgo)) * 100
-#print("El porcentaje de violaciones para el ES histórico al 95% es de: " , porcentaje_violaciones_ES_hist_95.round(4), "%" )
-
-violaciones_ES_hist_99 = (df_Medidas_Riesgo['Returns'] < df_Medidas_Riesgo['ES histórico al 99%']).sum()
-porcentaje_violaciones_ES_hist_99 = (violaciones_ES_hist_99 / len(df_Medidas_Riesgo)) * 100
-#print("El porcentaje de violaciones para el ES histórico al 99% es de: " , porcentaje_violaciones_ES_hist_99.round(4), "%" )
-
-violaciones_ES_Para_95 = (df_Medidas_Riesgo['Returns'] < df_Medidas_Riesgo['ES paramétrico al 95%']).sum()
-porcentaje_violaciones_ES_Para_95 = (violaciones_ES_Para_95 / len(df_Medidas_Riesgo)) * 100
-#print("El porcentaje de violaciones para el ES paramétrico al 95% es de: " , porcentaje_violaciones_ES_Para_95.round(4), "%" )
-
-violaciones_ES_Para_99 = (df_Medidas_Riesgo['Returns'] < df_Medidas_Riesgo['ES paramétrico al 99%']).sum()
-porcentaje_violaciones_ES_Para_99 = (violaciones_ES_Para_99 / len(df_Medidas_Riesgo)) * 100
-#print("El porcentaje de violaciones para el ES paramétrico al 99% es de: " , porcentaje_violaciones_ES_Para_99.round(4), "%" )
-
-df_porcentaje_y_numero_de_violaciones = (pd.DataFrame({'VaR Histórico al 95%': [porcentaje_violaciones_VaR_hist_95, violaciones_VaR_hist_95],
-                                                      'VaR Histórico al 99%': [porcentaje_violaciones_VaR_hist_99, violaciones_VaR_hist_99],
-                                                      'VaR Paramétrico al 95%': [porcentaje_violaciones_VaR_Para_95, violaciones_VaR_Para_95],
-                                                      'VaR Paramétrico al 99%': [porcentaje_violaciones_VaR_Para_99, violaciones_VaR_Para_99],
-                                                      'ES Histórico al 95%': [porcentaje_violaciones_ES_hist_95, violaciones_ES_hist_95],
-                                                      'ES Histórico al 99%': [porcentaje_violaciones_ES_hist_99, violaciones_ES_hist_99],
-                                                      'ES Paramétrico al 95%': [porcentaje_violaciones_ES_Para_95, violaciones_ES_Para_99],
-                                                      'ES Paramétrico al 99%': [porcentaje_violaciones_ES_Para_99, violaciones_ES_Para_99]}, index = ["Porcentaje de Violaciones", "Número de Violaciones"])).T
-df_porcentaje_y_numero_de_violaciones["Porcentaje de Violaciones"] = df_porcentaje_y_numero_de_violaciones["Porcentaje de Violaciones"].astype(float)
-df_porcentaje_y_numero_de_violaciones['Número de Violaciones'] = df_porcentaje_y_numero_de_violaciones['Número de Violaciones'].astype(int)
+## Etapa 3: evaluamos todas las medidas de riesgo a la vez (ver backtesting.py); la tabla también está en caché
+## El ES no tiene una probabilidad de violación nominal, por lo que para él solo se reportan los conteos
+df_porcentaje_y_numero_de_violaciones = violaciones_riesgo_movil(['GOOGL'], tamaño_ventana, alphas)
+df_porcentaje_y_numero_de_violaciones = df_porcentaje_y_numero_de_violaciones.drop(columns=["Observaciones", "Porcentaje Esperado"])
 
 ## Mostramos nuestro DataFrame con mejor formato
 st.dataframe(df_porcentaje_y_numero_de_violaciones.style.format({
     "Porcentaje de Violaciones": "{:.2f}%",  # Aquí agregamos el símbolo '%'
-    "Número de Violaciones": "{:,}"  # Separador de miles
-}).set_properties(**{
+    "Número de Violaciones": "{:,}",  # Separador de miles
+    "Kupiec LR": "{:.2f}", "Kupiec p-valor": "{:.4f}",
+    "Independencia LR": "{:.2f}", "Independencia p-valor": "{:.4f}",
+    "Cobertura Condicional LR": "{:.2f}", "Cobertura Condicional p-valor": "{:.4f}",
+}, na_rep="—").set_properties(**{
     'text-align': 'center',
     'font-size': '14px'
 }).set_table_styles([{
@@ -276,3 +192,4 @@ Además, se confirma que el VaR y el ES al 99% están por debajo de sus equivale
 
 """, unsafe_allow_html=True)
 
+panel("Rolling Window")
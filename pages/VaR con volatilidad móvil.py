@@ -3,71 +3,69 @@
 ## Importamos librerías necesarias para el proyecto
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import yfinance as yf
-import datetime
-from scipy.stats import norm
-from utils import obtener_datos, rendimientos_logaritmicos
+from utils import rendimientos_sesion, metricas_volatilidad_movil, metricas_volatilidad_condicional
+from backtesting import backtest
+from graficas import agregar_serie, figura
+from instrumentacion import iniciar_pagina, panel, tramo
 
 # Configuración de la página
 st.set_page_config(page_title="📉 Cálculo de VaR con VM y DN", layout="wide")
+iniciar_pagina("VaR con volatilidad móvil")  ## Instrumentación opcional (ver instrumentacion.py)
 
 st.title("💻 Cálculo de VaR con Volatilidad Móvil y Distribución Normal para GOOGLE")
 st.write("🔍 Esta sección muestra el cálculo del VaR basado en volatilidad móvil y distribución normal.")
 
-## Carga de datos con spinner
+## Carga de datos con spinner; los rendimientos se comparten con las demás páginas de la sesión (ver utils.py)
 ticker = "GOOGL"
 with st.spinner('⏳ Cargando datos...'):
-    df = obtener_datos(ticker)
-    df_rendimientos = rendimientos_logaritmicos(df)
+    df_rendimientos = rendimientos_sesion(ticker)
 
 # Parámetros
 tamaño_ventana = 252
 alphas = [0.05, 0.01]
-q_alphas = [norm.ppf(alpha) for alpha in alphas]
-VaR_moviles = {alpha: [] for alpha in alphas}
 
-# Cálculo del VaR con rolling window
-for i in range(tamaño_ventana, len(df_rendimientos)):
-    ventana = df_rendimientos["Returns"].iloc[i - tamaño_ventana:i]  # Tomamos rendimientos, no precios
-    sigma_t = ventana.std()
-    for alpha, q_alpha in zip(alphas, q_alphas):
-        VaR = q_alpha * sigma_t
-        VaR_moviles[alpha].append(VaR)
+# Cálculo del VaR con rolling window: la volatilidad de cada fecha se obtiene de los rendimientos
+# de los 252 días previos, actualizando sumas acumuladas en lugar de recalcular cada ventana
+VaR_moviles_df = metricas_volatilidad_movil(ticker, tamaño_ventana, tuple(alphas))
 
-# DataFrame con los VaR
-VaR_moviles_df = pd.DataFrame(VaR_moviles, index=df_rendimientos.index[tamaño_ventana:])
+# Modelos de volatilidad condicional (ver volatilidad.py). Se comparan en las mismas fechas que la ventana móvil
+modelos = {
+    "Ventana móvil (252 días)": VaR_moviles_df,
+    "EWMA (RiskMetrics, λ = 0.94)": metricas_volatilidad_condicional(ticker, "ewma", tuple(alphas)).iloc[tamaño_ventana:],
+    "GARCH(1,1)": metricas_volatilidad_condicional(ticker, "garch", tuple(alphas)).iloc[tamaño_ventana:],
+}
+modelo = st.selectbox("Modelo de volatilidad:", list(modelos))
+VaR_df = modelos[modelo]
 
 # Mostrar datos en Streamlit
 st.write("📊 Datos de retornos logarítmicos:", df_rendimientos.head())
-st.write("📉 VaR calculado:", VaR_moviles_df.head())
-
-# Gráfica de resultados
-fig, ax = plt.subplots(figsize=(12, 6))
-ax.plot(df_rendimientos["Date"][tamaño_ventana:], df_rendimientos["Returns"][tamaño_ventana:], label='Retornos Logarítmicos', color = '#7F7FFF')
-ax.plot(df_rendimientos["Date"][tamaño_ventana:], VaR_moviles_df[0.05], label='VaR 95%', color='firebrick', linestyle='-')
-ax.plot(df_rendimientos["Date"][tamaño_ventana:], VaR_moviles_df[0.01], label='VaR 99%', color='gold', linestyle='-')
-ax.set_title('VaR con Volatilidad Móvil y Distribución Normal para GOOGL')
-ax.set_xlabel('Fecha')
-ax.set_ylabel('Valor')
-ax.legend()
-ax.grid(True)
-st.pyplot(fig)
-
-## Cálculo de violaciones
-## Cálculo de violaciones
-violaciones_data = []
-
-for alpha in alphas:
-    violaciones = (df_rendimientos["Returns"][tamaño_ventana:] < VaR_moviles_df[alpha]).sum()
-    porcentaje_violaciones = (violaciones / len(VaR_moviles_df)) * 100
-    violaciones_data.append([f"{(1-alpha):.0%}", f"{porcentaje_violaciones:.4f}%", violaciones])
-
-df_violaciones = pd.DataFrame(violaciones_data, columns=["Nivel de Confianza", "Porcentaje de Violaciones", "Número de Violaciones"])
+st.write("📉 VaR calculado:", VaR_df.head())
+
+# Gráfica de resultados, con cada serie reducida al ancho de la gráfica (ver graficas.py)
+with tramo("gráfica del VaR"):
+    fechas = pd.DatetimeIndex(df_rendimientos["Date"][tamaño_ventana:])
+    fig = figura(f'VaR con {modelo} y Distribución Normal para GOOGL', 'Fecha', 'Valor', alto=550)
+    agregar_serie(fig, pd.Series(df_rendimientos["Returns"][tamaño_ventana:].to_numpy(), index=fechas), 'Retornos Logarítmicos', '#7F7FFF', metodo="minmax")
+    agregar_serie(fig, pd.Series(VaR_df[0.05].to_numpy(), index=fechas), 'VaR 95%', 'firebrick')
+    agregar_serie(fig, pd.Series(VaR_df[0.01].to_numpy(), index=fechas), 'VaR 99%', 'gold')
+    st.plotly_chart(fig, use_container_width=True)
+
+## Cálculo de violaciones y pruebas de Kupiec y Christoffersen para todos los modelos (ver backtesting.py)
+with tramo("backtesting"):
+    pronosticos = pd.DataFrame({(nombre, f"{(1-alpha):.0%}"): VaR_modelo[alpha] for nombre, VaR_modelo in modelos.items() for alpha in alphas})
+    probabilidades = [alpha for _ in modelos for alpha in alphas]
+    df_violaciones = backtest(df_rendimientos["Returns"][tamaño_ventana:], pronosticos, probabilidades)
+    df_violaciones.index = pd.MultiIndex.from_tuples(df_violaciones.index, names=["Modelo", "Nivel de Confianza"])
+    df_violaciones = df_violaciones.drop(columns=["Observaciones", "Porcentaje Esperado"]).reset_index()
 
 st.subheader("📌 **Tabla de Violaciones del VaR**")
-st.table(df_violaciones)
+st.dataframe(df_violaciones.style.format({
+    "Porcentaje de Violaciones": "{:.4f}%",
+    "Kupiec LR": "{:.2f}", "Kupiec p-valor": "{:.4f}",
+    "Independencia LR": "{:.2f}", "Independencia p-valor": "{:.4f}",
+    "Cobertura Condicional LR": "{:.2f}", "Cobertura Condicional p-valor": "{:.4f}",
+}), hide_index=True)
+st.caption("Los parámetros del GARCH(1,1) se estiman con todo el periodo, por lo que su tabla de violaciones es dentro de muestra.")
 
 st.markdown("""
 ## 📝 **Conclusiones**
@@ -89,3 +87,5 @@ El gráfico muestra que el VaR con volatilidad móvil se ajusta dinámicamente a
 
 ⚠️ **Nota importante**: Ambos escenarios están sujetos a incertidumbre. Las decisiones de inversión deben considerar factores económicos, estructurales y otros eventos difíciles de predecir. El VaR es solo una herramienta más en la toma de decisiones, no una garantía de rendimiento.
 """)
+
+panel("VaR con volatilidad móvil")
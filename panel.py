@@ -0,0 +1,135 @@
+"""
+En este código se encuentra el panel compacto de series (tickers × fechas) para trabajar con miles de tickers.
+
+Un DataFrame de fechas × tickers guarda cada métrica en su propio bloque con su propio índice, y al armar los
+resultados con columnas (métrica, ticker) se copian todos los datos. El panel guarda los valores en un solo arreglo
+contiguo con una fila por ticker (la serie de cada ticker queda contigua, que es como la recorren las ventanas
+móviles) y un solo índice de fechas compartido. Los resultados de las funciones móviles de riesgo.py sobre un panel
+son un ``PanelMetricas``: un arreglo (métricas × tickers × fechas) del que cada métrica se obtiene como vista, sin
+copias, ya sea como arreglo o como DataFrame.
+
+Los valores pueden guardarse en float32, que usa la mitad de la memoria. Los cálculos se hacen en float64 (por
+bloques), de modo que la única pérdida es el redondeo al guardar los rendimientos y los resultados: un error
+relativo de a lo más 2^-24 ≈ 6e-8 por valor. En el VaR y ES móviles la diferencia contra float64 es del orden de
+1e-7 relativo (1e-8 en valor absoluto), muy por debajo del error de estimación de las métricas.
+"""
+
+import numpy as np
+import pandas as pd
+
+## Número de tickers cuyos rendimientos se calculan a la vez al construir un panel desde precios
+TICKERS_POR_GRUPO = 256
+
+
+## Tipo de los valores: float64 (por defecto) o float32
+def _tipo(dtype):
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError("El panel solo guarda valores float32 o float64")
+    return dtype
+
+
+## DataFrame (fechas × columnas) sobre un arreglo (columnas × fechas) contiguo, sin copiarlo
+def _dataframe(valores, fechas, columnas):
+    return pd.DataFrame(valores.T, index=fechas, columns=columnas, copy=False)
+
+
+class Panel:
+    """
+    Series de varios tickers en un arreglo contiguo (tickers × fechas) con un índice de fechas compartido. Las
+    funciones de riesgo.py lo aceptan en lugar de un DataFrame; ``matriz`` es la vista (fechas × tickers) que usan.
+    """
+
+    def __init__(self, valores, fechas, tickers, dtype=None):
+        valores = np.asarray(valores)
+        self.valores = np.ascontiguousarray(valores, dtype=_tipo(valores.dtype if dtype is None else dtype))
+        if self.valores.ndim != 2:
+            raise ValueError("Los valores del panel deben ser una matriz (tickers × fechas)")
+        self.fechas = pd.Index(fechas)
+        self.tickers = pd.Index(tickers)
+        if self.valores.shape != (len(self.tickers), len(self.fechas)):
+            raise ValueError("Los valores no corresponden a los tickers y las fechas del panel")
+
+    ## Panel a partir de un DataFrame (fechas × tickers). Si el DataFrame tiene un solo bloque del mismo tipo guardado
+    ## por columnas (como los que arma pandas al concatenar o al leer Parquet), los valores no se copian
+    @classmethod
+    def desde_dataframe(cls, df, dtype=np.float64):
+        return cls(df.to_numpy().T, df.index, df.columns, dtype)
+
+    ## Panel de rendimientos logarítmicos a partir de precios (DataFrame fechas × tickers), calculados en float64 por
+    ## grupos de tickers y guardados directamente en el tipo del panel, sin una copia completa intermedia
+    @classmethod
+    def rendimientos(cls, precios, dtype=np.float64):
+        valores = np.empty((precios.shape[1], len(precios) - 1), dtype=_tipo(dtype))
+        for inicio in range(0, precios.shape[1], TICKERS_POR_GRUPO):
+            grupo = precios.iloc[:, inicio:inicio + TICKERS_POR_GRUPO].to_numpy(dtype=np.float64).T
+            valores[inicio:inicio + TICKERS_POR_GRUPO] = np.log(grupo[:, 1:] / grupo[:, :-1])
+        return cls(valores, precios.index[1:], precios.columns)
+
+    @property
+    def shape(self):
+        return self.valores.shape[::-1]
+
+    @property
+    def dtype(self):
+        return self.valores.dtype
+
+    @property
+    def nbytes(self):
+        return self.valores.nbytes
+
+    ## Vista (fechas × tickers) de los valores
+    @property
+    def matriz(self):
+        return self.valores.T
+
+    ## Serie de un ticker, sin copia
+    def __getitem__(self, ticker):
+        return pd.Series(self.valores[self.tickers.get_loc(ticker)], index=self.fechas, name=ticker, copy=False)
+
+    ## DataFrame (fechas × tickers) sin copia
+    def a_dataframe(self):
+        return _dataframe(self.valores, self.fechas, self.tickers)
+
+
+class PanelMetricas:
+    """
+    Resultado de una función móvil sobre un panel: un arreglo (métricas × tickers × fechas) con las fechas y los
+    tickers del panel. ``resultado[métrica]`` es un DataFrame (fechas × tickers) y ``matriz(métrica)`` un arreglo,
+    ambos vistas sin copia.
+    """
+
+    def __init__(self, valores, fechas, tickers, metricas):
+        self.valores = valores
+        self.fechas = pd.Index(fechas)
+        self.tickers = pd.Index(tickers)
+        self.metricas = list(metricas)
+        self._posiciones = {metrica: i for i, metrica in enumerate(self.metricas)}
+
+    ## Panel de métricas lleno de NaN, que las funciones móviles llenan a través de ``matriz``
+    @classmethod
+    def vacio(cls, metricas, fechas, tickers, dtype=np.float64):
+        valores = np.full((len(metricas), len(tickers), len(fechas)), np.nan, dtype=_tipo(dtype))
+        return cls(valores, fechas, tickers, metricas)
+
+    @property
+    def nbytes(self):
+        return self.valores.nbytes
+
+    ## Vista (fechas × tickers) de una métrica
+    def matriz(self, metrica):
+        return self.valores[self._posiciones[metrica]].T
+
+    def __getitem__(self, metrica):
+        return _dataframe(self.valores[self._posiciones[metrica]], self.fechas, self.tickers)
+
+    ## Serie de una métrica para un ticker, sin copia
+    def serie(self, metrica, ticker):
+        return pd.Series(self.valores[self._posiciones[metrica], self.tickers.get_loc(ticker)], index=self.fechas,
+                         name=(metrica, ticker), copy=False)
+
+    ## DataFrame con columnas (métrica, ticker), como el que regresan las funciones de riesgo.py para un DataFrame,
+    ## también sin copia
+    def a_dataframe(self):
+        columnas = pd.MultiIndex.from_product([self.metricas, self.tickers])
+        return _dataframe(self.valores.reshape(-1, len(self.fechas)), self.fechas, columnas)
@@ -0,0 +1,143 @@
+"""
+En este código se encuentra la prueba de carga del servicio de riesgo (servicio.py): envía peticiones concurrentes y
+reporta la latencia (p50, p90, p99 y máxima) y el throughput.
+
+Por defecto levanta una instancia local del servicio en un proceso aparte (conviene usar ``PRECIOS_LOCALES`` para no
+depender de la descarga); con ``--url`` se prueba una instancia que ya está en marcha. Las peticiones se eligen al azar
+(con semilla) entre ``--distintas`` combinaciones de operación, tickers, alphas y métodos: con pocas combinaciones casi
+todas se sirven de la caché o esperan un cálculo idéntico en curso, y con muchas domina el cálculo. La latencia se
+reporta también solo para la primera vez que se envía cada combinación (caché vacía).
+
+Uso: python prueba_carga.py GOOGL AAPL MSFT [--peticiones 2000] [--concurrencia 32] [--distintas 20] [--url http://localhost:8000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+from riesgo import COLUMNAS_METODOS
+from servicio import COLUMNAS_MOVILES
+
+ALPHAS = (0.95, 0.975, 0.99)
+
+
+## Combinaciones de peticiones (ruta, cuerpo) para la prueba. El VaR y ES móvil pide las últimas 20 fechas, como un
+## tablero que se actualiza; Monte Carlo se deja fuera de la mitad de las tablas porque domina el tiempo de cálculo
+def peticiones_de_prueba(tickers, distintas, semilla=0):
+    generador = np.random.default_rng(semilla)
+    peticiones = []
+    for _ in range(distintas):
+        cuerpo = {"tickers": sorted(generador.choice(tickers, generador.integers(1, len(tickers) + 1), replace=False).tolist()),
+                  "alphas": sorted(generador.choice(ALPHAS, generador.integers(1, len(ALPHAS) + 1), replace=False).tolist())}
+        if generador.random() < 0.5:
+            metodos = [metodo for metodo in COLUMNAS_METODOS if metodo != "montecarlo" or generador.random() < 0.5]
+            peticiones.append(("var-es", dict(cuerpo, metodos=metodos)))
+        else:
+            metodos = [metodo for metodo in COLUMNAS_MOVILES if generador.random() < 0.75] or ["historico"]
+            peticiones.append(("var-es-movil", dict(cuerpo, metodos=metodos, ventana=int(generador.choice([126, 252])), ultimas=20)))
+    return peticiones
+
+
+## Puerto libre en la máquina local
+def _puerto_libre():
+    with socket.socket() as conexion:
+        conexion.bind(("localhost", 0))
+        return conexion.getsockname()[1]
+
+
+## Espera a que el servicio responda en /salud
+async def _esperar_servicio(cliente, url, limite=60):
+    inicio = time.monotonic()
+    while True:
+        try:
+            await cliente.fetch(f"{url}/salud")
+            return
+        except (ConnectionError, OSError, HTTPClientError):
+            if time.monotonic() - inicio > limite:
+                raise RuntimeError(f"El servicio no respondió en {url}") from None
+            await asyncio.sleep(0.2)
+
+
+async def prueba_carga(url, peticiones, total, concurrencia, semilla=0):
+    """
+    Envía ``total`` peticiones elegidas al azar de ``peticiones`` con ``concurrencia`` peticiones en curso a la vez.
+    Regresa la duración total, las latencias (segundos), los índices de las peticiones enviadas, si cada una fue la
+    primera de su combinación y el número de errores.
+    """
+    AsyncHTTPClient.configure(None, max_clients=concurrencia)
+    cliente = AsyncHTTPClient()
+    await _esperar_servicio(cliente, url)
+    orden = np.random.default_rng(semilla).integers(0, len(peticiones), total)
+    cuerpos = [json.dumps(cuerpo) for _, cuerpo in peticiones]
+    latencias = np.empty(total)
+    primeras = np.zeros(total, dtype=bool)
+    primeras[np.unique(orden, return_index=True)[1]] = True
+    errores = 0
+    siguiente = iter(range(total))
+
+    async def trabajador():
+        nonlocal errores
+        for i in siguiente:
+            ruta = peticiones[orden[i]][0]
+            inicio = time.perf_counter()
+            respuesta = await cliente.fetch(f"{url}/{ruta}", method="POST", body=cuerpos[orden[i]], raise_error=False,
+                                            request_timeout=300)
+            latencias[i] = time.perf_counter() - inicio
+            errores += respuesta.code != 200
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+    estado = json.loads((await cliente.fetch(f"{url}/salud")).body)
+    return duracion, latencias, orden, primeras, errores, estado
+
+
+def _reporte(nombre, latencias):
+    if not len(latencias):
+        return
+    p50, p90, p99 = np.percentile(latencias, [50, 90, 99]) * 1000
+    print(f"{nombre:<24} {len(latencias):>7,}  p50 {p50:9.2f} ms  p90 {p90:9.2f} ms  p99 {p99:9.2f} ms  "
+          f"máx {latencias.max() * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de riesgo")
+    parser.add_argument("tickers", nargs="*", default=["GOOGL", "AAPL", "MSFT", "AMZN"])
+    parser.add_argument("--peticiones", type=int, default=2000)
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--distintas", type=int, default=20, help="Combinaciones distintas de peticiones")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--url", default=None, help="Servicio en marcha (por defecto se levanta uno local)")
+    args = parser.parse_args()
+
+    url, proceso = args.url, None
+    if url is None:
+        puerto = _puerto_libre()
+        url = f"http://localhost:{puerto}"
+        proceso = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "servicio.py"),
+                                    "--puerto", str(puerto)], stdout=subprocess.DEVNULL)
+    try:
+        peticiones = peticiones_de_prueba(args.tickers, args.distintas, args.semilla)
+        duracion, latencias, orden, primeras, errores, estado = asyncio.run(
+            prueba_carga(url, peticiones, args.peticiones, args.concurrencia, args.semilla))
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+    print(f"{args.peticiones:,} peticiones ({args.distintas} distintas) con concurrencia {args.concurrencia} en "
+          f"{duracion:.2f} s: {args.peticiones / duracion:,.1f} peticiones/s, {errores} errores")
+    _reporte("Todas", latencias)
+    _reporte("Primera de cada una", latencias[primeras])
+    _reporte("Repetidas", latencias[~primeras])
+    for ruta in dict.fromkeys(ruta for ruta, _ in peticiones):
+        _reporte(f"/{ruta}", latencias[[peticiones[i][0] == ruta for i in orden]])
+    print(f"Servicio: {estado}")
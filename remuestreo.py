@@ -0,0 +1,82 @@
+"""
+En este código se encuentra el bootstrap por bloques para los intervalos de confianza del VaR y ES histórico.
+
+Cada réplica remuestrea la serie pegando bloques de ``bloque`` observaciones consecutivas que empiezan en
+posiciones aleatorias (moving block bootstrap), lo que conserva la dependencia de corto plazo de los rendimientos
+(por ejemplo, los periodos de alta volatilidad). Las réplicas se generan en lotes de tamaño fijo como matrices
+(réplicas × observaciones); igual que en montecarlo.py, el lote i usa su propio generador, obtenido con
+``SeedSequence(semilla).spawn``, por lo que el resultado depende solo de la semilla y no del número de procesos.
+De cada réplica solo se ordena la cola necesaria para el VaR y ES.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+## Número de valores remuestreados (réplicas × observaciones) por lote
+TAMAÑO_LOTE = 2 ** 20
+
+
+## Longitud de bloque por defecto: n^(1/3), la tasa óptima para estimar la varianza con bloques
+def longitud_bloque(n):
+    return max(1, int(round(n ** (1 / 3))))
+
+
+## VaR (cuantil con interpolación lineal) y ES de cada fila de ``muestras``, para todos los alphas
+def _var_es_filas(muestras, alphas):
+    n = muestras.shape[1]
+    posiciones = (1 - alphas) * (n - 1)
+    k = min(n, int(np.floor(posiciones.max())) + 2)
+    cola = np.sort(np.partition(muestras, k - 1, axis=1)[:, :k] if k < n else muestras, axis=1)
+    bajo = np.floor(posiciones).astype(int)
+    alto = np.minimum(bajo + 1, n - 1)
+    var = cola[:, bajo] + (posiciones - bajo) * (cola[:, alto] - cola[:, bajo])  ## (réplicas, alphas)
+    en_cola = cola[:, None, :] <= var[:, :, None]
+    es = -(np.where(en_cola, cola[:, None, :], 0.0).sum(axis=2) / en_cola.sum(axis=2))
+    return var.T, es.T
+
+
+## Genera un lote de réplicas por bloques y regresa su VaR y ES, de tamaño (alphas, réplicas)
+def _lote(argumentos):
+    semilla, replicas, valores, bloque, alphas = argumentos
+    n = len(valores)
+    generador = np.random.default_rng(semilla)
+    inicios = generador.integers(0, n - bloque + 1, size=(replicas, -(-n // bloque)))
+    posiciones = (inicios[:, :, None] + np.arange(bloque)).reshape(replicas, -1)[:, :n]
+    return _var_es_filas(valores[posiciones], alphas)
+
+
+def bootstrap_var_es(valores, alphas, n_replicas=10000, bloque=None, semilla=0, procesos=None, tamaño_lote=TAMAÑO_LOTE):
+    """
+    Distribución bootstrap por bloques del VaR y ES histórico de una serie (se omiten los datos faltantes).
+
+    Regresa dos arreglos de tamaño (len(alphas), n_replicas) con el VaR y el ES de cada réplica, con las mismas
+    definiciones que ``riesgo.tabla_var_es``: cuantil con interpolación lineal y promedio (con signo invertido) de
+    los valores que no superan el VaR.
+    """
+    valores = np.asarray(valores, dtype=np.float64).reshape(-1)
+    valores = valores[~np.isnan(valores)]
+    alphas = np.atleast_1d(np.asarray(alphas, dtype=np.float64))
+    bloque = longitud_bloque(len(valores)) if bloque is None else min(bloque, len(valores))
+
+    ## Lotes de tamaño fijo: su división no depende del número de procesos
+    por_lote = max(1, tamaño_lote // len(valores))
+    tamaños = [min(por_lote, n_replicas - inicio) for inicio in range(0, n_replicas, por_lote)]
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamaños))
+    argumentos = [(s, r, valores, bloque, alphas) for s, r in zip(semillas, tamaños)]
+
+    procesos = os.cpu_count() if procesos is None else procesos
+    if procesos > 1 and len(argumentos) > 1:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(argumentos))) as ejecutor:
+            lotes = list(ejecutor.map(_lote, argumentos))
+    else:
+        lotes = [_lote(argumento) for argumento in argumentos]
+    return np.concatenate([var for var, _ in lotes], axis=1), np.concatenate([es for _, es in lotes], axis=1)
+
+
+## Intervalos de confianza bootstrap (percentiles) al ``nivel`` dado: dos arreglos (len(alphas), 2) con los límites
+def bandas_var_es(valores, alphas, nivel=0.95, **opciones):
+    var, es = bootstrap_var_es(valores, alphas, **opciones)
+    limites = [(1 - nivel) / 2, (1 + nivel) / 2]
+    return np.quantile(var, limites, axis=1).T, np.quantile(es, limites, axis=1).T
@@ -0,0 +1,492 @@
+"""
+En este código se almacenan los cálculos de métricas de riesgo que comparten las páginas del proyecto.
+Las funciones trabajan directamente sobre arreglos de NumPy, de modo que pueden usarse fuera de Streamlit.
+Todas aceptan una serie (un solo activo) o una matriz de fechas × tickers, que se procesa columna por columna
+sin ciclos de Python.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.stats import norm
+
+from diagnosticos import momentos
+from distribuciones import ajustar_t, ajustar_t_anclas, momentos_filas, var_es_cornish_fisher, var_es_t
+from instrumentacion import tramo
+from montecarlo import simular_var_es
+from panel import Panel, PanelMetricas
+
+## Número de ventanas que se procesan a la vez, para acotar la memoria usada al ordenar
+TAMAÑO_BLOQUE = 8192
+
+## Número de valores (fechas × tickers) que se procesan a la vez en las métricas móviles; con más tickers, los
+## cálculos se hacen por grupos de tickers para que la memoria intermedia no crezca con el número de tickers
+TAMAÑO_GRUPO = 2 ** 20
+
+
+## Función para dar formato a los niveles de confianza (0.95 -> "95%", 0.975 -> "97.5%")
+def etiqueta_alpha(alpha):
+    return f"{alpha * 100:g}%"
+
+
+## Función para convertir cualquier serie de rendimientos en un arreglo de una dimensión
+def _como_arreglo(rendimientos):
+    return np.asarray(rendimientos, dtype=np.float64).reshape(-1)
+
+
+## Función para convertir rendimientos en una matriz (fechas × tickers), junto con su índice y sus tickers
+## Los tickers son None cuando la entrada es una sola serie, para regresar resultados sin MultiIndex
+## Un panel (ver panel.py) se lee sin copia; con ``compacto`` se conserva su tipo (float32), para las funciones que
+## pasan a float64 por bloques
+def _como_matriz(rendimientos, compacto=False):
+    if isinstance(rendimientos, Panel):
+        x = rendimientos.matriz
+        return (x if compacto else x.astype(np.float64, copy=False)), rendimientos.fechas, rendimientos.tickers
+    if isinstance(rendimientos, pd.DataFrame):
+        return rendimientos.to_numpy(dtype=np.float64), rendimientos.index, rendimientos.columns
+    valores = np.asarray(rendimientos, dtype=np.float64)
+    indice = rendimientos.index if isinstance(rendimientos, pd.Series) else pd.RangeIndex(len(valores))
+    if valores.ndim == 1:
+        return valores[:, None], indice, None
+    return valores, indice, pd.RangeIndex(valores.shape[1])
+
+
+## Arreglos de salida (fechas × tickers) de las funciones móviles, llenos de NaN. Para un panel son vistas de un
+## PanelMetricas del tipo del panel, que se regresa en lugar de armar un DataFrame
+def _salidas(rendimientos, nombres, indice, tickers):
+    if isinstance(rendimientos, Panel):
+        metricas = PanelMetricas.vacio(nombres, indice, tickers, rendimientos.dtype)
+        return {nombre: metricas.matriz(nombre) for nombre in nombres}, metricas
+    forma = (len(indice), 1 if tickers is None else len(tickers))
+    return {nombre: np.full(forma, np.nan) for nombre in nombres}, None
+
+
+## Función para armar el DataFrame de resultados: columnas simples para una serie, (métrica, ticker) para una matriz
+## Si las columnas son vistas de un PanelMetricas (ver _salidas), se regresa ese panel
+def _como_resultado(columnas, indice, tickers, metricas=None):
+    if metricas is not None:
+        return metricas
+    if tickers is None:
+        return pd.DataFrame({nombre: valores[:, 0] for nombre, valores in columnas.items()}, index=indice)
+    return pd.concat({nombre: pd.DataFrame(valores, index=indice, columns=tickers) for nombre, valores in columnas.items()}, axis=1)
+
+
+## Función para calcular los rendimientos logarítmicos de una matriz de precios (fechas × tickers)
+def rendimientos_log_matriz(precios):
+    """
+    Calcula ``log(P_t / P_{t-1})`` para todas las columnas a la vez, reutilizando el arreglo del cociente
+    para no crear copias intermedias. Regresa un arreglo o un DataFrame (sin la primera fecha) según la entrada.
+    """
+    valores = np.asarray(precios, dtype=np.float64)
+    rendimientos = np.divide(valores[1:], valores[:-1])
+    np.log(rendimientos, out=rendimientos)
+    if isinstance(precios, pd.DataFrame):
+        return pd.DataFrame(rendimientos, index=precios.index[1:], columns=precios.columns)
+    if isinstance(precios, pd.Series):
+        return pd.Series(rendimientos, index=precios.index[1:], name=precios.name)
+    return rendimientos
+
+
+## Promedio de los valores ordenados que no superan cada umbral, usando sumas acumuladas
+## ``acumuladas`` puede cubrir solo un prefijo de las ventanas; las colas más largas se suman completas
+def _media_cola(ordenadas, acumuladas, umbral):
+    limite = acumuladas.shape[1]
+    k = (ordenadas[:, :limite] <= umbral[:, None]).sum(axis=1)
+    suma = np.take_along_axis(acumuladas, np.maximum(k - 1, 0)[:, None], axis=1)[:, 0]
+    largas = k == limite
+    if limite < ordenadas.shape[1] and largas.any():
+        cola = ordenadas[largas] <= umbral[largas, None]
+        k[largas] = cola.sum(axis=1)
+        suma[largas] = np.where(cola, ordenadas[largas], 0.0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(k > 0, suma / k, np.nan)
+
+
+## Media y desviación estándar muestral de cada ventana que termina en la fecha i (incluida), en O(n)
+## mediante sumas acumuladas de los rendimientos centrados; NaN si la ventana está incompleta
+def _momentos_moviles(x, ventana):
+    x = np.asarray(x, dtype=np.float64)
+    media = np.full(x.shape, np.nan)
+    desviacion = np.full(x.shape, np.nan)
+    if len(x) < ventana:
+        return media, desviacion
+
+    ## Centrar los datos evita la cancelación numérica al restar sumas de cuadrados grandes
+    faltantes = np.isnan(x)
+    centro = np.nanmean(x, axis=0) if not faltantes.all() else 0.0
+    centrados = np.where(faltantes, 0.0, x - centro)
+    ceros = np.zeros((1,) + x.shape[1:])
+    s1 = np.concatenate((ceros, np.cumsum(centrados, axis=0)))
+    s2 = np.concatenate((ceros, np.cumsum(centrados ** 2, axis=0)))
+    nf = np.concatenate((ceros, np.cumsum(faltantes, axis=0)))
+    suma = s1[ventana:] - s1[:-ventana]
+    varianza = (s2[ventana:] - s2[:-ventana] - suma ** 2 / ventana) / (ventana - 1)
+    completas = (nf[ventana:] - nf[:-ventana]) == 0
+    media[ventana - 1:] = np.where(completas, suma / ventana + centro, np.nan)
+    desviacion[ventana - 1:] = np.where(completas, np.sqrt(np.maximum(varianza, 0.0)), np.nan)
+    return media, desviacion
+
+
+## Promedio por columna de los rendimientos que no superan el umbral de cada columna (ignorando NaN)
+def _media_cola_columnas(x, umbral):
+    cola = x <= umbral
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(cola, x, 0.0).sum(axis=0) / cola.sum(axis=0)
+
+
+## Regresa un escalar para una sola serie y un arreglo por ticker para una matriz
+def _por_ticker(valores, tickers):
+    return float(valores[0]) if tickers is None else valores
+
+
+## Media, curtosis (en exceso) y sesgo por columna, como en la página de Análisis Financiero
+def estadisticas_descriptivas(rendimientos):
+    x, _, tickers = _como_matriz(rendimientos)
+    resumen = momentos(x)  ## Una sola pasada por los datos (ver diagnosticos.py)
+    return {nombre: _por_ticker(resumen[nombre], tickers) for nombre in ("Media", "Curtosis", "Sesgo")}
+
+
+## Parámetros (media, escala, grados de libertad) de la t de Student ajustada a cada columna por máxima verosimilitud
+def _t_columnas(x):
+    if not np.isnan(x).any():
+        return ajustar_t(x.T)
+    parametros = [ajustar_t(columna[~np.isnan(columna)]) for columna in x.T]  ## Cada ticker con sus fechas
+    return tuple(np.array(valores) for valores in zip(*parametros))
+
+
+## Media, desviación (ddof=1), sesgo y curtosis en exceso de cada columna, para la expansión de Cornish-Fisher
+def _momentos_columnas(x):
+    resumen = momentos(x)
+    return resumen["Media"], np.sqrt(resumen["Varianza"]), resumen["Sesgo"], resumen["Curtosis"]
+
+
+## VaR y ES paramétricos por columna: normal (con el ES de los rendimientos observados), t de Student ajustada por
+## máxima verosimilitud o Cornish-Fisher (ambas con VaR y ES en forma cerrada, ver distribuciones.py)
+def var_es_parametrico(rendimientos, alpha, dist='normal'):
+    x, _, tickers = _como_matriz(rendimientos)
+    if dist == 'normal':
+        var = norm.ppf(1 - alpha, loc=np.nanmean(x, axis=0), scale=np.nanstd(x, axis=0, ddof=1))
+        es = -_media_cola_columnas(x, var)
+    elif dist == 't-student':
+        var, es = (valores[0] for valores in var_es_t(*_t_columnas(x), [alpha]))
+    elif dist == 'cornish-fisher':
+        var, es = (valores[0] for valores in var_es_cornish_fisher(*_momentos_columnas(x), [alpha]))
+    else:
+        raise ValueError("La distribución debe ser 'normal', 't-student' o 'cornish-fisher'")
+    return _por_ticker(var, tickers), _por_ticker(es, tickers)
+
+
+## VaR y ES históricos por columna
+def var_es_historico(rendimientos, alpha):
+    x, _, tickers = _como_matriz(rendimientos)
+    var = np.nanquantile(x, 1 - alpha, axis=0) if np.isnan(x).any() else np.quantile(x, 1 - alpha, axis=0)
+    es = -_media_cola_columnas(x, var)
+    return _por_ticker(var, tickers), _por_ticker(es, tickers)
+
+
+## VaR y ES por simulación Monte Carlo (normal) por columna, reproducible para una semilla dada (ver montecarlo.py)
+def var_es_montecarlo(rendimientos, alpha, n_sim=10000, semilla=0, procesos=None):
+    x, _, tickers = _como_matriz(rendimientos)
+    media, desviacion = np.nanmean(x, axis=0), np.nanstd(x, axis=0, ddof=1)
+    var, es = simular_var_es(media, desviacion, [alpha], n_sim=n_sim, semilla=semilla, procesos=procesos)
+    return _por_ticker(var[0], tickers), _por_ticker(es[0], tickers)
+
+
+## Nombres de las columnas de la tabla de resultados para cada método
+COLUMNAS_METODOS = {
+    "normal": ("VaR Normal", "ES Normal"),
+    "t-student": ("VaR t-Student", "ES t-Student"),
+    "cornish-fisher": ("VaR Cornish-Fisher", "ES Cornish-Fisher"),
+    "historico": ("VaR Histórico", "ES Histórico"),
+    "montecarlo": ("VaR Monte Carlo", "ES Monte Carlo"),
+}
+
+
+## Función para calcular la tabla completa de VaR y ES de varios métodos y alphas en una sola llamada
+def tabla_var_es(rendimientos, alphas, metodos=tuple(COLUMNAS_METODOS), n_sim=10000, semilla=0):
+    """
+    Calcula el VaR y ES de todos los ``metodos`` para todos los ``alphas`` a la vez.
+
+    Los rendimientos de cada ticker se ordenan una sola vez y su media y desviación se calculan una sola vez;
+    cada VaR normal e histórico se convierte en un ES con una búsqueda binaria sobre las sumas acumuladas de los
+    datos ordenados, y la t de Student (ajustada una sola vez) y Cornish-Fisher tienen VaR y ES en forma cerrada,
+    de modo que agregar alphas cuesta casi nada. Para una serie regresa la tabla de la página Cálculo de VaR y ES;
+    para una matriz agrega la columna ``Ticker``.
+    """
+    x, _, tickers = _como_matriz(rendimientos)
+    alphas = np.asarray(alphas, dtype=np.float64)
+    desconocidos = set(metodos) - set(COLUMNAS_METODOS)
+    if desconocidos:
+        raise ValueError(f"Métodos desconocidos: {sorted(desconocidos)}")
+
+    ordenadas = np.sort(x, axis=0)  ## Los NaN quedan al final de cada columna
+    n = (~np.isnan(x)).sum(axis=0)
+    acumuladas = np.cumsum(np.nan_to_num(ordenadas), axis=0)
+    media, desviacion = np.nanmean(x, axis=0), np.nanstd(x, axis=0, ddof=1)
+    colas = (1 - alphas)[:, None]
+
+    ## ES: promedio de los rendimientos que no superan cada VaR, con una búsqueda binaria por ticker
+    def es_de(var):
+        k = np.column_stack([np.searchsorted(ordenadas[:n[j], j], var[:, j], side="right") for j in range(x.shape[1])])
+        suma = np.take_along_axis(acumuladas, np.maximum(k - 1, 0), axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return -np.where(k > 0, suma / k, np.nan)
+
+    ## Cada método es un tramo de la instrumentación (ver instrumentacion.py), para saber cuál domina el tiempo
+    resultados = {}
+    if "normal" in metodos:
+        with tramo("VaR y ES normal"):
+            var = norm.ppf(colas, loc=media, scale=desviacion)
+            resultados["normal"] = (var, es_de(var))
+    if "t-student" in metodos:  ## t ajustada por máxima verosimilitud, con ES en forma cerrada
+        with tramo("VaR y ES t-Student"):
+            resultados["t-student"] = var_es_t(*_t_columnas(x), alphas)
+    if "cornish-fisher" in metodos:
+        with tramo("VaR y ES Cornish-Fisher"):
+            resultados["cornish-fisher"] = var_es_cornish_fisher(*_momentos_columnas(x), alphas)
+    if "historico" in metodos:
+        with tramo("VaR y ES histórico"):
+            ## Cuantil con interpolación lineal, igual que pandas
+            posicion = colas * (n - 1)
+            bajo = np.floor(posicion).astype(int)
+            alto = np.minimum(bajo + 1, n - 1)
+            var = np.take_along_axis(ordenadas, bajo, axis=0)
+            var = var + (posicion - bajo) * (np.take_along_axis(ordenadas, alto, axis=0) - var)
+            resultados["historico"] = (var, es_de(var))
+    if "montecarlo" in metodos:
+        with tramo("VaR y ES Monte Carlo"):
+            resultados["montecarlo"] = simular_var_es(media, desviacion, alphas, n_sim=n_sim, semilla=semilla)
+
+    columnas = {"Alpha": np.repeat(alphas, x.shape[1])}
+    for metodo in metodos:
+        nombre_var, nombre_es = COLUMNAS_METODOS[metodo]
+        columnas[nombre_var] = resultados[metodo][0].reshape(-1)
+        columnas[nombre_es] = resultados[metodo][1].reshape(-1)
+    tabla = pd.DataFrame(columnas)
+    if tickers is not None:
+        tabla.insert(0, "Ticker", np.tile(np.asarray(tickers), len(alphas)))
+    return tabla
+
+
+## Nombres de las columnas que regresa var_es_movil, en orden
+def columnas_var_es_movil(alphas):
+    return [nombre for etiqueta in map(etiqueta_alpha, alphas)
+            for nombre in (f"{etiqueta} VaR Histórico", f"{etiqueta} VaR Paramétrico",
+                           f"ES histórico al {etiqueta}", f"ES paramétrico al {etiqueta}")]
+
+
+## Función para calcular el VaR y ES móviles (histórico y paramétrico) en una sola pasada
+def var_es_movil(rendimientos, ventana=252, alphas=(0.95, 0.99)):
+    """
+    Calcula el VaR y ES histórico y paramétrico (normal) sobre ventanas móviles, para varios niveles de confianza.
+
+    Cada ventana se ordena una sola vez y de ella se obtienen todos los cuantiles y promedios de cola,
+    reproduciendo los resultados de ``rolling(window).quantile`` y de los ``rolling(window).apply`` de la página
+    Rolling Window. Regresa un DataFrame con el mismo índice que ``rendimientos``, con NaN en las primeras
+    ``ventana - 1`` filas y en las ventanas que contienen datos faltantes. Para una matriz, las columnas
+    son pares (métrica, ticker); para un panel (ver panel.py), regresa un ``PanelMetricas`` del tipo del panel.
+    """
+    x, indice, tickers = _como_matriz(rendimientos, compacto=True)
+    n, m = x.shape
+    columnas, metricas = _salidas(rendimientos, columnas_var_es_movil(alphas), indice, tickers)
+    if n >= ventana:  ## Los tickers se procesan por grupos (ver TAMAÑO_GRUPO)
+        por_grupo = max(1, TAMAÑO_GRUPO // n)
+        for inicio in range(0, m, por_grupo):
+            grupo = slice(inicio, inicio + por_grupo)
+            _var_es_movil_grupo(x[:, grupo], ventana, alphas, {nombre: valores[:, grupo] for nombre, valores in columnas.items()})
+    return _como_resultado(columnas, indice, tickers, metricas)
+
+
+## VaR y ES móviles de un grupo de tickers (fechas × tickers), escritos en las columnas de salida
+def _var_es_movil_grupo(x, ventana, alphas, columnas):
+    m = x.shape[1]
+
+    ## Vista sin copia de tamaño (tickers, n - ventana + 1, ventana); cada ticker se guarda contiguo en memoria
+    vistas = sliding_window_view(np.ascontiguousarray(x.T), ventana, axis=1)
+    z = {alpha: norm.ppf(1 - alpha) for alpha in alphas}
+    filas_bloque = max(1, TAMAÑO_BLOQUE // m)
+    medias, desviaciones = _momentos_moviles(x, ventana)
+
+    ## Las colas ocupan solo las primeras posiciones de cada ventana ordenada, así que basta acumular ese prefijo
+    limite = min(ventana, max(64, 4 * int(np.ceil((1 - min(alphas)) * ventana))))
+
+    for inicio in range(0, vistas.shape[1], filas_bloque):
+        bloque = vistas[:, inicio:inicio + filas_bloque].reshape(-1, ventana).astype(np.float64, copy=False)
+        filas = slice(ventana - 1 + inicio, ventana - 1 + inicio + len(bloque) // m)
+
+        ordenadas = np.sort(bloque, axis=1)
+        acumuladas = np.cumsum(ordenadas[:, :limite], axis=1)
+        media = medias[filas].T.reshape(-1)
+        desviacion = desviaciones[filas].T.reshape(-1)
+        incompletas = np.isnan(media)
+        desviacion_pob = desviacion * np.sqrt((ventana - 1) / ventana)  ## np.std (ddof=0), como en las lambdas
+
+        for alpha in alphas:
+            etiqueta = etiqueta_alpha(alpha)
+
+            ## Cuantil con interpolación lineal, igual que pandas
+            posicion = (1 - alpha) * (ventana - 1)
+            bajo = int(np.floor(posicion))
+            alto = min(bajo + 1, ventana - 1)
+            fraccion = posicion - bajo
+            var_hist = ordenadas[:, bajo] + fraccion * (ordenadas[:, alto] - ordenadas[:, bajo])
+
+            var_para = media + z[alpha] * desviacion
+            umbral_para = media + z[alpha] * desviacion_pob
+
+            for nombre, valores in ((f"{etiqueta} VaR Histórico", var_hist),
+                                    (f"{etiqueta} VaR Paramétrico", var_para),
+                                    (f"ES histórico al {etiqueta}", _media_cola(ordenadas, acumuladas, var_hist)),
+                                    (f"ES paramétrico al {etiqueta}", _media_cola(ordenadas, acumuladas, umbral_para))):
+                columnas[nombre][filas] = np.where(incompletas, np.nan, valores).reshape(m, -1).T
+
+
+## Nombres de las columnas que regresa var_es_movil_colas_pesadas, en orden
+def columnas_colas_pesadas(alphas):
+    return [nombre for etiqueta in map(etiqueta_alpha, alphas)
+            for nombre in (f"{etiqueta} VaR t-Student", f"ES t-Student al {etiqueta}",
+                           f"{etiqueta} VaR Cornish-Fisher", f"ES Cornish-Fisher al {etiqueta}")]
+
+
+## Función para calcular el VaR y ES móviles con la t de Student ajustada y con Cornish-Fisher
+def var_es_movil_colas_pesadas(rendimientos, ventana=252, alphas=(0.95, 0.99)):
+    """
+    Calcula el VaR y ES paramétrico de colas pesadas sobre ventanas móviles: t de Student ajustada por máxima
+    verosimilitud en cada ventana y expansión de Cornish-Fisher con los momentos de cada ventana (ver
+    distribuciones.py). Todas las ventanas de todos los tickers se ajustan a la vez; cada una empieza en los
+    parámetros de una ventana cercana ya ajustada. Tiene el mismo formato y los mismos signos que ``var_es_movil``
+    (el ES es el rendimiento promedio de la cola), con la columna adicional ``Grados de libertad``.
+    """
+    x, indice, tickers = _como_matriz(rendimientos, compacto=True)
+    n, m = x.shape
+    columnas, metricas = _salidas(rendimientos, columnas_colas_pesadas(alphas) + ["Grados de libertad"], indice, tickers)
+    if n < ventana:
+        return _como_resultado(columnas, indice, tickers, metricas)
+
+    ## Vista sin copia de tamaño (tickers, n - ventana + 1, ventana); como en var_es_movil, cada bloque junta las
+    ## mismas fechas de todos los tickers (TAMAÑO_BLOQUE ventanas en total) en un solo ajuste, y las ventanas con
+    ## datos faltantes se omiten
+    vistas = sliding_window_view(np.ascontiguousarray(x.T), ventana, axis=1)
+    filas_bloque = max(1, TAMAÑO_BLOQUE // m)
+    for inicio in range(0, vistas.shape[1], filas_bloque):
+        bloque = vistas[:, inicio:inicio + filas_bloque].reshape(-1, ventana)
+        completas = np.flatnonzero(~np.isnan(bloque).any(axis=1))
+        if not len(completas):
+            continue
+        muestras = bloque[completas].astype(np.float64, copy=False)
+        media, escala, grados = ajustar_t_anclas(muestras)
+        var_t, es_t = var_es_t(media, escala, grados, alphas)
+        media, varianza, sesgo, curtosis = momentos_filas(muestras)
+        var_cf, es_cf = var_es_cornish_fisher(media, np.sqrt(varianza * ventana / (ventana - 1)), sesgo, curtosis, alphas)
+
+        ## Cada fila del bloque es (ticker, fecha) en ese orden
+        columna, fila = np.divmod(completas, len(bloque) // m)
+        filas = ventana - 1 + inicio + fila
+        columnas["Grados de libertad"][filas, columna] = grados
+        for i, etiqueta in enumerate(map(etiqueta_alpha, alphas)):
+            columnas[f"{etiqueta} VaR t-Student"][filas, columna] = var_t[i]
+            columnas[f"ES t-Student al {etiqueta}"][filas, columna] = -es_t[i]
+            columnas[f"{etiqueta} VaR Cornish-Fisher"][filas, columna] = var_cf[i]
+            columnas[f"ES Cornish-Fisher al {etiqueta}"][filas, columna] = -es_cf[i]
+
+    return _como_resultado(columnas, indice, tickers, metricas)
+
+
+## Función para calcular la desviación estándar móvil de los ``ventana`` rendimientos previos a cada fecha
+def volatilidad_movil(rendimientos, ventana=252):
+    """
+    Regresa un arreglo con la desviación estándar muestral de ``x[i - ventana:i]`` en la posición ``i``
+    (NaN para ``i < ventana`` o si la ventana tiene datos faltantes), en O(n) mediante sumas acumuladas
+    de los rendimientos centrados. Acepta una serie o una matriz (fechas × tickers).
+    """
+    x = np.asarray(rendimientos, dtype=np.float64)
+    sigma = np.full(x.shape, np.nan)
+    sigma[1:] = _momentos_moviles(x, ventana)[1][:-1]
+    return sigma
+
+
+## Función para calcular el VaR normal con volatilidad móvil para varios alphas en una sola pasada
+def var_volatilidad_movil(rendimientos, ventana=252, alphas=(0.05, 0.01)):
+    x, indice, tickers = _como_matriz(rendimientos, compacto=True)
+    sigma = volatilidad_movil(x, ventana)[ventana:]
+    columnas, metricas = _salidas(rendimientos, [*alphas, "Sigma"], indice[ventana:], tickers)
+    for alpha in alphas:
+        columnas[alpha][:] = norm.ppf(alpha) * sigma
+    columnas["Sigma"][:] = sigma
+    return _como_resultado(columnas, indice[ventana:], tickers, metricas)
+
+
+class MomentosMoviles:
+    """
+    Acumulador de media y varianza sobre una ventana móvil (algoritmo de Welford con altas y bajas).
+
+    Cada observación nueva cuesta O(1); cada ``reanclaje`` pasos se recalculan los momentos desde la ventana
+    guardada para que el error de redondeo no se acumule en series largas o en alimentaciones en vivo.
+    """
+
+    def __init__(self, ventana=252, reanclaje=10_000):
+        self.ventana = ventana
+        self.reanclaje = reanclaje
+        self._datos = np.zeros(ventana)
+        self._posicion = 0
+        self._n = 0
+        self._media = 0.0
+        self._m2 = 0.0
+        self._pasos = 0
+
+    ## Crea el acumulador a partir de la historia, tomando solo los últimos ``ventana`` rendimientos
+    @classmethod
+    def desde_historia(cls, rendimientos, ventana=252, reanclaje=10_000):
+        acumulador = cls(ventana, reanclaje)
+        ultimos = _como_arreglo(rendimientos)[-ventana:]
+        acumulador._n = len(ultimos)
+        acumulador._datos[:len(ultimos)] = ultimos
+        acumulador._posicion = len(ultimos) % ventana
+        acumulador._reanclar()
+        return acumulador
+
+    def agregar(self, valor):
+        valor = float(valor)
+        if self._n < self.ventana:
+            self._n += 1
+            delta = valor - self._media
+            self._media += delta / self._n
+            self._m2 += delta * (valor - self._media)
+        else:
+            anterior = self._datos[self._posicion]
+            media_anterior = self._media
+            self._media += (valor - anterior) / self.ventana
+            self._m2 += (valor - anterior) * (valor - self._media + anterior - media_anterior)
+        self._datos[self._posicion] = valor
+        self._posicion = (self._posicion + 1) % self.ventana
+
+        self._pasos += 1
+        if self._pasos % self.reanclaje == 0:
+            self._reanclar()
+        return self.desviacion
+
+    ## Recalcula los momentos de manera exacta a partir de los datos de la ventana
+    def _reanclar(self):
+        datos = self._datos[:self._n] if self._n < self.ventana else self._datos
+        self._media = datos.mean() if self._n else 0.0
+        self._m2 = ((datos - self._media) ** 2).sum() if self._n else 0.0
+
+    @property
+    def completo(self):
+        return self._n == self.ventana
+
+    @property
+    def media(self):
+        return self._media
+
+    @property
+    def varianza(self):
+        return max(self._m2, 0.0) / (self._n - 1) if self._n > 1 else np.nan
+
+    @property
+    def desviacion(self):
+        return np.sqrt(self.varianza)
+
+    ## VaR normal con la volatilidad actual, como en la página de volatilidad móvil
+    def var(self, alphas=(0.05, 0.01)):
+        return {alpha: norm.ppf(alpha) * self.desviacion for alpha in alphas}
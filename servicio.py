@@ -0,0 +1,353 @@
+"""
+En este código se encuentra el servicio HTTP/JSON que calcula las métricas de riesgo fuera de Streamlit, con los
+mismos cálculos que las páginas Cálculo de VaR y ES (``riesgo.tabla_var_es``) y Rolling Window
+(``riesgo.var_es_movil`` y ``riesgo.var_es_movil_colas_pesadas``).
+
+- Cada petición es un lote: varios tickers, alphas y métodos, que se calculan con una sola llamada vectorizada por
+  grupo de tickers con las mismas fechas (una matriz fechas × tickers).
+- Las peticiones idénticas que llegan mientras una de ellas se calcula no repiten el cálculo: esperan el mismo
+  resultado. La carga de precios se comparte por ticker: una petición espera los tickers que otra ya está cargando
+  y carga juntos solo los demás, de modo que un ticker nunca se carga en dos hilos a la vez.
+- Los resultados (ya convertidos en JSON) se guardan en una caché LRU con vencimiento cuya clave incluye la versión
+  de los datos (última fecha y número de precios de cada ticker): cuando llegan precios nuevos, la clave cambia y los
+  resultados anteriores dejan de usarse. Los precios se vuelven a pedir al almacén (ver almacen.py) cada
+  ``TTL_PRECIOS`` segundos.
+
+Los cálculos se hacen en hilos aparte (numpy libera el GIL en las operaciones pesadas) para que el servidor siga
+atendiendo peticiones; las cachés solo se usan desde el ciclo de eventos, por lo que no necesitan candados.
+
+Rutas (el cuerpo de las peticiones POST es un objeto JSON; los campos distintos de ``tickers`` son opcionales):
+    POST /var-es        {"tickers": ["GOOGL", "AAPL"], "alphas": [0.95, 0.99], "metodos": ["normal", "historico"],
+                         "n_sim": 10000}
+    POST /var-es-movil  {"tickers": ["GOOGL"], "alphas": [0.95, 0.99], "ventana": 252,
+                         "metodos": ["historico", "parametrico", "t-student", "cornish-fisher"], "ultimas": 20}
+    GET  /salud
+
+Uso: python servicio.py [--puerto 8000] [--hilos 4] [--capacidad 1024] [--ttl 3600]
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import tornado.web
+
+from almacen import FECHA_INICIO, almacen_por_defecto
+from riesgo import COLUMNAS_METODOS, etiqueta_alpha, rendimientos_log_matriz, tabla_var_es, var_es_movil, var_es_movil_colas_pesadas
+
+## Tiempo (en segundos) que se conservan los resultados y los precios, y número máximo de resultados en la caché
+TTL_RESULTADOS = 3600
+TTL_PRECIOS = 300
+CAPACIDAD_CACHE = 1024
+
+## Número máximo de tickers y de simulaciones por petición
+MAXIMO_TICKERS = 500
+MAXIMO_SIMULACIONES = 1_000_000
+
+## Columnas del VaR y ES móviles de cada método para una etiqueta de alpha (ver riesgo.columnas_var_es_movil y
+## riesgo.columnas_colas_pesadas)
+COLUMNAS_MOVILES = {
+    "historico": ("{} VaR Histórico", "ES histórico al {}"),
+    "parametrico": ("{} VaR Paramétrico", "ES paramétrico al {}"),
+    "t-student": ("{} VaR t-Student", "ES t-Student al {}"),
+    "cornish-fisher": ("{} VaR Cornish-Fisher", "ES Cornish-Fisher al {}"),
+}
+
+
+class CacheLRU:
+    """
+    Caché LRU con vencimiento: guarda a lo más ``capacidad`` valores, descarta el usado hace más tiempo cuando se
+    llena y trata como ausente un valor guardado hace más de ``ttl`` segundos. Cuenta los aciertos y los fallos.
+    """
+
+    def __init__(self, capacidad=CAPACIDAD_CACHE, ttl=TTL_RESULTADOS, reloj=time.monotonic):
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self._reloj = reloj
+        self._valores = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self):
+        return len(self._valores)
+
+    def obtener(self, clave):
+        entrada = self._valores.get(clave)
+        if entrada is not None and self._reloj() - entrada[0] > self.ttl:
+            del self._valores[clave]
+            entrada = None
+        if entrada is None:
+            self.fallos += 1
+            return None
+        self._valores.move_to_end(clave)
+        self.aciertos += 1
+        return entrada[1]
+
+    def guardar(self, clave, valor):
+        self._valores[clave] = (self._reloj(), valor)
+        self._valores.move_to_end(clave)
+        while len(self._valores) > self.capacidad:
+            self._valores.popitem(last=False)
+
+
+## Validación de las peticiones: cada función regresa los parámetros normalizados (y hashables) o lanza ValueError
+
+## Campo del cuerpo como lista no vacía (un valor suelto se acepta como lista de un elemento)
+def _lista(cuerpo, campo, defecto=None):
+    valor = cuerpo.get(campo, defecto)
+    if isinstance(valor, (str, int, float)):
+        valor = [valor]
+    if not isinstance(valor, (list, tuple)) or not valor:
+        raise ValueError(f"El campo '{campo}' debe ser una lista no vacía")
+    return valor
+
+
+def _entero(cuerpo, campo, defecto, minimo, maximo):
+    valor = cuerpo.get(campo, defecto)
+    if valor is None or (isinstance(valor, int) and not isinstance(valor, bool) and minimo <= valor <= maximo):
+        return valor
+    raise ValueError(f"El campo '{campo}' debe ser un entero entre {minimo} y {maximo}")
+
+
+def _parametros_comunes(cuerpo, alphas, metodos):
+    if not isinstance(cuerpo, dict):
+        raise ValueError("El cuerpo de la petición debe ser un objeto JSON")
+    tickers = tuple(dict.fromkeys(str(ticker).strip().upper() for ticker in _lista(cuerpo, "tickers")))
+    if len(tickers) > MAXIMO_TICKERS:
+        raise ValueError(f"Se permiten a lo más {MAXIMO_TICKERS} tickers por petición")
+    try:
+        alphas = tuple(dict.fromkeys(float(alpha) for alpha in _lista(cuerpo, "alphas", alphas)))
+    except (TypeError, ValueError):
+        raise ValueError("Los alphas deben ser números") from None
+    if not all(0 < alpha < 1 for alpha in alphas):
+        raise ValueError("Los alphas deben estar entre 0 y 1")
+    pedidos = tuple(dict.fromkeys(map(str, _lista(cuerpo, "metodos", metodos))))
+    desconocidos = set(pedidos) - set(metodos)
+    if desconocidos:
+        raise ValueError(f"Métodos desconocidos: {sorted(desconocidos)}")
+    return {"tickers": tickers, "alphas": alphas, "metodos": pedidos}
+
+
+def _parametros_var_es(cuerpo):
+    parametros = _parametros_comunes(cuerpo, [0.95, 0.975, 0.99], list(COLUMNAS_METODOS))
+    parametros["n_sim"] = _entero(cuerpo, "n_sim", 10000, 1, MAXIMO_SIMULACIONES)
+    return parametros
+
+
+def _parametros_var_es_movil(cuerpo):
+    parametros = _parametros_comunes(cuerpo, [0.95, 0.99], list(COLUMNAS_MOVILES))
+    parametros["ventana"] = _entero(cuerpo, "ventana", 252, 2, 10_000)
+    parametros["ultimas"] = _entero(cuerpo, "ultimas", None, 1, 1_000_000)
+    return parametros
+
+
+## Cálculos (se ejecutan en los hilos del servicio)
+
+## Valores de un arreglo como lista para JSON, con null en lugar de NaN
+def _valores(arreglo):
+    return [None if valor != valor else valor for valor in arreglo.tolist()]
+
+
+## Rendimientos logarítmicos de cada ticker con sus propias fechas (como en materializar.py), agrupados en matrices
+## (fechas × tickers) de los tickers que tienen las mismas fechas, para calcularlos juntos
+def _matrices_rendimientos(precios):
+    grupos = {}
+    for ticker, serie in precios.items():
+        rendimientos = rendimientos_log_matriz(serie).dropna()
+        grupos.setdefault(rendimientos.index.asi8.tobytes(), {})[ticker] = rendimientos
+    return [pd.DataFrame(grupo) for grupo in grupos.values()]
+
+
+## Tabla de VaR y ES de un grupo de tickers. Las simulaciones de Monte Carlo dependen del número de columnas, por lo
+## que ese método se calcula ticker por ticker: así el resultado de un ticker no depende de los demás tickers del lote
+def _tabla_var_es(rendimientos, alphas, metodos, n_sim):
+    tabla = tabla_var_es(rendimientos, alphas, [metodo for metodo in metodos if metodo != "montecarlo"])
+    if "montecarlo" in metodos:
+        simuladas = [tabla_var_es(rendimientos[[ticker]], alphas, ("montecarlo",), n_sim=n_sim) for ticker in rendimientos]
+        simuladas = pd.concat(simuladas).sort_values("Alpha", kind="stable").reset_index(drop=True)
+        for nombre in COLUMNAS_METODOS["montecarlo"]:
+            tabla[nombre] = simuladas[nombre]
+    return tabla[["Ticker", "Alpha", *(nombre for metodo in metodos for nombre in COLUMNAS_METODOS[metodo])]]
+
+
+## Tabla de VaR y ES de la página Cálculo de VaR y ES, una fila por (alpha, ticker) en el orden de la petición
+def _calcular_var_es(precios, tickers, alphas, metodos, n_sim):
+    tabla = pd.concat([_tabla_var_es(rendimientos, alphas, metodos, n_sim)
+                       for rendimientos in _matrices_rendimientos(precios)], ignore_index=True)
+    orden = {ticker: i for i, ticker in enumerate(tickers)}
+    tabla = tabla.sort_values(["Alpha", "Ticker"], key=lambda columna: columna.map(orden) if columna.name == "Ticker" else columna,
+                              kind="stable")
+    columnas = {nombre: _valores(tabla[nombre].to_numpy()) for nombre in tabla.columns if nombre != "Ticker"}
+    return {"resultados": [{"Ticker": ticker, **{nombre: valores[i] for nombre, valores in columnas.items()}}
+                           for i, ticker in enumerate(tabla["Ticker"])]}
+
+
+## VaR y ES móviles de la página Rolling Window, con las fechas de cada ticker. Con ``ultimas`` solo se calculan las
+## últimas fechas, que necesitan las últimas ``ultimas + ventana - 1`` observaciones
+def _calcular_var_es_movil(precios, tickers, alphas, metodos, ventana, ultimas):
+    columnas = [nombre.format(etiqueta_alpha(alpha)) for metodo in metodos for alpha in alphas
+                for nombre in COLUMNAS_MOVILES[metodo]]
+    resultados = {}
+    for rendimientos in _matrices_rendimientos(precios):
+        if ultimas is not None:
+            rendimientos = rendimientos.iloc[-(ultimas + ventana - 1):]
+        partes = []
+        if {"historico", "parametrico"} & set(metodos):
+            partes.append(var_es_movil(rendimientos, ventana=ventana, alphas=alphas))
+        if {"t-student", "cornish-fisher"} & set(metodos):
+            partes.append(var_es_movil_colas_pesadas(rendimientos, ventana=ventana, alphas=alphas))
+        metricas = pd.concat(partes, axis=1)
+        if ultimas is not None:
+            metricas = metricas.iloc[-ultimas:]
+        fechas = metricas.index.strftime("%Y-%m-%d").tolist()
+        for ticker in rendimientos.columns:
+            resultados[ticker] = {"fechas": fechas, **{nombre: _valores(metricas[(nombre, ticker)].to_numpy())
+                                                      for nombre in columnas}}
+    return {"tickers": {ticker: resultados[ticker] for ticker in tickers}}
+
+
+## Respuesta en JSON (bytes) de un cálculo, con la versión de los datos con la que se hizo
+def _responder(calcular, precios, version, parametros):
+    resultado = calcular(precios, **parametros)
+    resultado["version"] = {ticker: {"ultima_fecha": fecha, "precios": n} for ticker, fecha, n in version}
+    return json.dumps(resultado, ensure_ascii=False, allow_nan=False).encode()
+
+
+## Operaciones del servicio: validación de la petición y cálculo
+OPERACIONES = {
+    "var-es": (_parametros_var_es, _calcular_var_es),
+    "var-es-movil": (_parametros_var_es_movil, _calcular_var_es_movil),
+}
+
+
+class ServicioRiesgo:
+    """
+    Resuelve las peticiones de las operaciones de ``OPERACIONES``: carga los precios (con su propia caché), busca el
+    resultado en la caché por (operación, parámetros, versión de los datos) y, si no está, lo calcula en un hilo. Un
+    cálculo en curso se comparte con las peticiones idénticas que llegan mientras tanto, y la carga en curso de un
+    ticker con todas las peticiones que lo incluyen.
+    """
+
+    def __init__(self, almacen=None, hilos=None, capacidad=CAPACIDAD_CACHE, ttl=TTL_RESULTADOS, ttl_precios=TTL_PRECIOS):
+        self.almacen = almacen if almacen is not None else almacen_por_defecto()
+        self.resultados = CacheLRU(capacidad, ttl)
+        self.precios = CacheLRU(max(capacidad, MAXIMO_TICKERS), ttl_precios)
+        self.ejecutor = ThreadPoolExecutor(max_workers=hilos)
+        self._en_curso = {}
+        self._precios_en_curso = {}  ## ticker -> carga en curso que lo incluye
+        self.agrupadas = 0  ## Peticiones que esperaron un cálculo idéntico en curso en lugar de repetirlo
+
+    ## Ejecuta ``funcion`` en un hilo, o espera a la ejecución en curso con la misma clave
+    async def _unico(self, clave, funcion, *argumentos):
+        tarea = self._en_curso.get(clave)
+        if tarea is None:
+            tarea = asyncio.get_running_loop().run_in_executor(self.ejecutor, funcion, *argumentos)
+            self._en_curso[clave] = tarea
+            tarea.add_done_callback(lambda _: self._en_curso.pop(clave, None))
+        else:
+            self.agrupadas += 1
+        ## shield: si se cancela una petición, el cálculo sigue para las demás que lo esperan
+        return await asyncio.shield(tarea)
+
+    def _cargar_precios(self, tickers):
+        fin = datetime.datetime.today().strftime('%Y-%m-%d')
+        precios = self.almacen.obtener_varios(list(tickers), FECHA_INICIO, fin)
+        return {ticker: precios[ticker].dropna() for ticker in tickers}
+
+    ## Precios de cierre de cada ticker (una serie por ticker). Los que no están en caché ni en una carga en curso se
+    ## cargan juntos en un hilo; los que otra petición ya está cargando se esperan
+    async def obtener_precios(self, tickers):
+        precios = {ticker: self.precios.obtener(ticker) for ticker in tickers}
+        faltantes = [ticker for ticker, serie in precios.items() if serie is None]
+        nuevos = tuple(ticker for ticker in faltantes if ticker not in self._precios_en_curso)
+        if nuevos:
+            tarea = asyncio.get_running_loop().run_in_executor(self.ejecutor, self._cargar_precios, nuevos)
+            for ticker in nuevos:
+                self._precios_en_curso[ticker] = tarea
+            tarea.add_done_callback(lambda terminada: self._terminar_carga(nuevos, terminada))
+        if len(nuevos) < len(faltantes):
+            self.agrupadas += 1
+        for ticker, tarea in [(ticker, self._precios_en_curso[ticker]) for ticker in faltantes]:
+            ## shield: si se cancela una petición, la carga sigue para las demás que la esperan
+            precios[ticker] = (await asyncio.shield(tarea))[ticker]
+        vacios = [ticker for ticker, serie in precios.items() if len(serie) < 2]
+        if vacios:
+            raise ValueError(f"No hay precios suficientes de {vacios}")
+        return precios
+
+    ## Guarda en la caché los precios de una carga terminada y la quita de las cargas en curso
+    def _terminar_carga(self, tickers, tarea):
+        for ticker in tickers:
+            if self._precios_en_curso.get(ticker) is tarea:
+                del self._precios_en_curso[ticker]
+        if not tarea.cancelled() and tarea.exception() is None:
+            for ticker, serie in tarea.result().items():
+                self.precios.guardar(ticker, serie)
+
+    ## Respuesta (JSON en bytes) de una operación para el cuerpo de una petición
+    async def resolver(self, operacion, cuerpo):
+        validar, calcular = OPERACIONES[operacion]
+        parametros = validar(cuerpo)
+        precios = await self.obtener_precios(parametros["tickers"])
+        version = tuple((ticker, serie.index[-1].strftime("%Y-%m-%d"), len(serie)) for ticker, serie in precios.items())
+        clave = (operacion, tuple(parametros.items()), version)
+        respuesta = self.resultados.obtener(clave)
+        if respuesta is None:
+            respuesta = await self._unico(clave, _responder, calcular, precios, version, parametros)
+            self.resultados.guardar(clave, respuesta)
+        return respuesta
+
+    def estado(self):
+        return {"estado": "ok", "en_curso": len(self._en_curso), "precios_en_curso": len(self._precios_en_curso),
+                "agrupadas": self.agrupadas,
+                **{f"cache_{nombre}": {"entradas": len(cache), "aciertos": cache.aciertos, "fallos": cache.fallos}
+                   for nombre, cache in (("resultados", self.resultados), ("precios", self.precios))}}
+
+
+class ManejadorOperacion(tornado.web.RequestHandler):
+    def initialize(self, servicio, operacion):
+        self.servicio = servicio
+        self.operacion = operacion
+
+    async def post(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        try:
+            respuesta = await self.servicio.resolver(self.operacion, json.loads(self.request.body or b"{}"))
+        except ValueError as error:  ## Incluye el JSON mal formado
+            self.set_status(400)
+            respuesta = json.dumps({"error": str(error)}, ensure_ascii=False).encode()
+        self.write(respuesta)
+
+
+class ManejadorSalud(tornado.web.RequestHandler):
+    def initialize(self, servicio):
+        self.servicio = servicio
+
+    def get(self):
+        self.write(self.servicio.estado())
+
+
+def crear_aplicacion(servicio):
+    rutas = [(f"/{operacion}", ManejadorOperacion, {"servicio": servicio, "operacion": operacion}) for operacion in OPERACIONES]
+    return tornado.web.Application(rutas + [("/salud", ManejadorSalud, {"servicio": servicio})])
+
+
+async def servir(puerto, **opciones):
+    crear_aplicacion(ServicioRiesgo(**opciones)).listen(puerto)
+    print(f"Servicio de riesgo en http://localhost:{puerto}", flush=True)
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON de VaR y ES")
+    parser.add_argument("--puerto", type=int, default=8000)
+    parser.add_argument("--hilos", type=int, default=None, help="Hilos para los cálculos (por defecto, los de Python)")
+    parser.add_argument("--capacidad", type=int, default=CAPACIDAD_CACHE, help="Resultados en la caché")
+    parser.add_argument("--ttl", type=float, default=TTL_RESULTADOS, help="Segundos que se conserva cada resultado")
+    args = parser.parse_args()
+    asyncio.run(servir(args.puerto, hilos=args.hilos, capacidad=args.capacidad, ttl=args.ttl))
@@ -0,0 +1,105 @@
+"""
+Pruebas de la carga concurrente de precios: peticiones simultáneas con tickers en común (servicio.py) y escrituras
+simultáneas del mismo ticker en el almacén (almacen.py).
+
+Uso: python -m pytest tests
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from almacen import AlmacenPrecios, FuenteLocal
+from prueba_carga import peticiones_de_prueba
+from servicio import ServicioRiesgo
+
+TICKERS = ("GOOGL", "AAPL", "MSFT")
+
+
+## Fuente local que tarda en responder (para que las cargas se traslapen) y cuenta las descargas de cada ticker
+class FuenteLenta(FuenteLocal):
+    def __init__(self, directorio, espera=0.05):
+        super().__init__(directorio)
+        self.espera = espera
+        self.descargas = {}
+        self._candado = threading.Lock()
+
+    def descargar(self, ticker, inicio, fin):
+        with self._candado:
+            self.descargas[ticker] = self.descargas.get(ticker, 0) + 1
+        time.sleep(self.espera)
+        return super().descargar(ticker, inicio, fin)
+
+
+@pytest.fixture
+def precios_locales(tmp_path):
+    directorio = tmp_path / "precios"
+    directorio.mkdir()
+    fechas = pd.bdate_range("2015-01-02", periods=800)
+    generador = np.random.default_rng(0)
+    for ticker in TICKERS:
+        cierre = 100 * np.exp(np.cumsum(generador.normal(0, 0.01, len(fechas))))
+        pd.DataFrame({"Date": fechas, "Close": cierre}).to_csv(directorio / f"{ticker}.csv", index=False)
+    return directorio
+
+
+def test_peticiones_con_tickers_en_comun(tmp_path, precios_locales):
+    fuente = FuenteLenta(precios_locales)
+    servicio = ServicioRiesgo(AlmacenPrecios(tmp_path / "almacen", fuente), hilos=8)
+    combinaciones = [("GOOGL", "MSFT"), ("GOOGL",), ("MSFT", "AAPL"), ("AAPL", "GOOGL", "MSFT"), ("MSFT",)] * 2
+
+    async def cargar():
+        return await asyncio.gather(*(servicio.obtener_precios(tickers) for tickers in combinaciones))
+
+    resultados = asyncio.run(cargar())
+    assert all(set(precios) == set(tickers) and all(len(serie) == 800 for serie in precios.values())
+               for precios, tickers in zip(resultados, combinaciones))
+    assert fuente.descargas == {ticker: 1 for ticker in TICKERS}  ## Cada ticker se cargó una sola vez
+
+
+def test_prueba_de_carga_en_frio(tmp_path, precios_locales):
+    servicio = ServicioRiesgo(AlmacenPrecios(tmp_path / "almacen", FuenteLenta(precios_locales)), hilos=8)
+
+    async def resolver():
+        return await asyncio.gather(*(servicio.resolver(operacion, cuerpo)
+                                      for operacion, cuerpo in peticiones_de_prueba(list(TICKERS), 10)))
+
+    for respuesta in asyncio.run(resolver()):
+        assert "error" not in json.loads(respuesta)
+
+
+def test_ticker_desconocido(tmp_path, precios_locales):
+    servicio = ServicioRiesgo(AlmacenPrecios(tmp_path / "almacen", FuenteLocal(precios_locales)))
+    with pytest.raises(ValueError, match="No hay precios suficientes"):
+        asyncio.run(servicio.obtener_precios(("GOOGL", "XXXX")))
+
+
+def test_escrituras_simultaneas_del_almacen(tmp_path, precios_locales):
+    almacen = AlmacenPrecios(tmp_path / "almacen", FuenteLenta(precios_locales, espera=0.01))
+    listas = [["GOOGL", "MSFT"], ["GOOGL"], ["MSFT", "GOOGL", "AAPL"], ["AAPL", "GOOGL"]] * 4
+    barrera = threading.Barrier(len(listas))
+    errores = []
+
+    def cargar(tickers):
+        barrera.wait()
+        try:
+            almacen.obtener_varios(tickers, "2015-01-01", "2020-01-01")
+        except Exception as error:  ## noqa: BLE001 (se revisa en el hilo principal)
+            errores.append(error)
+
+    hilos = [threading.Thread(target=cargar, args=(tickers,)) for tickers in listas]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert not errores
+    assert not list((tmp_path / "almacen").glob("*.tmp"))
+    for ticker in TICKERS:
+        precios, rango = almacen._leer(ticker)
+        assert len(precios) == 800 and rango[0] == precios.index[0]
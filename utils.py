@@ -6,22 +6,267 @@ Esto, con la finalidad de evitar repeticiones en cada página del código.
 import streamlit as st
 import pandas as pd
 import numpy as np
-import yfinance as yf
 import datetime
+import time
+from almacen import FECHA_INICIO, almacen_por_defecto
+from graficas import reducir
+from instrumentacion import cache_medida, tramo
+from riesgo import (COLUMNAS_METODOS, columnas_var_es_movil, etiqueta_alpha, rendimientos_log_matriz, tabla_var_es, var_es_movil,
+                    var_es_movil_colas_pesadas, var_volatilidad_movil)
+
+## Los módulos que solo usan algunas páginas (materializar, volatilidad, remuestreo, portafolio y backtesting) se
+## importan dentro de las funciones que los necesitan, para que las demás páginas no paguen su importación al arrancar
+
+## Tiempo (en segundos) que se conservan en caché los datos y los resultados
+TTL_DATOS = 3600
+
+## Tickers como tupla, para que "GOOGL", ["GOOGL"] y ("GOOGL",) usen la misma entrada de la caché
+def _tickers(stocks):
+    return (stocks,) if isinstance(stocks, str) else tuple(stocks)
+
+## Función para obtener la matriz de precios de cierre (fechas × tickers), en float64
+## Los precios se guardan en disco (ver almacen.py) y solo se descargan las fechas que faltan
+@cache_medida(ttl=TTL_DATOS)
+def obtener_precios(stocks):
+    stocks = _tickers(stocks)
+    fin = datetime.datetime.today().strftime('%Y-%m-%d')
+    precios = almacen_por_defecto().obtener_varios(list(stocks), FECHA_INICIO, fin).dropna(how="all")
+    return precios.rename_axis("Date")
 
 ## Función para obtener datos del precio de cierre
-@st.cache_data
 def obtener_datos(stocks):
-    inicio = "2010-01-01"
-    fin = datetime.datetime.today().strftime('%Y-%m-%d')
-    df = yf.download(stocks, start=inicio, end=fin)[["Close"]]
+    stocks = _tickers(stocks)
+    precios = obtener_precios(stocks)
+    if len(stocks) == 1:
+        df = precios.rename(columns={stocks[0]: "Precio_Cierre"})
+    else:
+        df = pd.concat({"Precio_Cierre": precios}, axis=1)
     df = df.reset_index()  ## Convertimos la fecha en columna
-    df.rename(columns={"Close": "Precio_Cierre"}, inplace=True)
     return df
 
+## Función para obtener los rendimientos logarítmicos de varios tickers a la vez, como matriz (fechas × tickers)
+@cache_medida(ttl=TTL_DATOS)
+def obtener_rendimientos(stocks):
+    return rendimientos_log_matriz(obtener_precios(_tickers(stocks)))
+
 ## Función para calcular los rendimientos diarios logarítmicos
 def rendimientos_logaritmicos(df):
-    df_rendimientos = df.copy()
-    df_rendimientos["Returns"] = np.log(df_rendimientos["Precio_Cierre"] / df_rendimientos["Precio_Cierre"].shift(1))
+    precios = df["Precio_Cierre"]
+    rendimientos = rendimientos_log_matriz(precios.to_numpy(dtype=np.float64))
+    if isinstance(precios, pd.DataFrame):  ## Varios tickers: columnas (Returns, ticker)
+        columnas = pd.MultiIndex.from_product([["Returns"], precios.columns])
+        df_rendimientos = pd.concat([df.iloc[1:], pd.DataFrame(rendimientos, index=df.index[1:], columns=columnas)], axis=1)
+    else:  ## Se construye un nuevo DataFrame con las columnas necesarias en lugar de copiar el original
+        df_rendimientos = pd.DataFrame({"Date": df["Date"].to_numpy()[1:], "Precio_Cierre": precios.to_numpy()[1:], "Returns": rendimientos})
     df_rendimientos = df_rendimientos.dropna().reset_index(drop=True)  ## Eliminamos valores NaN
-    return df_rendimientos
\ No newline at end of file
+    return df_rendimientos
+
+## Regresa las métricas precalculadas por materializar.py si corresponden a los mismos parámetros y a los mismos
+## rendimientos (fechas y valores, que cambian con un ajuste por dividendos o splits); en otro caso regresa None y las métricas se calculan en la página
+def _materializado(stocks, df_rendimientos, **parametros):
+    import materializar
+
+    stocks = _tickers(stocks)
+    if len(stocks) != 1:
+        return None
+    datos = materializar.leer_metricas(stocks[0])
+    esperados = {clave: list(valor) if isinstance(valor, tuple) else valor for clave, valor in parametros.items()}
+    if datos is None or any(datos["meta"].get(clave) != valor for clave, valor in esperados.items()):
+        return None
+    fechas = datos["fechas"]
+    if len(fechas) != len(df_rendimientos) or fechas[-1] != df_rendimientos["Date"].to_numpy()[-1]:
+        return None
+    ## Una sola pasada O(n), contra el recálculo O(n · ventana) de las métricas
+    if not materializar.rendimientos_coinciden(datos["metricas"]["Returns"].to_numpy(), df_rendimientos["Returns"].to_numpy()):
+        return None
+    return datos
+
+## Función para obtener en caché el DataFrame de rendimientos logarítmicos de las páginas (primera etapa de los cálculos)
+@cache_medida(ttl=TTL_DATOS)
+def datos_rendimientos(stocks):
+    return rendimientos_logaritmicos(obtener_datos(_tickers(stocks)))
+
+## DataFrame con los mismos arreglos que ``df`` (sin copiarlos), marcados como de solo lectura
+def _solo_lectura(df):
+    arreglos = [df[columna].to_numpy() for columna in df.columns]
+    for arreglo in arreglos:
+        arreglo.flags.writeable = False
+    compartido = pd.DataFrame(dict(enumerate(arreglos)), copy=False)
+    compartido.columns = df.columns
+    return compartido
+
+## Capa de datos de la sesión: las páginas piden aquí los rendimientos en lugar de cargarlos cada una
+def rendimientos_sesion(stocks):
+    """
+    Rendimientos logarítmicos de los tickers (como ``datos_rendimientos``) compartidos por todas las páginas de la
+    sesión: se cargan una vez y cada página recibe el mismo DataFrame, sin copias. Sus columnas son de solo lectura,
+    para que una página no modifique los datos de las demás; se vuelven a cargar cuando vence la caché.
+    """
+    clave = _tickers(stocks)
+    cargados = st.session_state.setdefault("rendimientos_sesion", {})
+    if clave not in cargados or time.monotonic() - cargados[clave][0] > TTL_DATOS:
+        with tramo("rendimientos_sesion"):
+            cargados[clave] = (time.monotonic(), _solo_lectura(datos_rendimientos(clave)))
+    return cargados[clave][1]
+
+## Las funciones en caché usan cache_medida (st.cache_data con contadores de aciertos y fallos, ver instrumentacion.py)
+## y reciben los tickers (y no los rendimientos), para que Streamlit no tenga que calcular el hash de toda la serie
+## en cada interacción con la página
+
+## Función para calcular los diagnósticos de la distribución de los rendimientos (momentos, Jarque-Bera, cuantiles de
+## las colas, histograma y densidad kde escalada a las frecuencias del histograma) de una sola vez; ver diagnosticos.py
+@cache_medida(ttl=TTL_DATOS)
+def diagnosticos_rendimientos(stocks, intervalos=50, puntos=200):
+    from diagnosticos import densidad_kde, diagnostico, histograma
+
+    rendimientos = datos_rendimientos(_tickers(stocks))["Returns"].to_numpy()
+    conteos, bordes = histograma(rendimientos, intervalos)
+    malla = np.linspace(bordes[0], bordes[-1], puntos)
+    densidad = densidad_kde(rendimientos, malla) * len(rendimientos) * (bordes[1] - bordes[0])
+    return {"estadisticas": diagnostico(rendimientos), "conteos": conteos, "bordes": bordes, "malla": malla,
+            "densidad": densidad}
+
+## Función para calcular el VaR y ES móviles (histórico y paramétrico) de todos los niveles de confianza a la vez
+@cache_medida(ttl=TTL_DATOS)
+def metricas_riesgo_movil(stocks, ventana=252, alphas=(0.95, 0.99)):
+    df_rendimientos = datos_rendimientos(_tickers(stocks))
+    datos = _materializado(stocks, df_rendimientos, ventana=ventana, alphas_movil=tuple(alphas))
+    if datos is not None:
+        return datos["metricas"][columnas_var_es_movil(alphas)]
+    return var_es_movil(df_rendimientos["Returns"], ventana=ventana, alphas=alphas)
+
+## Función para calcular el VaR y ES móviles de colas pesadas (t de Student ajustada y Cornish-Fisher, ver distribuciones.py)
+@cache_medida(ttl=TTL_DATOS)
+def metricas_colas_pesadas_movil(stocks, ventana=252, alphas=(0.95, 0.99)):
+    df_rendimientos = datos_rendimientos(_tickers(stocks))
+    return var_es_movil_colas_pesadas(df_rendimientos["Returns"], ventana=ventana, alphas=alphas)
+
+## Métricas móviles de todos los métodos (histórico, normal, t de Student y Cornish-Fisher) en un solo DataFrame
+def _metricas_movil_todas(stocks, ventana, alphas):
+    colas = metricas_colas_pesadas_movil(stocks, ventana, alphas).drop(columns="Grados de libertad")
+    return pd.concat([metricas_riesgo_movil(stocks, ventana, alphas), colas], axis=1).dropna()
+
+## Función para obtener los rendimientos y el VaR y ES móviles (en porcentaje y con su fecha) reducidos al ancho de
+## la gráfica dentro del ``periodo`` (inicio, fin); ver graficas.py. Así, redibujar la gráfica no vuelve a reducir las series
+@cache_medida(ttl=TTL_DATOS)
+def metricas_riesgo_movil_grafica(stocks, ventana=252, alphas=(0.95, 0.99), periodo=None):
+    df_rendimientos = datos_rendimientos(_tickers(stocks))
+    metricas = _metricas_movil_todas(stocks, ventana, alphas)
+    series = pd.concat([df_rendimientos["Returns"], metricas], axis=1).set_axis(pd.DatetimeIndex(df_rendimientos["Date"])) * 100
+    if periodo is not None:
+        series = series.loc[pd.Timestamp(periodo[0]):pd.Timestamp(periodo[1])]
+    ## En los rendimientos se conservan el mínimo y el máximo de cada grupo, para no perder las violaciones
+    return {columna: reducir(series[columna], metodo="minmax" if columna == "Returns" else "lttb") for columna in series}
+
+## Función para calcular la tabla de violaciones y pruebas de Kupiec y Christoffersen del VaR y ES móviles
+## Se guarda en caché aparte, para que cambiar lo que muestra la gráfica no vuelva a evaluar las métricas
+@cache_medida(ttl=TTL_DATOS)
+def violaciones_riesgo_movil(stocks, ventana=252, alphas=(0.95, 0.99)):
+    from backtesting import backtest
+
+    df_rendimientos = datos_rendimientos(_tickers(stocks))
+    metricas = _metricas_movil_todas(stocks, ventana, alphas)
+    pronosticos, probabilidades = {}, []
+    for metodo, columna in (("VaR Histórico", "{} VaR Histórico"), ("VaR Paramétrico", "{} VaR Paramétrico"),
+                            ("VaR t-Student", "{} VaR t-Student"), ("VaR Cornish-Fisher", "{} VaR Cornish-Fisher"),
+                            ("ES Histórico", "ES histórico al {}"), ("ES Paramétrico", "ES paramétrico al {}"),
+                            ("ES t-Student", "ES t-Student al {}"), ("ES Cornish-Fisher", "ES Cornish-Fisher al {}")):
+        for alpha in alphas:
+            pronosticos[f"{metodo} al {etiqueta_alpha(alpha)}"] = metricas[columna.format(etiqueta_alpha(alpha))]
+            probabilidades.append(1 - alpha if metodo.startswith("VaR") else np.nan)  ## El ES no tiene probabilidad nominal
+    pronosticos = pd.DataFrame(pronosticos)
+    return backtest(df_rendimientos["Returns"].loc[pronosticos.index], pronosticos, probabilidades)
+
+## Función para calcular el VaR con volatilidad móvil de todos los alphas a la vez
+@cache_medida(ttl=TTL_DATOS)
+def metricas_volatilidad_movil(stocks, ventana=252, alphas=(0.05, 0.01)):
+    df_rendimientos = datos_rendimientos(_tickers(stocks))
+    datos = _materializado(stocks, df_rendimientos, ventana=ventana, alphas_volatilidad=tuple(alphas))
+    if datos is not None:
+        columnas = {f"VaR volatilidad móvil {etiqueta_alpha(alpha)}": alpha for alpha in alphas}
+        return datos["metricas"].iloc[ventana:][list(columnas) + ["Sigma"]].rename(columns=columnas)
+    return var_volatilidad_movil(df_rendimientos["Returns"], ventana=ventana, alphas=alphas)
+
+## Función para calcular el VaR con volatilidad condicional (EWMA o GARCH(1,1)) de todos los alphas a la vez
+@cache_medida(ttl=TTL_DATOS)
+def metricas_volatilidad_condicional(stocks, modelo="ewma", alphas=(0.05, 0.01)):
+    from volatilidad import var_volatilidad_condicional
+
+    df_rendimientos = datos_rendimientos(_tickers(stocks))
+    return var_volatilidad_condicional(df_rendimientos["Returns"], modelo=modelo, alphas=alphas)
+
+## Función para calcular la tabla de VaR y ES (normal, t-Student, Cornish-Fisher, histórico y Montecarlo) para todos los alphas
+@cache_medida(ttl=TTL_DATOS)
+def resultados_var_es(stocks, alphas=(0.95, 0.975, 0.99)):
+    df_rendimientos = datos_rendimientos(_tickers(stocks))
+    datos = _materializado(stocks, df_rendimientos, alphas_tabla=tuple(alphas))
+    ## Una tabla materializada con otros métodos (por ejemplo, de una versión anterior) se vuelve a calcular
+    if datos is not None and list(datos["tabla"].columns) == ["Alpha", *(c for par in COLUMNAS_METODOS.values() for c in par)]:
+        return datos["tabla"]
+    return tabla_var_es(df_rendimientos["Returns"], alphas)
+
+## Función para calcular el VaR y ES por simulación histórica filtrada (EWMA) y los intervalos de confianza bootstrap
+## por bloques del VaR y ES histórico y filtrado (ver remuestreo.py), con la misma columna Alpha que resultados_var_es
+@cache_medida(ttl=TTL_DATOS)
+def resultados_bootstrap(stocks, alphas=(0.95, 0.975, 0.99), n_replicas=10000, nivel=0.95):
+    from remuestreo import bandas_var_es
+    from volatilidad import escenarios_filtrados
+
+    rendimientos = datos_rendimientos(_tickers(stocks))["Returns"].dropna().to_numpy()
+    escenarios = escenarios_filtrados(rendimientos)
+    tabla = tabla_var_es(escenarios, alphas, metodos=("historico",))
+    tabla.columns = ["Alpha", "VaR Filtrado", "ES Filtrado"]
+    for nombre, valores in (("Histórico", rendimientos), ("Filtrado", escenarios)):
+        var, es = bandas_var_es(valores, alphas, nivel=nivel, n_replicas=n_replicas)
+        tabla[f"VaR {nombre} IC inf."], tabla[f"VaR {nombre} IC sup."] = var.T
+        tabla[f"ES {nombre} IC inf."], tabla[f"ES {nombre} IC sup."] = es.T
+    return tabla
+
+## Función para calcular el VaR y ES de un portafolio (paramétrico y Montecarlo con draws correlacionados) y su
+## descomposición por activo al nivel ``alpha_descomposicion`` (uno de los ``alphas``); la covarianza es EWMA o de ventana móvil (ver portafolio.py)
+@cache_medida(ttl=TTL_DATOS)
+def resultados_portafolio(stocks, pesos, alphas=(0.95, 0.975, 0.99), estimador="ewma", ventana=252,
+                          alpha_descomposicion=0.99, n_sim=10000):
+    from portafolio import (CovarianzaEWMA, CovarianzaMovil, descomposicion_var, rendimientos_portafolio,
+                            simular_var_es_portafolio, var_es_parametrico_portafolio)
+
+    rendimientos = obtener_rendimientos(stocks).dropna(how="all")
+    estimado = CovarianzaEWMA(rendimientos.shape[1]) if estimador == "ewma" else CovarianzaMovil(rendimientos.shape[1], ventana)
+    estimado.actualizar(rendimientos)
+    covarianza = estimado.covarianza
+    media = None if estimador == "ewma" else estimado.media  ## La EWMA supone media cero, como en volatilidad.py
+    var, es = var_es_parametrico_portafolio(pesos, covarianza, alphas, media)
+    var_mc, es_mc, componentes_mc = simular_var_es_portafolio(pesos, covarianza, alphas, media, n_sim=n_sim)
+    tabla = pd.DataFrame({"Alpha": alphas, "VaR Paramétrico": var, "ES Paramétrico": es,
+                          "VaR Monte Carlo": var_mc, "ES Monte Carlo": es_mc})
+    descomposicion = descomposicion_var(pesos, covarianza, alpha_descomposicion, media, activos=list(rendimientos.columns))
+    descomposicion["ES Componente Monte Carlo"] = componentes_mc[list(alphas).index(alpha_descomposicion)]
+    return tabla, descomposicion, rendimientos_portafolio(rendimientos, pesos)
+
+
+## Función para calcular los escenarios de estrés de las posiciones (montos por ticker): los periodos históricos de
+## crisis, los choques hipotéticos ``((nombre, (choque por ticker, ...)), ...)`` en rendimientos simples, el VaR y ES
+## a ``horizonte`` días (escalado y directo) y la pérdida y ganancia de todas las ventanas traslapadas (ver escenarios.py)
+@cache_medida(ttl=TTL_DATOS)
+def resultados_escenarios(stocks, posiciones, choques=(), horizonte=10, alphas=(0.95, 0.975, 0.99)):
+    from escenarios import (ESCENARIOS_HISTORICOS, choques_historicos, choques_hipoteticos, choques_ventanas,
+                            evaluar_escenarios, var_es_horizonte)
+
+    rendimientos = obtener_rendimientos(stocks).dropna(how="all")
+    posiciones = np.asarray(posiciones, dtype=np.float64)
+    invertido = np.abs(posiciones).sum()
+
+    def tabla(escenarios):
+        resultado = evaluar_escenarios(escenarios, posiciones)
+        por_ticker = (np.expm1(escenarios) * posiciones).fillna(np.inf)
+        mayor_perdida = por_ticker.idxmin(axis=1).where(por_ticker.min(axis=1) < 0) if len(por_ticker) else []
+        return pd.DataFrame({"Rendimiento del portafolio (%)": resultado / invertido * 100, "Pérdida y ganancia": resultado,
+                             "Mayor pérdida": mayor_perdida}, index=escenarios.index)
+
+    historicos = tabla(choques_historicos(rendimientos))
+    historicos.insert(0, "Inicio", [inicio for inicio, _ in ESCENARIOS_HISTORICOS.values()])
+    historicos.insert(1, "Fin", [fin for _, fin in ESCENARIOS_HISTORICOS.values()])
+    hipoteticos = tabla(choques_hipoteticos({nombre: dict(zip(stocks, valores)) for nombre, valores in choques},
+                                            rendimientos.columns))
+    ventanas = evaluar_escenarios(choques_ventanas(rendimientos, horizonte), posiciones).dropna()
+    return historicos, hipoteticos, var_es_horizonte(rendimientos, posiciones, alphas, horizonte), ventanas
@@ -0,0 +1,221 @@
+"""
+En este código se encuentran los modelos de volatilidad condicional: EWMA (RiskMetrics) y GARCH(1,1), y los
+escenarios de la simulación histórica filtrada que se construyen con ellos.
+
+Ambos son recursiones lineales en los rendimientos al cuadrado,
+``sigma²_t = c + b * sigma²_{t-1} + a * r²_{t-1}``, que se evalúan con ``scipy.signal.lfilter`` (código compilado)
+en lugar de un ciclo de Python; con parámetros distintos por ticker (GARCH de varios tickers) la recursión de todas
+las columnas se resuelve a la vez por duplicación. La volatilidad de la fecha t solo usa información hasta t - 1, como en la página
+de volatilidad móvil. Se asume media cero en los rendimientos, igual que el VaR de esa página.
+"""
+
+import numpy as np
+from scipy.signal import lfilter
+from scipy.stats import norm
+
+from riesgo import _como_matriz, _como_resultado
+
+## Factor de decaimiento de RiskMetrics para datos diarios
+LAMBDA_RISKMETRICS = 0.94
+
+## Persistencia máxima (alpha + beta) permitida al estimar el GARCH
+PERSISTENCIA_MAXIMA = 0.9999
+
+
+## Evalúa la recursión sigma²_t = omega + beta * sigma²_{t-1} + alpha * r²_{t-1} para todas las columnas; los
+## parámetros pueden ser escalares o arreglos con uno por columna
+def _filtrar(cuadrados, omega, alpha, beta, varianza_inicial):
+    cuadrados = cuadrados.reshape(len(cuadrados), -1)
+    inicial = np.broadcast_to(np.asarray(varianza_inicial, dtype=np.float64), cuadrados.shape[1:])
+    entrada = alpha * cuadrados[:-1] + omega
+    beta = np.asarray(beta, dtype=np.float64)
+    if np.all(beta == beta.flat[0]):
+        beta = beta.flat[0]
+        siguiente, _ = lfilter([1.0], [1.0, -beta], entrada, axis=0, zi=(beta * inicial)[None, :])
+        return np.concatenate((inicial[None, :], siguiente))
+    ## lfilter solo admite un denominador: con una beta por columna la recursión se resuelve por duplicación, donde
+    ## después del paso p cada fila acumula los 2p términos anteriores ponderados por potencias de beta
+    sigma2 = np.concatenate((inicial[None, :], entrada))
+    factor, p = beta, 1
+    while p < len(sigma2):
+        sigma2[p:] += factor * sigma2[:-p]
+        factor, p = factor * factor, 2 * p
+    return sigma2
+
+
+## Rendimientos al cuadrado y su promedio; los datos faltantes se sustituyen por el promedio (no aportan información)
+def _cuadrados(x):
+    cuadrados = x ** 2
+    promedio = np.nanmean(cuadrados, axis=0)
+    return np.where(np.isnan(cuadrados), promedio, cuadrados), promedio
+
+
+## Varianza condicional EWMA (RiskMetrics) de una serie o de una matriz (fechas × tickers)
+def varianza_ewma(rendimientos, lambda_=LAMBDA_RISKMETRICS):
+    x = np.asarray(rendimientos, dtype=np.float64)
+    cuadrados, promedio = _cuadrados(x)
+    varianza = _filtrar(cuadrados, 0.0, 1 - lambda_, lambda_, promedio).reshape(x.shape)
+    return np.where(np.isnan(x), np.nan, varianza)
+
+
+## Log-verosimilitud normal (negativa) del GARCH(1,1) con varianza objetivo, en la parametrización acotada, de
+## cada columna; ``theta`` tiene un par (persistencia, proporción) por columna
+def _neg_log_verosimilitudes(theta, cuadrados, varianza, validos):
+    persistencia, proporcion = theta.T
+    alpha, beta = persistencia * proporcion, persistencia * (1 - proporcion)
+    sigma2 = _filtrar(cuadrados, varianza * (1 - persistencia), alpha, beta, varianza)
+    return 0.5 * np.sum(np.where(validos, np.log(sigma2) + cuadrados / sigma2, 0.0), axis=0)
+
+
+## Minimiza las log-verosimilitudes negativas de todas las columnas a la vez con pasos de Newton por columna: como
+## cada término depende solo de los parámetros de su columna, mover el mismo parámetro en todas las columnas da todas
+## las derivadas (por diferencias finitas) con la misma evaluación vectorizada. Un parámetro en su cota con el
+## gradiente hacia afuera queda fijo en el paso; los pasos se reducen a la mitad, en cada columna, hasta que bajan su
+## término, y cada iteración solo evalúa las columnas que aún no convergen
+def _minimizar_garch(theta, argumentos, cotas, iteraciones=100, tolerancia=1e-10, h=1e-5):
+    inferior, superior = np.array(cotas, dtype=np.float64).T
+    pares = theta.copy()
+    valores = _neg_log_verosimilitudes(pares, *argumentos)
+    activas = np.arange(len(pares))
+    for _ in range(iteraciones):
+        cuadrados, varianza, validos = argumentos
+        parcial = (cuadrados[:, activas], varianza[activas], validos[:, activas])
+        objetivo = lambda x: _neg_log_verosimilitudes(x, *parcial)
+        actuales, base = pares[activas], valores[activas]
+
+        ## Gradiente (diferencias centrales) y hessiana 2 × 2 de cada columna
+        arriba = [objetivo(actuales + h * e) for e in np.eye(2)]
+        abajo = [objetivo(actuales - h * e) for e in np.eye(2)]
+        gradiente = np.column_stack([(arriba[k] - abajo[k]) / (2 * h) for k in range(2)])
+        diagonal = np.column_stack([(arriba[k] - 2 * base + abajo[k]) / h ** 2 for k in range(2)])
+        cruzada = (objetivo(actuales + h) - arriba[0] - arriba[1] + base) / h ** 2
+        fijos = (((actuales <= inferior) & (gradiente > 0)) | ((actuales >= superior) & (gradiente < 0)))
+
+        ## Dirección de Newton donde la hessiana es definida positiva y ningún parámetro está fijo; si no, Newton (o
+        ## descenso escalado, si la curvatura no es positiva) en cada parámetro libre por separado
+        determinante = diagonal[:, 0] * diagonal[:, 1] - cruzada ** 2
+        newton = (diagonal[:, 0] > 0) & (determinante > 0) & ~fijos.any(axis=1)
+        direccion = -gradiente / np.where(diagonal > 0, diagonal, np.maximum(np.abs(diagonal), 1.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            conjunta = -np.column_stack((diagonal[:, 1] * gradiente[:, 0] - cruzada * gradiente[:, 1],
+                                         diagonal[:, 0] * gradiente[:, 1] - cruzada * gradiente[:, 0]))
+            direccion = np.where(newton[:, None], conjunta / determinante[:, None], direccion)
+        direccion[fijos] = 0.0
+
+        paso, pendientes = np.ones(len(activas)), np.ones(len(activas), dtype=bool)
+        for _ in range(40):
+            nuevos = np.clip(actuales + paso[:, None] * direccion, inferior, superior)
+            candidatos = objetivo(nuevos)
+            aceptadas = pendientes & (candidatos <= base)
+            pares[activas[aceptadas]], valores[activas[aceptadas]] = nuevos[aceptadas], candidatos[aceptadas]
+            pendientes &= ~aceptadas
+            if not pendientes.any():
+                break
+            paso[pendientes] /= 2
+        activas = activas[base - valores[activas] > tolerancia * np.abs(base)]
+        if not len(activas):
+            break
+    return pares
+
+
+def ajustar_garch(rendimientos, inicial=(0.97, 0.08)):
+    """
+    Estima un GARCH(1,1) por máxima verosimilitud para una serie de rendimientos, o uno por columna para una matriz
+    (fechas × tickers).
+
+    Se usa varianza objetivo (``omega = varianza * (1 - alpha - beta)``), de modo que solo se optimizan la
+    persistencia ``alpha + beta`` y la proporción ``alpha / (alpha + beta)``, ambas en intervalos acotados. Las
+    log-verosimilitudes de todos los tickers se evalúan y optimizan juntas, con pasos de Newton vectorizados (los
+    parámetros de cada ticker solo afectan a su término). Los datos faltantes no cuentan en la verosimilitud.
+    Regresa un diccionario con ``omega``, ``alpha``, ``beta`` y la log-verosimilitud, o una lista con uno por columna.
+    """
+    x = np.asarray(rendimientos, dtype=np.float64)
+    matriz = x.reshape(len(x), -1)
+    validos = ~np.isnan(matriz)
+    parametros = [dict.fromkeys(("omega", "alpha", "beta", "log_verosimilitud"), np.nan) for _ in range(matriz.shape[1])]
+    ## Las columnas sin datos no se estiman (su verosimilitud sería NaN para todas)
+    columnas = np.flatnonzero(validos.sum(axis=0) > 1)
+    if len(columnas):
+        cuadrados, varianza = _cuadrados(matriz[:, columnas])
+        argumentos = (cuadrados, varianza, validos[:, columnas])
+        theta = _minimizar_garch(np.tile(np.asarray(inicial, dtype=np.float64), (len(columnas), 1)), argumentos,
+                                 [(1e-4, PERSISTENCIA_MAXIMA), (1e-4, 1 - 1e-4)])
+        persistencia, proporcion = theta.T
+        log_verosimilitud = (-_neg_log_verosimilitudes(theta, *argumentos)
+                             - 0.5 * validos[:, columnas].sum(axis=0) * np.log(2 * np.pi))
+        for i, j in enumerate(columnas):
+            parametros[j] = {
+                "omega": varianza[i] * (1 - persistencia[i]),
+                "alpha": persistencia[i] * proporcion[i],
+                "beta": persistencia[i] * (1 - proporcion[i]),
+                "log_verosimilitud": log_verosimilitud[i],
+            }
+    return parametros[0] if x.ndim == 1 else parametros
+
+
+## Parámetros (un diccionario o una lista con uno por columna) como arreglos omega, alpha y beta por columna
+def _arreglos(parametros):
+    parametros = [parametros] if isinstance(parametros, dict) else parametros
+    return tuple(np.array([p[nombre] for p in parametros], dtype=np.float64) for nombre in ("omega", "alpha", "beta"))
+
+
+## Varianza condicional GARCH(1,1) de una serie o de una matriz, con todas las columnas en un solo filtrado;
+## ``parametros`` es un diccionario o una lista con uno por columna
+def varianza_garch(rendimientos, parametros):
+    x = np.asarray(rendimientos, dtype=np.float64)
+    cuadrados, promedio = _cuadrados(x.reshape(len(x), -1))
+    varianza = _filtrar(cuadrados, *_arreglos(parametros), promedio).reshape(x.shape)
+    return np.where(np.isnan(x), np.nan, varianza)
+
+
+## Pronóstico de la varianza a ``horizonte`` días a partir de la varianza del día siguiente
+def pronostico_garch(varianza_siguiente, parametros, horizonte=10):
+    persistencia = parametros["alpha"] + parametros["beta"]
+    varianza_larga = parametros["omega"] / (1 - persistencia)
+    pasos = np.arange(horizonte)[:, None] if np.ndim(varianza_siguiente) else np.arange(horizonte)
+    return varianza_larga + persistencia ** pasos * (varianza_siguiente - varianza_larga)
+
+
+def var_volatilidad_condicional(rendimientos, modelo="ewma", alphas=(0.05, 0.01), lambda_=LAMBDA_RISKMETRICS):
+    """
+    VaR normal con volatilidad condicional EWMA o GARCH(1,1) para varios alphas, con el mismo formato que
+    ``riesgo.var_volatilidad_movil`` (una columna por alpha y la columna ``Sigma``). Para una matriz, el GARCH tiene
+    parámetros propios para cada ticker (estimados todos a la vez) y las columnas son pares (métrica, ticker).
+    """
+    x, indice, tickers = _como_matriz(rendimientos)
+    if modelo == "ewma":
+        sigma = np.sqrt(varianza_ewma(x, lambda_))
+    elif modelo == "garch":
+        sigma = np.sqrt(varianza_garch(x, ajustar_garch(x)))
+    else:
+        raise ValueError("El modelo debe ser 'ewma' o 'garch'")
+
+    columnas = {alpha: norm.ppf(alpha) * sigma for alpha in alphas}
+    columnas["Sigma"] = sigma
+    return _como_resultado(columnas, indice, tickers)
+
+
+## Varianza condicional de cada fecha y, en una fila adicional, su pronóstico para el día siguiente
+def _varianza_con_pronostico(x, modelo, lambda_):
+    cuadrados, promedio = _cuadrados(x)
+    cuadrados = np.concatenate((cuadrados, np.zeros((1, x.shape[1]))))  ## La fila adicional solo extiende la recursión
+    if modelo == "ewma":
+        return _filtrar(cuadrados, 0.0, 1 - lambda_, lambda_, promedio)
+    if modelo == "garch":
+        return _filtrar(cuadrados, *_arreglos(ajustar_garch(x)), promedio)
+    raise ValueError("El modelo debe ser 'ewma' o 'garch'")
+
+
+def escenarios_filtrados(rendimientos, modelo="ewma", lambda_=LAMBDA_RISKMETRICS):
+    """
+    Escenarios de la simulación histórica filtrada (FHS) para el día siguiente.
+
+    Cada rendimiento se estandariza con la volatilidad condicional de su fecha (``r_t / sigma_t``) y se reescala con
+    la volatilidad pronosticada para el día siguiente, de modo que el VaR y ES histórico de los escenarios reflejan
+    la volatilidad actual sin suponer normalidad. Regresa un arreglo con la forma de ``rendimientos`` (NaN donde
+    faltan datos).
+    """
+    x, _, tickers = _como_matriz(rendimientos)
+    varianza = _varianza_con_pronostico(x, modelo, lambda_)
+    escenarios = x / np.sqrt(varianza[:-1]) * np.sqrt(varianza[-1])
+    return escenarios[:, 0] if tickers is None else escenarios